@@ -43,149 +43,31 @@ if sys.version_info[0] == 2:
 from yapbol import PBOFile
 import os
 import argparse
+from collections import namedtuple
 import io
 import re
 import struct
 from utils import binary_handler
+from utils import diagnostics
+from utils import parallel
+from utils import profiling
+from utils.diagnostics import print_error, print_warning, print_trace, print_info, print_green, print_blue
 from utils import data_rap as rap
+from utils import dependency_index
+from utils import incremental
+from utils.data_cfg import CFG_Error
+from utils.preprocessor import Preprocessor, Preprocessor_Error, grab_source_addons, read_source_config
 
 # Set Globals
 root_dir = ""
 build_dir = ""
 only_list = []
-enable_trace = False
 property_blacklist = ['hardpoints']
+check_external = False
 
-############################################################
-# Utility functions
-# Copyright (c) André Burgaud
-# http://www.burgaud.com/bring-colors-to-the-windows-console-with-python/
-if sys.platform == "win32":
-    from ctypes import windll, Structure, c_short, c_ushort, byref
-
-    SHORT = c_short
-    WORD = c_ushort
-
-    class COORD(Structure):
-      """struct in wincon.h."""
-      _fields_ = [
-        ("X", SHORT),
-        ("Y", SHORT)]
-
-    class SMALL_RECT(Structure):
-      """struct in wincon.h."""
-      _fields_ = [
-        ("Left", SHORT),
-        ("Top", SHORT),
-        ("Right", SHORT),
-        ("Bottom", SHORT)]
-
-    class CONSOLE_SCREEN_BUFFER_INFO(Structure):
-      """struct in wincon.h."""
-      _fields_ = [
-        ("dwSize", COORD),
-        ("dwCursorPosition", COORD),
-        ("wAttributes", WORD),
-        ("srWindow", SMALL_RECT),
-        ("dwMaximumWindowSize", COORD)]
-
-    # winbase.h
-    STD_INPUT_HANDLE = -10
-    STD_OUTPUT_HANDLE = -11
-    STD_ERROR_HANDLE = -12
-
-    # wincon.h
-    FOREGROUND_BLACK     = 0x0000
-    FOREGROUND_BLUE      = 0x0001
-    FOREGROUND_GREEN     = 0x0002
-    FOREGROUND_CYAN      = 0x0003
-    FOREGROUND_RED       = 0x0004
-    FOREGROUND_MAGENTA   = 0x0005
-    FOREGROUND_YELLOW    = 0x0006
-    FOREGROUND_GREY      = 0x0007
-    FOREGROUND_INTENSITY = 0x0008 # foreground color is intensified.
-
-    BACKGROUND_BLACK     = 0x0000
-    BACKGROUND_BLUE      = 0x0010
-    BACKGROUND_GREEN     = 0x0020
-    BACKGROUND_CYAN      = 0x0030
-    BACKGROUND_RED       = 0x0040
-    BACKGROUND_MAGENTA   = 0x0050
-    BACKGROUND_YELLOW    = 0x0060
-    BACKGROUND_GREY      = 0x0070
-    BACKGROUND_INTENSITY = 0x0080 # background color is intensified.
-
-    stdout_handle = windll.kernel32.GetStdHandle(STD_OUTPUT_HANDLE)
-    SetConsoleTextAttribute = windll.kernel32.SetConsoleTextAttribute
-    GetConsoleScreenBufferInfo = windll.kernel32.GetConsoleScreenBufferInfo
-
-    def get_text_attr():
-      """Returns the character attributes (colors) of the console screen
-      buffer."""
-      csbi = CONSOLE_SCREEN_BUFFER_INFO()
-      GetConsoleScreenBufferInfo(stdout_handle, byref(csbi))
-      return csbi.wAttributes
-
-    def set_text_attr(color):
-      """Sets the character attributes (colors) of the console screen
-      buffer. Color is a combination of foreground and background color,
-      foreground and background intensity."""
-      SetConsoleTextAttribute(stdout_handle, color)
-
-def color(color):
-    """Set the color. Works on Win32 and normal terminals."""
-    if sys.platform == "win32":
-        if color == "green":
-            set_text_attr(FOREGROUND_GREEN | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "yellow":
-            set_text_attr(FOREGROUND_YELLOW | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "red":
-            set_text_attr(FOREGROUND_RED | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "blue":
-            set_text_attr(FOREGROUND_BLUE | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "magenta":
-            set_text_attr(FOREGROUND_MAGENTA | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "reset":
-            set_text_attr(FOREGROUND_GREY | get_text_attr() & 0x0070)
-        elif color == "grey":
-            set_text_attr(FOREGROUND_GREY | get_text_attr() & 0x0070)
-    else :
-        if color == "green":
-            sys.stdout.write('\033[92m')
-        elif color == "red":
-            sys.stdout.write('\033[91m')
-        elif color == "blue":
-            sys.stdout.write('\033[94m')
-        elif color == "reset":
-            sys.stdout.write('\033[0m')
-
-def print_error(msg):
-    color("red")
-    print ("ERROR: {}".format(msg))
-    color("reset")
-
-def print_warning(msg):
-    color("yellow")
-    print ("WARNING: {}".format(msg))
-    color("reset")
-
-def print_trace(msg):
-    if (not enable_trace):
-        return
-    color("magenta")
-    print ("TRACE: {}".format(msg))
-    color("reset")
-
-def print_green(msg):
-    color("green")
-    print(msg)
-    color("reset")
-
-def print_blue(msg):
-    color("blue")
-    print(msg)
-    color("reset")
-############################################################
+# properties that name classes, refs in them outside of the searchprefix are checked against the dependencies
+external_class_properties = ['weapons', 'magazines', 'items', 'linkeditems', 'respawnweapons', 'respawnmagazines', 'respawnitems', 'respawnlinkeditems', 'uniformclass', 'backpack', 'ammo', 'submunitionammo', 'magazinewell', 'facewear', 'headgear', 'vest', 'uniform']
+CLASSNAME_REGEX = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
 
 ############################################################
 # rap-related functions for binary file reading
@@ -202,18 +84,16 @@ def rap_read_paths(stream, count):
     return paths
 ############################################################
 
-class ClassRef:
-    def __init__(self, classname, path, source):
-        self.classname = classname
-        self.path = path
-        self.source = source
-
-    def __repr__(self):
-        return "ClassRef(classname={}, path={}, source={})".format(self.classname, self.path, self.source)
+class ClassRef(namedtuple("ClassRef", ["classname", "path", "source"])):
+    # immutable and hashable, so identical refs collapse when collected
+    __slots__ = ()
 
     def __str__(self):
+        return "{} ({})".format(self.classname, self.referrer())
+
+    def referrer(self):
         f_path = " >> ".join(self.path)
-        return "{} ({} >> '{}')".format(self.classname, f_path, self.source)
+        return "{} >> '{}'".format(f_path, self.source)
 
 class ConfigBin:
     def __init__(self, data, prefix):
@@ -226,13 +106,13 @@ class ConfigBin:
 
 def find_build_dir(pwd):
     # check if we find the .hemttout folder here, otherwise try one directory further up
-    print_trace("Searching for .hemttout in {}".format(pwd))
+    print_trace("Searching for .hemttout in {}", pwd)
     hemttout_dir = os.path.join(pwd,'.hemttout')
     if (os.path.isdir(hemttout_dir)):
-        print_trace("Searching for build dir in {}".format(hemttout_dir))
+        print_trace("Searching for build dir in {}", hemttout_dir)
         build_dir = os.path.join(hemttout_dir,'build')
         if (os.path.isdir(build_dir)):
-            print_trace("HEMTT build dir found: {}".format(build_dir))
+            print_trace("HEMTT build dir found: {}", build_dir)
             return build_dir
         else:
             raise Exception("NoBuildDir","HEMTT build output directory could not be found!")
@@ -242,14 +122,14 @@ def find_build_dir(pwd):
 def grab_built_pbos(dir):
     # return all built pbos as PBOFile objects
     addons_dir = os.path.join(dir,'addons')
-    print_trace("grabbing pbo files from addons dir: {}".format(addons_dir))
+    print_trace("grabbing pbo files from addons dir: {}", addons_dir)
     addons_pbos = next(os.walk(addons_dir), (None, None, []))[2]
-    print_trace("pbo files returned: {}".format(addons_pbos))
+    print_trace("pbo files returned: {}", addons_pbos)
 
     pbos = []
 
     for file in addons_pbos:
-        print_trace("reading pbo file: {}".format(file))
+        print_trace("reading pbo file: {}", file)
         pbo = PBOFile.read_file(os.path.join(addons_dir,file))
         pbos.append([file,pbo])
 
@@ -259,27 +139,35 @@ def read_pbo_config_bin(pbo):
     # grab pboprefix to find root path
     pboprefix = pbo.pbo_header.header_extension.strings[1].lower()
     searchprefix = pboprefix.split('\\')[1]
-    print_trace("found pboprefix as {}, searchprefix as {}".format(pboprefix,searchprefix))
+    print_trace("found pboprefix as {}, searchprefix as {}", pboprefix,searchprefix)
 
     # grab all files within the data directory and the config.bin
     config_bin = []
     for file in pbo:
-        print_trace("checking file {}".format(file.filename))
+        print_trace("checking file {}", file.filename)
         filename = "\\" + pboprefix + "\\" + file.filename.lower()
 
         if "config.bin" in filename:
             config_bin.append(ConfigBin(rap.RAP_Reader.read_raw(io.BufferedReader(io.BytesIO(file.data))), searchprefix))
-            print_trace("found config.bin: {}".format(config_bin))
+            print_trace("found config.bin: {}", config_bin)
 
     if (len(config_bin) == 0):
         print_error("PBO does not contain a config.bin!")
     
     return config_bin
 
+def read_source_config_bin(pboprefix, directory, preprocessor):
+    # same as read_pbo_config_bin for an addon source folder, the config.cpp is preprocessed and parsed
+    searchprefix = pboprefix.split('\\')[1]
+    print_trace("found pboprefix as {}, searchprefix as {}", pboprefix,searchprefix)
+
+    return [ConfigBin(read_source_config(preprocessor, directory), searchprefix)]
+
 def get_classes_from_config(config):
     cfg_root = config.data.body
-    classes = recurse_classes_from_config(cfg_root,config.prefix)
-    print_trace("found classes: {}".format(classes))
+    # refs into the dependencies may also point to local classes outside of the searchprefix
+    classes = recurse_classes_from_config(cfg_root,"" if check_external else config.prefix)
+    print_trace("found classes: {}", classes)
     return list(set(classes))  # return unique classes
 
 def recurse_classes_from_config(cfg,searchprefix,parents="root"):
@@ -293,79 +181,142 @@ def recurse_classes_from_config(cfg,searchprefix,parents="root"):
     return classes
 
 def get_class_refs_from_config(config):
+    # returns the referenced class names mapped to their occurrences
     cfg_root = config.data.body
-    class_refs = recurse_class_refs_from_config(cfg_root,config.prefix)
-    #print_trace("found class refs: {}".format(class_refs))
-    return list(set(class_refs))  # return unique class refs
-
-def recurse_class_refs_from_config(cfg,searchprefix,parents=["configFile"]):
-    classes = []
-    #print_trace("recurse_class_refs_from_config: cfg: {}, searchprefix: {}, parents: {}".format(cfg,searchprefix,parents))
+    class_refs = recurse_class_refs_from_config(cfg_root,config.prefix,("configFile",),{})
+    #print_trace("found class refs: {}", class_refs)
+    return class_refs
+
+def add_class_ref(refs, ref):
+    # occurrences are kept as insertion-ordered sets
+    occurrences = refs.get(ref.classname)
+    if occurrences is None:
+        occurrences = refs[ref.classname] = {}
+    occurrences[ref] = None
+
+def recurse_class_refs_from_config(cfg,searchprefix,parents=("configFile",),refs=None):
+    if refs is None:
+        refs = {}
+    #print_trace("recurse_class_refs_from_config: cfg: {}, searchprefix: {}, parents: {}", cfg,searchprefix,parents)
     if (("'CfgPatches'" in parents) and skip_cfgpatches):
-        return classes  # skip CfgPatches if requested
+        return refs  # skip CfgPatches if requested
     for entry in cfg.entries:
         if entry.type == rap.RAP.EntryType.CLASS:
-            print_trace("found class: {}".format(entry.name))
-            l_parents = parents[:]
-            l_parents.append("'{}'".format(entry.name))
-            classes.extend(recurse_class_refs_from_config(entry.body,searchprefix,l_parents))
+            print_trace("found class: {}", entry.name)
+            recurse_class_refs_from_config(entry.body,searchprefix,parents + ("'{}'".format(entry.name),),refs)
         elif entry.type == rap.RAP.EntryType.ARRAY:
             for subentry in entry.body.elements:
-                classes.extend(parse_class_ref_from_entry(subentry, searchprefix, parents, entry.name))
+                ref = parse_class_ref_from_entry(subentry, searchprefix, parents, entry.name)
+                if ref is not None:
+                    add_class_ref(refs, ref)
         elif entry.type == rap.RAP.EntryType.SCALAR:
-            classes.extend(parse_class_ref_from_entry(entry, searchprefix, parents))
+            ref = parse_class_ref_from_entry(entry, searchprefix, parents)
+            if ref is not None:
+                add_class_ref(refs, ref)
 
-    return classes
+    return refs
 
 def parse_class_ref_from_entry(entry, searchprefix, parents, entry_name=None):
     if entry_name is None:
         entry_name = entry.name
     # parse a class ref from an entry name
     if (entry.subtype != rap.RAP.EntrySubType.STRING):
-        return []
+        return None
 
     if (entry.value.find(searchprefix) == 0):
         # handle functions
         if ("_fnc_" in entry.value):
-            return []
-        print_trace("found class ref: {} with {} at {}".format(entry_name, entry.value, parents))
+            return None
+        print_trace("found class ref: {} with {} at {}", entry_name, entry.value, parents)
         if (entry_name.lower() in property_blacklist):
-            return []
-        return [ClassRef(entry.value.lower(), parents, entry_name.lower())]
+            return None
+        return ClassRef(entry.value.lower(), parents, entry_name.lower())
+    elif (check_external and entry_name.lower() in external_class_properties and CLASSNAME_REGEX.match(entry.value)):
+        print_trace("found external class ref: {} with {} at {}", entry_name, entry.value, parents)
+        return ClassRef(entry.value.lower(), parents, entry_name.lower())
     else:
-        return []
+        return None
 
-def check_pbo_class_refs(pbo,config_bin,classes):
+def check_pbo_class_refs(pboprefix,config_bin,classes,external_classes=None):
     # checks paths in the pbo
     if config_bin is None:
         return False
-    # read the config.bin for all paths in hiddenSelectionsTextures[]
-    class_refs = []
+    # read the config.bin for all class refs
+    class_refs = {}
     for cfg in config_bin:
-        class_refs.extend(get_class_refs_from_config(cfg))
-    print_trace("found class refs in config: {}".format(class_refs))
+        for (classname, occurrences) in get_class_refs_from_config(cfg).items():
+            class_refs.setdefault(classname, {}).update(occurrences)
+    print_trace("found class refs in config: {}", class_refs)
 
     # iterate through class_refs from config and see if they are a) local to current addon and b) if they exist in classes
     errors = []
-    pboprefix = pbo.pbo_header.header_extension.strings[1].lower()
     searchprefix = pboprefix.split('\\')[1]
-    for cls in class_refs:
-        if (searchprefix in cls.classname):
-            print_trace("{} is local class".format(cls.classname))
-            if (cls.classname in classes):
-                print_trace("{} exists in classes".format(cls.classname))
+    for (classname, occurrences) in class_refs.items():
+        if (searchprefix in classname):
+            print_trace("{} is local class", classname)
+            if (classname in classes):
+                print_trace("{} exists in classes", classname)
+            else:
+                refs = list(occurrences)
+                print_warning("Class {} could not be found! Referenced by {} entries:\n    {}", classname, len(refs), "\n    ".join(ref.referrer() for ref in refs), config_path=" >> ".join(refs[0].path), prop=refs[0].source, value=classname)
+                errors.append(classname)
+        elif (external_classes is not None):
+            if (classname in classes or any(classname in index for index in external_classes)):
+                print_trace("{} exists in dependencies", classname)
             else:
-                print_warning("Class {} could not be found!".format(cls))
-                errors.append(cls.classname)
+                refs = list(occurrences)
+                print_warning("External class {} could not be found in the dependencies! Referenced by {} entries:\n    {}", classname, len(refs), "\n    ".join(ref.referrer() for ref in refs), config_path=" >> ".join(refs[0].path), prop=refs[0].source, value=classname)
+                errors.append(classname)
         else:
-            print_trace("{} is not local class, skipping".format(cls.classname))
+            print_trace("{} is not local class, skipping", classname)
             continue
 
     return (len(errors) == 0)
 
+def load_dependency_classes(dirs, index_dir, jobs):
+    # returns one class index per dependency directory, only pbos changed since the last run are parsed
+    if (index_dir is None):
+        index_dir = os.path.join(os.path.dirname(build_dir) if build_dir != "" else os.path.join(root_dir, ".hemttout"), "dependency_classes")
+    os.makedirs(index_dir, exist_ok=True)
+
+    indices = []
+    for dir in dirs:
+        pbo_files = dependency_index.grab_dependency_pbo_files([dir])
+        name = os.path.basename(os.path.normpath(os.path.abspath(dir))) or "root"
+        index_path = os.path.join(index_dir, "{}-{}.idx".format(name, incremental.content_hash(os.path.abspath(dir))[:8]))
+        try:
+            (index, parsed) = dependency_index.ClassIndex.update(index_path, __version__, pbo_files, jobs)
+        except OSError as e:
+            print_error("Could not write the class index {}: {}", index_path, e)
+            continue
+        print_blue("Indexed {} classes from {} dependency pbos ({} unchanged) in {}", len(index), len(pbo_files), len(pbo_files) - parsed, dir)
+        indices.append(index)
+    print_info('')
+
+    return indices
+
+def check_addon(task):
+    # validates a single addon against the shared class index, may run in a worker process
+    global skip_cfgpatches, check_external
+    (classes, external_classes, skip_cfgpatches) = parallel.shared()
+    check_external = external_classes is not None
+    (file, pboprefix, config_bin) = task
+
+    diagnostics.set_addon(file)
+    print_blue("Checking classes in {}...", file)
+    success = check_pbo_class_refs(pboprefix,config_bin,classes,external_classes)
+    if (success):
+        print_blue("Classes in {} are valid!", file)
+    else:
+        print_error("Classes in {} contain errors!", file)
+    print_info('')
+    diagnostics.set_addon(None)
+
+    return (file, success)
+
 
 def main(argv):
-    print_blue("## check_classes.py, version {} ##\n".format(__version__))
+    print_blue("## check_classes.py, version {} ##\n", __version__)
 
     # parse args
     parser = argparse.ArgumentParser(description="This script checks all local classes in the output of this project's HEMTT build.")
@@ -373,44 +324,87 @@ def main(argv):
     parser.add_argument('-v', '--verbose',help='enables tracel-level logging',action='store_true')
     parser.add_argument('--enable-cfgpatches',help='enables checking units/weapons array in CfgPatches',action='store_true')
     parser.add_argument('-o','--only',help='only run the path checks on the following addon',nargs='+')
+    parser.add_argument('--source',help='checks the addon source folders instead of the HEMTT build, config.cpp files are preprocessed and parsed directly',action='store_true')
+    parser.add_argument('-d','--dependencies',help='directories with the pbos of external dependencies, class refs into them are checked as well',nargs='+',metavar='DIR')
+    parser.add_argument('--dependency-index-dir',help='directory to cache the dependency class indices in, defaults to .hemttout/dependency_classes')
+    parallel.add_arguments(parser)
+    diagnostics.add_arguments(parser)
+    profiling.add_arguments(parser)
     args = parser.parse_args()
-    global enable_trace
-    enable_trace = args.verbose
+    diagnostics.configure_from_args("check_classes.py", __version__, args)
+    if (profiling.configure_from_args("check_classes.py", args)):
+        profiling.instrument(globals(), {
+            "grab_built_pbos": "load pbos",
+            "read_pbo_config_bin": "read pbo contents",
+            "read_source_config_bin": "read addon sources",
+            "recurse_classes_from_config": "collect classes",
+            "recurse_class_refs_from_config": "traverse config",
+            "load_dependency_classes": "index dependencies",
+            "check_pbo_class_refs": "check classes"
+        })
 
     global root_dir
     root_dir = os.path.abspath(args.directory)
-    print_trace("setting root_dir to {}".format(root_dir))
+    print_trace("setting root_dir to {}", root_dir)
 
     global only_list
     only_list = args.only
-    print_trace("setting only_list to {}".format(only_list))
+    print_trace("setting only_list to {}", only_list)
 
     global skip_cfgpatches
     skip_cfgpatches = not args.enable_cfgpatches
-    print_trace("setting skip_cfgpatches to {}".format(skip_cfgpatches))
+    print_trace("setting skip_cfgpatches to {}", skip_cfgpatches)
+
+    global check_external
+    check_external = args.dependencies is not None
 
     # preliminary stuffs
     global build_dir
-    try:
-        build_dir = find_build_dir(root_dir)
-    except:
-        print_error("An exception occurred while attempting to find the build directory!")
-        sys.exit(1)
+    errors = []
+    preprocessor = None
+    if (args.source):
+        sources = grab_source_addons(root_dir)
+        preprocessor = Preprocessor(root_dir, {prefix.lower(): directory for (name, directory, prefix) in sources})
+        addons = [(name, prefix.lower(), directory) for (name, directory, prefix) in sources]
+    else:
+        try:
+            build_dir = find_build_dir(root_dir)
+        except:
+            print_error("An exception occurred while attempting to find the build directory!")
+            sys.exit(1)
 
-    pbos = grab_built_pbos(build_dir)
+        addons = [(file, pbo.pbo_header.header_extension.strings[1].lower(), pbo) for (file, pbo) in grab_built_pbos(build_dir)]
 
     # actually run the checks
-    errors = []
     classes = []
     config_bins = {}
     # first pass, read all classes from all pbos to match cross-refs
-    for (file,pbo) in pbos:
-        print_trace("reading data files from pbo {}".format(file))
-        config_bins[file] = read_pbo_config_bin(pbo)
+    for (file, pboprefix, source) in addons:
+        diagnostics.set_addon(file)
+        print_trace("reading data files from {}", file)
+        if (args.source):
+            try:
+                config_bins[file] = read_source_config_bin(pboprefix, source, preprocessor)
+            except (Preprocessor_Error, CFG_Error, OSError) as e:
+                print_error("Config of {} could not be read: {}", file, e)
+                errors.append(file)
+                continue
+        else:
+            config_bins[file] = read_pbo_config_bin(source)
         for config in config_bins[file]:
             classes.extend(get_classes_from_config(config))
+    diagnostics.set_addon(None)
+
+    classes = set(classes)
+
+    external_classes = None
+    if (check_external):
+        external_classes = load_dependency_classes(args.dependencies, args.dependency_index_dir, args.jobs)
 
-    for (file,pbo) in pbos:
+    tasks = []
+    for (file, pboprefix, source) in addons:
+        if (file not in config_bins):
+            continue
         skip = False
         if (not only_list is None):
             skip = True
@@ -418,23 +412,22 @@ def main(argv):
                 if (it in file):
                     skip = False
         if (skip):
-            print_trace("{} not in only_list, skipping".format(file))
+            print_trace("{} not in only_list, skipping", file)
             continue
 
-        print_blue("Checking classes in {}...".format(file))
-        success = check_pbo_class_refs(pbo,config_bins[file],classes)
-        if (success):
-            print_blue("Classes in {} are valid!".format(file))
-        else:
-            print_error("Classes in {} contain errors!".format(file))
+        tasks.append((file, pboprefix, config_bins[file]))
+
+    # second pass, validate the addons in parallel against the shared index
+    shared = (classes, external_classes, skip_cfgpatches)
+    for (file, success) in parallel.map_ordered(check_addon, tasks, args.jobs, shared):
+        if (not success):
             errors.append(file)
-        print('')
 
     if (len(errors) == 0):
         print_green("Validation of all addons' classes succeeded!")
         sys.exit(0)
     else:
-        print_error("Validation of one or more addons' classes failed: {}".format(errors))
+        print_error("Validation of one or more addons' classes failed: {}", errors)
         sys.exit(1)
 
 
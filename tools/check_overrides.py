@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# File: check_overrides.py
+# Author: Mokka
+#
+# Description: Finds properties that repeat the value their class already inherits
+#
+# Usage: python ./tools/check_overrides.py
+#
+
+# The MIT License (MIT)
+
+# Copyright (c) 2026-2026 Mokka
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+###############################################################################
+
+__version__ = "0.1"
+
+import sys
+
+if sys.version_info[0] == 2:
+    print("Python 3 is required.")
+    sys.exit(1)
+
+import os
+import io
+import argparse
+from collections import namedtuple
+from utils import data_rap as rap
+from utils import diagnostics
+from utils import parallel
+from utils import profiling
+from utils.diagnostics import print_error, print_warning, print_trace, print_info, print_green, print_blue
+from utils.pbo_layout import open_pbo, PBOLayout_Error
+
+# Set Globals
+root_dir = ""
+build_dir = ""
+
+# A class as defined by one addon, path holds the lowercase names of the class and
+# its containers, names the same in their original case. properties only holds the
+# scalars and arrays of the class itself, nested classes are defined separately.
+ClassDef = namedtuple("ClassDef", ["path", "names", "inherits", "properties", "addon"])
+Property = namedtuple("Property", ["name", "value", "size", "flagged"])
+Override = namedtuple("Override", ["classdef", "parent", "property"])
+
+def find_build_dir(pwd):
+    # check if we find the .hemttout folder here, otherwise try one directory further up
+    print_trace("Searching for .hemttout in {}", pwd)
+    hemttout_dir = os.path.join(pwd,'.hemttout')
+    if (os.path.isdir(hemttout_dir)):
+        print_trace("Searching for build dir in {}", hemttout_dir)
+        build_dir = os.path.join(hemttout_dir,'build')
+        if (os.path.isdir(build_dir)):
+            print_trace("HEMTT build dir found: {}", build_dir)
+            return build_dir
+        else:
+            raise Exception("NoBuildDir","HEMTT build output directory could not be found!")
+    else:
+        return find_build_dir(os.path.join(pwd,'..'))
+
+def grab_built_pbo_files(dir):
+    # return all pbos of the build as (name relative to the build dir, path)
+    pbos = []
+    for (path, dirs, files) in os.walk(dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.lower().endswith(".pbo"):
+                filepath = os.path.join(path, file)
+                pbos.append((os.path.relpath(filepath, dir).replace(os.sep, "/"), filepath))
+    print_trace("pbo files returned: {}", pbos)
+
+    return pbos
+
+def entry_value(entry):
+    # comparable value of a scalar or array, arrays become tuples of their elements
+    if entry.type == rap.RAP.EntryType.ARRAY:
+        elements = entry.body.elements if hasattr(entry, "body") else entry.elements
+        return tuple(entry_value(element) for element in elements)
+    return (entry.subtype.value, entry.value)
+
+def format_value(value):
+    if isinstance(value, tuple) and (len(value) == 0 or isinstance(value[0], tuple)):
+        return "{%s}" % ", ".join(format_value(element) for element in value)
+    (subtype, content) = value
+    return '"%s"' % content if subtype == rap.RAP.EntrySubType.STRING.value else str(content)
+
+def recurse_class_defs(body, path, names, addon, classes):
+    for entry in body.entries:
+        if entry.type != rap.RAP.EntryType.CLASS:
+            continue
+        properties = {}
+        for subentry in entry.body.entries:
+            if subentry.type in (rap.RAP.EntryType.SCALAR, rap.RAP.EntryType.ARRAY):
+                flagged = subentry.type == rap.RAP.EntryType.ARRAY and subentry.flag is not None
+                properties[subentry.name.lower()] = Property(subentry.name, entry_value(subentry), subentry.size, flagged)
+        classes.append(ClassDef(path + (entry.name.lower(),), names + (entry.name,), entry.body.inherits, properties, addon))
+        recurse_class_defs(entry.body, path + (entry.name.lower(),), names + (entry.name,), addon, classes)
+
+def read_pbo_classes(task):
+    # reads the class definitions of the configs of a single pbo, may run in a worker process
+    (name, filepath) = task
+    diagnostics.set_addon(name)
+    print_trace("reading pbo file: {}", filepath)
+    classes = []
+    valid = True
+    try:
+        with open_pbo(filepath) as (layout, buffer):
+            for entry in layout.entries:
+                if not entry.filename.lower().endswith("config.bin"):
+                    continue
+                if entry.compressed:
+                    print_warning("Skipping compressed config {}", entry.filename)
+                    continue
+                with layout.data(buffer, entry) as data:
+                    content = bytes(data)
+                try:
+                    cfg = rap.RAP_SizeReader.read_raw(io.BufferedReader(io.BytesIO(content)))
+                except Exception as e:
+                    print_error("Config {} could not be parsed: {}", entry.filename, e)
+                    valid = False
+                    continue
+                recurse_class_defs(cfg.body, (), (), name, classes)
+    except (OSError, PBOLayout_Error) as e:
+        print_error("PBO could not be read: {}", e)
+        valid = False
+    diagnostics.set_addon(None)
+
+    return (name, classes, valid)
+
+
+class OverrideResolver():
+    # Resolves the parent of every class within its container and memoizes the
+    # effective properties (own and inherited) per class, so every class is only
+    # merged once however deep the hierarchy below it is.
+    def __init__(self):
+        self.classes = {}
+        self.definitions = []
+        self.parents = {}
+        self.effective = {}
+
+    def add(self, classdef):
+        self.definitions.append(classdef)
+        existing = self.classes.get(classdef.path)
+        if existing is None:
+            self.classes[classdef.path] = classdef
+        else:
+            # a class patched by a later addon, properties are merged
+            self.classes[classdef.path] = existing._replace(
+                inherits=classdef.inherits or existing.inherits,
+                properties={**existing.properties, **classdef.properties}
+            )
+
+    def find_member(self, container, name, path):
+        # looks up a class within a container and the classes the container inherits from
+        seen = set()
+        while container is not None and container not in seen:
+            seen.add(container)
+            candidate = container + (name,)
+            if candidate != path and candidate in self.classes:
+                return candidate
+            container = self.parent(container) if container in self.classes else None
+        return None
+
+    def parent(self, path):
+        # path of the class a class inherits from, None if it has none or it is not part of the build
+        if path in self.parents:
+            return self.parents[path]
+        self.parents[path] = None # guards against cycles while resolving
+
+        output = None
+        inherits = self.classes[path].inherits.lower()
+        if inherits != "":
+            # class X: Y {} looks for Y next to X first, then in the containers further out
+            container = path[:-1]
+            while True:
+                output = self.find_member(container, inherits, path)
+                if output is not None or len(container) == 0:
+                    break
+                container = container[:-1]
+
+        self.parents[path] = output
+        return output
+
+    def properties(self, path):
+        # returns {name: value} of all properties a class has, own and inherited
+        chain = []
+        seen = set()
+        inherited = {}
+        current = path
+        while current is not None and current not in seen:
+            if current in self.effective:
+                inherited = self.effective[current]
+                break
+            seen.add(current)
+            chain.append(current)
+            current = self.parent(current)
+
+        for current in reversed(chain):
+            output = dict(inherited)
+            for (key, prop) in self.classes[current].properties.items():
+                if prop.flagged and isinstance(inherited.get(key), tuple):
+                    output[key] = inherited[key] + prop.value
+                else:
+                    output[key] = prop.value
+            inherited = self.effective[current] = output
+
+        return inherited
+
+    def redundant_overrides(self):
+        # properties of every definition whose value equals the one already inherited from the parent
+        output = []
+        for classdef in self.definitions:
+            parent = self.parent(classdef.path)
+            if parent is None:
+                continue
+            inherited = self.properties(parent)
+            for (key, prop) in classdef.properties.items():
+                if not prop.flagged and key in inherited and inherited[key] == prop.value:
+                    output.append(Override(classdef, self.classes[parent], prop))
+
+        return output
+
+
+def print_overrides(overrides):
+    savings = {}
+    for override in overrides:
+        config_path = " >> ".join(override.classdef.names)
+        print_warning("{} >> {} repeats the value inherited from {}: {}", config_path, override.property.name, " >> ".join(override.parent.names), format_value(override.property.value),
+            addon=override.classdef.addon, config_path=config_path, prop=override.property.name, value=format_value(override.property.value))
+        (size, count) = savings.get(override.classdef.addon, (0, 0))
+        savings[override.classdef.addon] = (size + override.property.size, count + 1)
+
+    return savings
+
+
+def main(argv):
+    print_blue("## check_overrides.py, version {} ##\n", __version__)
+
+    # parse args
+    parser = argparse.ArgumentParser(description="This script finds config properties in this project's HEMTT build that repeat the value their class already inherits.")
+    parser.add_argument('directory',nargs='?',help='directory to operate on',default='.')
+    parser.add_argument('-v', '--verbose',help='enables tracel-level logging',action='store_true')
+    parallel.add_arguments(parser)
+    diagnostics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    diagnostics.configure_from_args("check_overrides.py", __version__, args)
+    if (profiling.configure_from_args("check_overrides.py", args)):
+        profiling.instrument(globals(), {
+            "grab_built_pbo_files": "list pbos",
+            "read_pbo_classes": "read configs",
+            "print_overrides": "report overrides"
+        })
+
+    global root_dir
+    root_dir = os.path.abspath(args.directory)
+    print_trace("setting root_dir to {}", root_dir)
+
+    # preliminary stuffs
+    global build_dir
+    try:
+        build_dir = find_build_dir(root_dir)
+    except:
+        print_error("An exception occurred while attempting to find the build directory!")
+        sys.exit(1)
+
+    pbos = grab_built_pbo_files(build_dir)
+    if (len(pbos) == 0):
+        print_error("No pbos found in {}", build_dir)
+        sys.exit(1)
+
+    resolver = OverrideResolver()
+    errors = []
+    for (name, classes, valid) in parallel.map_ordered(read_pbo_classes, pbos, args.jobs):
+        if (not valid):
+            errors.append(name)
+        for classdef in classes:
+            resolver.add(classdef)
+
+    savings = print_overrides(resolver.redundant_overrides())
+
+    if (len(savings) > 0):
+        print_blue("\nPotential savings by addon:")
+        for (addon, (size, count)) in sorted(savings.items(), key=lambda item: (-item[1][0], item[0])):
+            print_info("  {:>8} bytes  {:>5} properties  {}", size, count, addon)
+
+    if (len(errors) == 0):
+        total = sum(size for (size, count) in savings.values())
+        print_green("\nChecked {} classes, {} redundant properties take up {} bytes", len(resolver.classes), sum(count for (size, count) in savings.values()), total)
+        sys.exit(0)
+    else:
+        print_error("Reading one or more pbos has failed: {}", errors)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -43,148 +43,39 @@ if sys.version_info[0] == 2:
 from yapbol import PBOFile
 import os
 import argparse
+from collections import namedtuple
+import fnmatch
 import io
 import re
 import struct
 from utils import data_rap as rap
+from utils import diagnostics
+from utils import parallel
+from utils import profiling
+from utils.diagnostics import print_error, print_warning, print_trace, print_info, print_green, print_blue
 from utils import binary_handler
+from utils import dependency_index
+from utils import data_rvmat
+from utils.data_paa import PAA_Reader, PAA_Error
+from utils.pbo_layout import open_pbo, PBOLayout_Error
+from utils.data_cfg import CFG_Error
+from utils.preprocessor import Preprocessor, Preprocessor_Error, grab_source_addons, read_source_config
 
 # Set Globals
 root_dir = ""
 build_dir = ""
 only_list = []
-enable_trace = False
+check_external = False
+report_textures = False
 
-############################################################
-# Utility functions
-# Copyright (c) André Burgaud
-# http://www.burgaud.com/bring-colors-to-the-windows-console-with-python/
-if sys.platform == "win32":
-    from ctypes import windll, Structure, c_short, c_ushort, byref
-
-    SHORT = c_short
-    WORD = c_ushort
-
-    class COORD(Structure):
-      """struct in wincon.h."""
-      _fields_ = [
-        ("X", SHORT),
-        ("Y", SHORT)]
-
-    class SMALL_RECT(Structure):
-      """struct in wincon.h."""
-      _fields_ = [
-        ("Left", SHORT),
-        ("Top", SHORT),
-        ("Right", SHORT),
-        ("Bottom", SHORT)]
-
-    class CONSOLE_SCREEN_BUFFER_INFO(Structure):
-      """struct in wincon.h."""
-      _fields_ = [
-        ("dwSize", COORD),
-        ("dwCursorPosition", COORD),
-        ("wAttributes", WORD),
-        ("srWindow", SMALL_RECT),
-        ("dwMaximumWindowSize", COORD)]
-
-    # winbase.h
-    STD_INPUT_HANDLE = -10
-    STD_OUTPUT_HANDLE = -11
-    STD_ERROR_HANDLE = -12
-
-    # wincon.h
-    FOREGROUND_BLACK     = 0x0000
-    FOREGROUND_BLUE      = 0x0001
-    FOREGROUND_GREEN     = 0x0002
-    FOREGROUND_CYAN      = 0x0003
-    FOREGROUND_RED       = 0x0004
-    FOREGROUND_MAGENTA   = 0x0005
-    FOREGROUND_YELLOW    = 0x0006
-    FOREGROUND_GREY      = 0x0007
-    FOREGROUND_INTENSITY = 0x0008 # foreground color is intensified.
-
-    BACKGROUND_BLACK     = 0x0000
-    BACKGROUND_BLUE      = 0x0010
-    BACKGROUND_GREEN     = 0x0020
-    BACKGROUND_CYAN      = 0x0030
-    BACKGROUND_RED       = 0x0040
-    BACKGROUND_MAGENTA   = 0x0050
-    BACKGROUND_YELLOW    = 0x0060
-    BACKGROUND_GREY      = 0x0070
-    BACKGROUND_INTENSITY = 0x0080 # background color is intensified.
-
-    stdout_handle = windll.kernel32.GetStdHandle(STD_OUTPUT_HANDLE)
-    SetConsoleTextAttribute = windll.kernel32.SetConsoleTextAttribute
-    GetConsoleScreenBufferInfo = windll.kernel32.GetConsoleScreenBufferInfo
-
-    def get_text_attr():
-      """Returns the character attributes (colors) of the console screen
-      buffer."""
-      csbi = CONSOLE_SCREEN_BUFFER_INFO()
-      GetConsoleScreenBufferInfo(stdout_handle, byref(csbi))
-      return csbi.wAttributes
-
-    def set_text_attr(color):
-      """Sets the character attributes (colors) of the console screen
-      buffer. Color is a combination of foreground and background color,
-      foreground and background intensity."""
-      SetConsoleTextAttribute(stdout_handle, color)
-
-def color(color):
-    """Set the color. Works on Win32 and normal terminals."""
-    if sys.platform == "win32":
-        if color == "green":
-            set_text_attr(FOREGROUND_GREEN | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "yellow":
-            set_text_attr(FOREGROUND_YELLOW | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "red":
-            set_text_attr(FOREGROUND_RED | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "blue":
-            set_text_attr(FOREGROUND_BLUE | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "magenta":
-            set_text_attr(FOREGROUND_MAGENTA | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "reset":
-            set_text_attr(FOREGROUND_GREY | get_text_attr() & 0x0070)
-        elif color == "grey":
-            set_text_attr(FOREGROUND_GREY | get_text_attr() & 0x0070)
-    else :
-        if color == "green":
-            sys.stdout.write('\033[92m')
-        elif color == "red":
-            sys.stdout.write('\033[91m')
-        elif color == "blue":
-            sys.stdout.write('\033[94m')
-        elif color == "reset":
-            sys.stdout.write('\033[0m')
-
-def print_error(msg):
-    color("red")
-    print ("ERROR: {}".format(msg))
-    color("reset")
-
-def print_warning(msg):
-    color("yellow")
-    print ("WARNING: {}".format(msg))
-    color("reset")
-
-def print_trace(msg):
-    if (not enable_trace):
-        return
-    color("magenta")
-    print ("TRACE: {}".format(msg))
-    color("reset")
-
-def print_green(msg):
-    color("green")
-    print(msg)
-    color("reset")
-
-def print_blue(msg):
-    color("blue")
-    print(msg)
-    color("reset")
-############################################################
+# strings outside of the mod root are only taken as paths if they end in one of these
+EXTERNAL_PATH_REGEX = re.compile(r'^\\?[^"\s\\][^"]*\\[^"\\]+\.(paa|pac|p3d|rvmat|bisurf|wss|ogg|wav|lip|rtm|jpg|png|sqf|sqs|fsm|bikb|html|emat|ext)$')
+
+# paths of textures, materials and proxies stored as plain strings in binarized models
+MODEL_PATH_REGEX = re.compile(rb'[\w\\/.\-]+\.(?:paa|pac|rvmat|p3d)(?![\w.])', re.IGNORECASE)
+
+# files that are used without being referenced by a path
+UNUSED_ALLOW_LIST = ["$pboprefix$", "*.hpp", "*.h", "*.inc", "config.bin", "config.cpp", "texheaders.bin", "model.cfg", "stringtable.xml", "*.sqf", "*.sqfc", "*.fsm"]
 
 ############################################################
 # rap-related functions for binary file reading
@@ -201,21 +92,18 @@ def rap_read_paths(stream, count):
     return paths
 ############################################################
 
-class PathRef:
-    def __init__(self, path, parents, entry_name):
-        self.path = path.lower()
-        self.parents = parents
-        self.entry_name = entry_name.lower()
+class PathRef(namedtuple("PathRef", ["path", "parents", "entry_name"])):
+    # immutable and hashable, so identical refs collapse when collected
+    __slots__ = ()
 
     def __str__(self):
-        f_path = " >> ".join(self.parents)
-        return "{} ({} >> '{}')".format(self.path, f_path, self.entry_name)
+        return "{} ({})".format(self.path, self.referrer())
 
-    def __repr__(self):
-        return self.__str__()
+    def referrer(self):
+        f_path = " >> ".join(self.parents)
+        return "{} >> '{}'".format(f_path, self.entry_name)
 
-    def __iter__(self):
-        return iter((self.path, self.parents, self.entry_name))
+PBOContents = namedtuple("PBOContents", ["data_files", "config_bin", "rvmats", "models", "sizes"])
 
 class ConfigBin:
     def __init__(self, data, prefix):
@@ -227,13 +115,13 @@ class ConfigBin:
 
 def find_build_dir(pwd):
     # check if we find the .hemttout folder here, otherwise try one directory further up
-    print_trace("Searching for .hemttout in {}".format(pwd))
+    print_trace("Searching for .hemttout in {}", pwd)
     hemttout_dir = os.path.join(pwd,'.hemttout')
     if (os.path.isdir(hemttout_dir)):
-        print_trace("Searching for build dir in {}".format(hemttout_dir))
+        print_trace("Searching for build dir in {}", hemttout_dir)
         build_dir = os.path.join(hemttout_dir,'build')
         if (os.path.isdir(build_dir)):
-            print_trace("HEMTT build dir found: {}".format(build_dir))
+            print_trace("HEMTT build dir found: {}", build_dir)
             return build_dir
         else:
             raise Exception("NoBuildDir","HEMTT build output directory could not be found!")
@@ -244,14 +132,14 @@ def find_build_dir(pwd):
 def grab_built_pbos(dir):
     # return all built pbos as PBOFile objects
     addons_dir = os.path.join(dir,'addons')
-    print_trace("grabbing pbo files from addons dir: {}".format(addons_dir))
+    print_trace("grabbing pbo files from addons dir: {}", addons_dir)
     addons_pbos = next(os.walk(addons_dir), (None, None, []))[2]
-    print_trace("pbo files returned: {}".format(addons_pbos))
+    print_trace("pbo files returned: {}", addons_pbos)
 
     pbos = []
 
     for file in addons_pbos:
-        print_trace("reading pbo file: {}".format(file))
+        print_trace("reading pbo file: {}", file)
         pbo = PBOFile.read_file(os.path.join(addons_dir,file))
         pbos.append([file,pbo])
 
@@ -262,107 +150,381 @@ def is_local_path(path,prefix):
     return (path.find(prefix) == 0)
 
 def get_paths_from_config(config):
+    # returns the referenced paths mapped to their occurrences
     cfg_root = config.data.body
-    paths = recurse_paths(cfg_root, config.prefix)
-    #print_trace("found paths: {}".format(paths))
-    return list(set(paths))  # remove duplicates
+    paths = recurse_paths(cfg_root, config.prefix, ("configFile",), {})
+    #print_trace("found paths: {}", paths)
+    return paths
+
+def add_path_ref(refs, ref):
+    # occurrences are kept as insertion-ordered sets
+    occurrences = refs.get(ref.path)
+    if occurrences is None:
+        occurrences = refs[ref.path] = {}
+    occurrences[ref] = None
 
-def recurse_paths(cfg, searchprefix, parents=["configFile"]):
-    classes = []
+def recurse_paths(cfg, searchprefix, parents=("configFile",), refs=None):
+    if refs is None:
+        refs = {}
     for entry in cfg.entries:
         if entry.type == rap.RAP.EntryType.CLASS:
-            #print_trace("found class: {}".format(entry.name))
-            l_parents = parents[:]
-            l_parents.append("'{}'".format(entry.name))
-            classes.extend(recurse_paths(entry.body,searchprefix,l_parents))
+            #print_trace("found class: {}", entry.name)
+            recurse_paths(entry.body,searchprefix,parents + ("'{}'".format(entry.name),),refs)
         elif entry.type == rap.RAP.EntryType.ARRAY:
             for subentry in entry.body.elements:
-                classes.extend(parse_path_from_entry(subentry, searchprefix, parents, entry.name))
+                ref = parse_path_from_entry(subentry, searchprefix, parents, entry.name)
+                if ref is not None:
+                    add_path_ref(refs, ref)
         elif entry.type == rap.RAP.EntryType.SCALAR:
-            classes.extend(parse_path_from_entry(entry, searchprefix, parents))
+            ref = parse_path_from_entry(entry, searchprefix, parents)
+            if ref is not None:
+                add_path_ref(refs, ref)
 
-    return classes
+    return refs
 
 def parse_path_from_entry(entry, searchprefix, parents, entry_name=None):
     if entry_name is None:
         entry_name = entry.name
 
-    # parse a class ref from an entry name
+    # parse a path ref from an entry
     if (entry.subtype != rap.RAP.EntrySubType.STRING):
-        return []
+        return None
 
     if (is_local_path(entry.value, searchprefix)):
         if (skip_no_extension and not '.' in entry.value):
-            print_trace("skipping path without file extension: {}".format(entry.value))
-            return []
+            print_trace("skipping path without file extension: {}", entry.value)
+            return None
         if (skip_editorpreview and 'editorpreview' in entry.value):
-            print_trace("skipping path with editorpreview: {}".format(entry.value))
-            return []
-        print_trace("found path: {} in {} at {}".format(entry.value, entry_name, parents))
-        return [PathRef(entry.value.lower(), parents, entry_name.lower())]
+            print_trace("skipping path with editorpreview: {}", entry.value)
+            return None
+        print_trace("found path: {} in {} at {}", entry.value, entry_name, parents)
+        return PathRef(entry.value.lower(), parents, entry_name.lower())
+    elif (check_external and EXTERNAL_PATH_REGEX.match(entry.value.lower())):
+        path = entry.value.lower()
+        if (path[0] != '\\'):
+            path = '\\' + path
+        print_trace("found external path: {} in {} at {}", path, entry_name, parents)
+        return PathRef(path, parents, entry_name.lower())
     else:
-        return []
+        return None
 
 def read_pbo_data_files(pbo):
     # grab pboprefix to find root path
     pboprefix = pbo.pbo_header.header_extension.strings[1].lower()
     modroot = "\\" + pboprefix.split('\\')[0]+ "\\" + pboprefix.split('\\')[1] + "\\"
-    print_trace("found pboprefix as {}".format(pboprefix))
+    print_trace("found pboprefix as {}", pboprefix)
 
-    # grab all files within the data directory and the config.bin
+    # grab all files within the data directory, the materials and the config.bin
     config_bin = []
     data_files = []
+    rvmats = {}
+    models = {}
+    sizes = {}
     for file in pbo:
         filename = "\\" + pboprefix + "\\" + file.filename.lower()
+        sizes[filename] = len(file.data)
         if (not ".hpp" in filename):
-            print_trace("found data file {}".format(filename))
+            print_trace("found data file {}", filename)
             data_files.append(filename)
 
+        if filename.endswith(".rvmat"):
+            rvmats[filename] = file.data
+
+        if filename.endswith(".p3d"):
+            models[filename] = file.data
+
         if "config.bin" in filename:
             print_trace("found config.bin")
             config_bin.append(ConfigBin(rap.RAP_Reader.read_raw(io.BufferedReader(io.BytesIO(file.data))), modroot))
 
     if (config_bin is []):
         print_error("PBO does not contain a config.bin!")
-        return ([], [])
+        return PBOContents([], [], {}, {}, {})
 
     if (len(data_files) == 0):
         print_warning("PBO does not contain data files")
 
-    return (data_files, config_bin)
+    return PBOContents(data_files, config_bin, rvmats, models, sizes)
+
+def read_source_data_files(pboprefix, directory, preprocessor):
+    # same as read_pbo_data_files for an addon source folder, the config.cpp is preprocessed and parsed
+    modroot = "\\" + pboprefix.split('\\')[0]+ "\\" + pboprefix.split('\\')[1] + "\\"
+
+    config_bin = [ConfigBin(read_source_config(preprocessor, directory), modroot)]
+    data_files = []
+    rvmats = {}
+    models = {}
+    sizes = {}
+    for (path, dirs, files) in os.walk(directory):
+        dirs.sort()
+        for file in sorted(files):
+            filepath = os.path.join(path, file)
+            filename = "\\" + pboprefix + "\\" + os.path.relpath(filepath, directory).replace(os.sep, "\\").lower()
+            sizes[filename] = os.path.getsize(filepath)
+            if (not ".hpp" in filename):
+                print_trace("found data file {}", filename)
+                data_files.append(filename)
+
+            if filename.endswith(".rvmat") or filename.endswith(".p3d"):
+                with open(filepath, "rb") as stream:
+                    (rvmats if filename.endswith(".rvmat") else models)[filename] = stream.read()
+
+    return PBOContents(data_files, config_bin, rvmats, models, sizes)
+
+def read_rvmat_textures(task):
+    # returns the (stage, texture) pairs of a material, may run in a worker process
+    (path, data) = task
+    try:
+        return data_rvmat.read_textures(data)
+    except Exception as e:
+        print_warning("Material {} could not be parsed: {}", path, e)
+        return []
+
+def parse_rvmats(rvmats, jobs):
+    # parses every distinct material once, in parallel, and returns the texture refs per material path
+    paths = sorted(rvmats)
+    rvmat_textures = {}
+    for (path, textures) in zip(paths, parallel.map_ordered(read_rvmat_textures, [(path, rvmats[path]) for path in paths], jobs)):
+        rvmat_textures[path] = textures
+        print_trace("found textures in material {}: {}", path, textures)
+
+    return rvmat_textures
+
+def add_rvmat_texture_refs(texture_paths, rvmat_textures):
+    # adds the textures of the referenced materials, with the material as part of the referrer
+    for (path, occurrences) in list(texture_paths.items()):
+        textures = rvmat_textures.get(path)
+        if textures is None:
+            continue
+        for ref in occurrences:
+            parents = ref.parents + ("'{}'".format(ref.entry_name), path)
+            for (stage, texture) in textures:
+                texture = texture.lower()
+                if texture[0] != '\\':
+                    texture = '\\' + texture
+                add_path_ref(texture_paths, PathRef(texture, parents + ("'{}'".format(stage),), "texture"))
+
+def read_model_paths(task):
+    # returns the paths stored in a binarized model, may run in a worker process
+    (path, data) = task
+    paths = set()
+    for match in MODEL_PATH_REGEX.findall(data):
+        model_path = match.decode("ascii").lower().replace("/", "\\")
+        paths.add(model_path if model_path[0] == "\\" else "\\" + model_path)
+    print_trace("found paths in model {}: {}", path, paths)
+
+    return sorted(paths)
+
+def read_pbo_texture_headers(filepath):
+    # returns the headers of all textures in a pbo by path, or the error if one cannot be read
+    headers = {}
+    try:
+        with open_pbo(filepath) as (layout, buffer):
+            pboprefix = layout.prefix.lower()
+            for entry in layout.entries:
+                filename = entry.filename.lower()
+                if not (filename.endswith(".paa") or filename.endswith(".pac")) or entry.compressed:
+                    continue
+                buffer.seek(entry.offset)
+                try:
+                    headers["\\" + pboprefix + "\\" + filename] = PAA_Reader.read_header(buffer, entry.data_size)
+                except (PAA_Error, struct.error, ValueError) as e:
+                    headers["\\" + pboprefix + "\\" + filename] = str(e)
+    except (OSError, PBOLayout_Error) as e:
+        print_warning("Textures in {} could not be read: {}", filepath, e)
+
+    return headers
+
+def read_source_texture_headers(task):
+    # same as read_pbo_texture_headers for the textures in an addon source folder
+    (pboprefix, directory) = task
+    headers = {}
+    for (path, dirs, files) in os.walk(directory):
+        for file in files:
+            if not (file.lower().endswith(".paa") or file.lower().endswith(".pac")):
+                continue
+            filepath = os.path.join(path, file)
+            filename = "\\" + pboprefix + "\\" + os.path.relpath(filepath, directory).replace(os.sep, "\\").lower()
+            try:
+                with open(filepath, "rb") as stream:
+                    headers[filename] = PAA_Reader.read_header(stream, os.path.getsize(filepath))
+            except (PAA_Error, struct.error, ValueError) as e:
+                headers[filename] = str(e)
+            except OSError as e:
+                print_warning("Texture {} could not be read: {}", filepath, e)
+
+    return headers
+
+def read_texture_headers(tasks, jobs, reader=read_pbo_texture_headers):
+    # reads the texture headers of all pbos (or addon source folders) in parallel
+    texture_headers = {}
+    for headers in parallel.map_ordered(reader, tasks, jobs):
+        texture_headers.update(headers)
+
+    return texture_headers
+
+def check_texture(path, header, ref):
+    # validates the header of a texture referenced by hiddenSelectionsTextures[]
+    config_path = " >> ".join(ref.parents)
+    if isinstance(header, str):
+        print_warning("Texture {} could not be read: {}", path, header, config_path=config_path, prop=ref.entry_name, value=path)
+        return False
+
+    valid = True
+    if (report_textures):
+        print_info("{}: {}", path, header)
+    if (not header.is_power_of_two()):
+        print_warning("Texture {} has dimensions that are not a power of two: {}x{}\n    {}", path, header.width, header.height, ref.referrer(), config_path=config_path, prop=ref.entry_name, value=path)
+        valid = False
+    if (len(header.mipmaps) < 2 and max(header.width, header.height) > 1):
+        print_warning("Texture {} has no mipmaps\n    {}", path, ref.referrer(), config_path=config_path, prop=ref.entry_name, value=path)
+        valid = False
+
+    return valid
 
-def check_pbo_paths(pbo,config_bin,data_files):
+def check_pbo_paths(pboprefix,config_bin,data_files,external_files=None,rvmat_textures=None,texture_headers=None,referenced=None):
     # checks paths in the pbo
     if config_bin is []:
         return False
     # read the config.bin for all paths in config
-    texture_paths = []
+    texture_paths = {}
     for cfg in config_bin:
-        texture_paths.extend(get_paths_from_config(cfg))
-    #print_trace("found paths in config: {}".format(texture_paths))
+        for (path, occurrences) in get_paths_from_config(cfg).items():
+            texture_paths.setdefault(path, {}).update(occurrences)
+    if rvmat_textures is not None:
+        add_rvmat_texture_refs(texture_paths, rvmat_textures)
+    if referenced is not None:
+        referenced.update(texture_paths)
+    #print_trace("found paths in config: {}", texture_paths)
 
     # iterate through texture_paths from config and see if they are a) local to current addon and b) if they exist in data_files
     errors = []
-    pboprefix = pbo.pbo_header.header_extension.strings[1].lower()
     modroot = "\\" + pboprefix.split('\\')[0]+ "\\" + pboprefix.split('\\')[1] + "\\"
-    print_trace("modroot is {}".format(modroot))
-    for path in texture_paths:
-        if (modroot in path.path):
-            print_trace("{} is local path".format(path.path))
-            if (path.path in data_files):
-                print_trace("{} exists in data_files".format(path.path))
+    print_trace("modroot is {}", modroot)
+    for (path, occurrences) in texture_paths.items():
+        if (modroot in path):
+            print_trace("{} is local path", path)
+            if (path in data_files):
+                print_trace("{} exists in data_files", path)
+                ref = next((ref for ref in occurrences if ref.entry_name == "hiddenselectionstextures"), None)
+                if (texture_headers is not None and ref is not None and path in texture_headers):
+                    if (not check_texture(path, texture_headers[path], ref)):
+                        errors.append(path)
+            else:
+                refs = list(occurrences)
+                print_warning("File {} could not be found! Referenced by {} entries:\n    {}", path, len(refs), "\n    ".join(ref.referrer() for ref in refs), config_path=" >> ".join(refs[0].parents), prop=refs[0].entry_name, value=path)
+                errors.append(path)
+        elif (external_files is not None):
+            if (path in external_files or path in data_files):
+                print_trace("{} exists in dependencies", path)
             else:
-                print_warning("File {} could not be found!".format(path))
+                refs = list(occurrences)
+                print_warning("External file {} could not be found in the dependencies! Referenced by {} entries:\n    {}", path, len(refs), "\n    ".join(ref.referrer() for ref in refs), config_path=" >> ".join(refs[0].parents), prop=refs[0].entry_name, value=path)
                 errors.append(path)
         else:
-            print_trace("{} is not local path, skipping".format(path))
+            print_trace("{} is not local path, skipping", path)
             continue
 
     return (len(errors) == 0)
 
+def load_dependency_files(dirs, index_path, jobs):
+    # returns the paths of all files in the dependency pbos, only pbos changed since the last run are read
+    if (index_path is None):
+        index_path = os.path.join(os.path.dirname(build_dir) if build_dir != "" else os.path.join(root_dir, ".hemttout"), "dependency_files.json.gz")
+
+    index = dependency_index.FileIndex(index_path, __version__)
+    pbo_files = dependency_index.grab_dependency_pbo_files(dirs)
+    indexed = index.update(pbo_files, jobs)
+    try:
+        index.save()
+    except OSError as e:
+        print_warning("Could not save the dependency index: {}", e)
+
+    external_files = index.files()
+    print_blue("Indexed {} dependency pbos ({} unchanged) with {} files", len(pbo_files), len(pbo_files) - indexed, len(external_files))
+    print_info('')
+    return external_files
+
+def strip_extension(path):
+    (head, sep, name) = path.rpartition("\\")
+    return head + sep + name.rsplit(".", 1)[0] if "." in name else path
+
+def is_referenced(path, referenced):
+    # config paths often leave out the extension, and script folders are referenced as a whole
+    if (path in referenced or strip_extension(path) in referenced):
+        return True
+    parent = path.rpartition("\\")[0]
+    while (parent != ""):
+        if (parent in referenced):
+            return True
+        parent = parent.rpartition("\\")[0]
+    return False
+
+def is_allowed(path, allow_list):
+    name = path.rpartition("\\")[2]
+    return any(fnmatch.fnmatchcase(name, pattern) or fnmatch.fnmatchcase(path, pattern) for pattern in allow_list)
+
+def add_model_refs(referenced, models, rvmat_textures, jobs):
+    # follows the referenced models to the textures, materials and proxies they use, until no new model turns up
+    scanned = set()
+    while True:
+        tasks = [(path, models[path]) for path in sorted(models) if path not in scanned and is_referenced(path, referenced)]
+        if (len(tasks) == 0):
+            break
+        for ((path, data), paths) in zip(tasks, parallel.map_ordered(read_model_paths, tasks, jobs)):
+            scanned.add(path)
+            referenced.update(paths)
+
+    if rvmat_textures is not None:
+        for path in [path for path in referenced if path in rvmat_textures]:
+            for (stage, texture) in rvmat_textures[path]:
+                texture = texture.lower()
+                referenced.add(texture if texture[0] == '\\' else '\\' + texture)
+
+def report_unused_files(contents, referenced, allow_list):
+    # lists the files of every addon that no config, material or model references
+    print_blue("Searching for unreferenced files...")
+    total_count = 0
+    total_size = 0
+    for (file, pbo_contents) in contents:
+        diagnostics.set_addon(file)
+        unused = [path for path in sorted(set(pbo_contents.data_files) - referenced) if not is_allowed(path, allow_list) and not is_referenced(path, referenced)]
+        if (len(unused) == 0):
+            continue
+        size = sum(pbo_contents.sizes[path] for path in unused)
+        for path in unused:
+            print_warning("File {} is not referenced by any config, material or model ({} bytes)", path, pbo_contents.sizes[path], value=path)
+        print_info("{} unreferenced files in {} take up {} bytes", len(unused), file, size)
+        total_count += len(unused)
+        total_size += size
+    diagnostics.set_addon(None)
+
+    print_blue("Found {} unreferenced files with {} bytes in total", total_count, total_size)
+    print_info('')
+
+def check_addon(task):
+    # validates a single addon against the shared data file index, may run in a worker process
+    global skip_no_extension, skip_editorpreview, report_textures, check_external
+    (data_files, external_files, rvmat_textures, texture_headers, skip_no_extension, skip_editorpreview, report_textures, report_unused) = parallel.shared()
+    check_external = external_files is not None
+    (file, pboprefix, config_bin) = task
+
+    diagnostics.set_addon(file)
+    print_blue("Checking paths in {}...", file)
+    referenced = set() if report_unused else None
+    success = check_pbo_paths(pboprefix,config_bin,data_files,external_files,rvmat_textures,texture_headers,referenced)
+    if (success):
+        print_blue("Paths in {} are valid!", file)
+    else:
+        print_error("Paths in {} contain errors!", file)
+    print_info('')
+    diagnostics.set_addon(None)
+
+    return (file, success, referenced)
+
 
 def main(argv):
-    print_blue("## check_paths.py, version {} ##\n".format(__version__))
+    print_blue("## check_paths.py, version {} ##\n", __version__)
 
     # parse args
     parser = argparse.ArgumentParser(description="This script checks all local paths referenced in hiddenSelectionsTextures[] entries in the output of this project's HEMTT build.")
@@ -370,10 +532,33 @@ def main(argv):
     parser.add_argument('-v', '--verbose',help='enables tracel-level logging',action='store_true')
     parser.add_argument('--skip-no-extension',help='skips file paths in config entries that do not have a file extension',action='store_true')
     parser.add_argument('--skip-editorpreview',help='skips file paths in config entries that refer to editorpreviews',action='store_true')
+    parser.add_argument('--skip-materials',help='skips checking the textures referenced by materials (rvmat files)',action='store_true')
+    parser.add_argument('--skip-texture-headers',help='skips validating the headers of textures referenced in hiddenSelectionsTextures[]',action='store_true')
+    parser.add_argument('--report-textures',help='prints format and resolution of every texture referenced in hiddenSelectionsTextures[]',action='store_true')
+    parser.add_argument('--report-unused',help='lists the files in every addon that no config, material or model references, configs of addons skipped with --only are not taken into account',action='store_true')
+    parser.add_argument('--allow-unused',help='file name or path patterns that are never reported as unreferenced, defaults to {}'.format(" ".join(UNUSED_ALLOW_LIST)),nargs='+',metavar='PATTERN',default=UNUSED_ALLOW_LIST)
     parser.add_argument('-o','--only',help='only run the path checks on the following addon',nargs='+')
+    parser.add_argument('--source',help='checks the addon source folders instead of the HEMTT build, config.cpp files are preprocessed and parsed directly',action='store_true')
+    parser.add_argument('-d','--dependencies',help='directories with the pbos of external dependencies, paths into them are checked as well',nargs='+',metavar='DIR')
+    parser.add_argument('--dependency-index',help='file to cache the dependency file index in, defaults to .hemttout/dependency_files.json.gz')
+    parallel.add_arguments(parser)
+    diagnostics.add_arguments(parser)
+    profiling.add_arguments(parser)
     args = parser.parse_args()
-    global enable_trace
-    enable_trace = args.verbose
+    diagnostics.configure_from_args("check_paths.py", __version__, args)
+    if (profiling.configure_from_args("check_paths.py", args)):
+        profiling.instrument(globals(), {
+            "grab_built_pbos": "load pbos",
+            "read_pbo_data_files": "read pbo contents",
+            "read_source_data_files": "read addon sources",
+            "recurse_paths": "traverse config",
+            "parse_rvmats": "parse materials",
+            "read_texture_headers": "read texture headers",
+            "load_dependency_files": "index dependencies",
+            "add_model_refs": "read models",
+            "report_unused_files": "find unreferenced files",
+            "check_pbo_paths": "check paths"
+        })
 
     global skip_no_extension
     skip_no_extension = args.skip_no_extension
@@ -381,38 +566,85 @@ def main(argv):
     global skip_editorpreview
     skip_editorpreview = args.skip_editorpreview
 
+    global check_external
+    check_external = args.dependencies is not None
+
+    global report_textures
+    report_textures = args.report_textures
+
     global root_dir
     root_dir = os.path.abspath(args.directory)
-    print_trace("setting root_dir to {}".format(root_dir))
+    print_trace("setting root_dir to {}", root_dir)
 
     global only_list
     only_list = args.only
-    print_trace("setting only_list to {}".format(only_list))
+    print_trace("setting only_list to {}", only_list)
 
     # preliminary stuffs
     global build_dir
-    try:
-        build_dir = find_build_dir(root_dir)
-    except:
-        print_error("An exception occurred while attempting to find the build directory!")
-        sys.exit(1)
+    errors = []
+    preprocessor = None
+    if (args.source):
+        sources = grab_source_addons(root_dir)
+        preprocessor = Preprocessor(root_dir, {prefix.lower(): directory for (name, directory, prefix) in sources})
+        addons = [(name, prefix.lower(), directory) for (name, directory, prefix) in sources]
+    else:
+        try:
+            build_dir = find_build_dir(root_dir)
+        except:
+            print_error("An exception occurred while attempting to find the build directory!")
+            sys.exit(1)
 
-    pbos = grab_built_pbos(build_dir)
+        addons = [(file, pbo.pbo_header.header_extension.strings[1].lower(), pbo) for (file, pbo) in grab_built_pbos(build_dir)]
 
     # actually run the checks
-    errors = []
     data_files = []
     config_bins = {}
-    for (file,pbo) in pbos:
+    rvmats = {}
+    models = {}
+    contents = []
+    for (file, pboprefix, source) in addons:
         # first pass, read all data files from all pbos to match cross-refs
-        print_trace("reading data files from pbo {}".format(file))
-        pbo_files = read_pbo_data_files(pbo)
+        diagnostics.set_addon(file)
+        print_trace("reading data files from {}", file)
+        if (args.source):
+            try:
+                pbo_files = read_source_data_files(pboprefix, source, preprocessor)
+            except (Preprocessor_Error, CFG_Error, OSError) as e:
+                print_error("Config of {} could not be read: {}", file, e)
+                errors.append(file)
+                continue
+        else:
+            pbo_files = read_pbo_data_files(source)
         data_files += pbo_files[0]
         config_bins[file] = pbo_files[1]
+        rvmats.update(pbo_files[2])
+        if (args.report_unused):
+            models.update(pbo_files[3])
+            contents.append((file, pbo_files))
+    diagnostics.set_addon(None)
+
+    rvmat_textures = None
+    if (not args.skip_materials):
+        rvmat_textures = parse_rvmats(rvmats, args.jobs)
+
+    texture_headers = None
+    if (not args.skip_texture_headers):
+        if (args.source):
+            texture_headers = read_texture_headers([(pboprefix, source) for (file, pboprefix, source) in addons], args.jobs, read_source_texture_headers)
+        else:
+            texture_headers = read_texture_headers([os.path.join(build_dir,'addons',file) for (file, pboprefix, pbo) in addons], args.jobs)
+
+    data_files = set(data_files)  # remove duplicates
 
-    data_files = list(set(data_files))  # remove duplicates
+    external_files = None
+    if (check_external):
+        external_files = load_dependency_files(args.dependencies, args.dependency_index, args.jobs)
 
-    for (file,pbo) in pbos:
+    tasks = []
+    for (file, pboprefix, source) in addons:
+        if (file not in config_bins):
+            continue
         skip = False
         if (not only_list is None):
             skip = True
@@ -420,23 +652,30 @@ def main(argv):
                 if (it in file):
                     skip = False
         if (skip):
-            print_trace("{} not in only_list, skipping".format(file))
+            print_trace("{} not in only_list, skipping", file)
             continue
 
-        print_blue("Checking paths in {}...".format(file))
-        success = check_pbo_paths(pbo,config_bins[file],data_files)
-        if (success):
-            print_blue("Paths in {} are valid!".format(file))
-        else:
-            print_error("Paths in {} contain errors!".format(file))
+        tasks.append((file, pboprefix, config_bins[file]))
+
+    # second pass, validate the addons in parallel against the shared index
+    shared = (data_files, external_files, rvmat_textures, texture_headers, skip_no_extension, skip_editorpreview, report_textures, args.report_unused)
+    referenced = set()
+    for (file, success, addon_referenced) in parallel.map_ordered(check_addon, tasks, args.jobs, shared):
+        if (not success):
             errors.append(file)
-        print('')
+        if (addon_referenced is not None):
+            referenced.update(addon_referenced)
+
+    if (args.report_unused):
+        add_model_refs(referenced, models, rvmat_textures, args.jobs)
+        checked = set(file for (file, pboprefix, config_bin) in tasks)
+        report_unused_files([(file, pbo_contents) for (file, pbo_contents) in contents if file in checked], referenced, [pattern.lower() for pattern in args.allow_unused])
 
     if (len(errors) == 0):
         print_green("Validation of all addons' paths succeeded!")
         sys.exit(0)
     else:
-        print_error("Validation of one or more addons' paths failed: {}".format(errors))
+        print_error("Validation of one or more addons' paths failed: {}", errors)
         sys.exit(1)
 
 
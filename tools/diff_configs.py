@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# File: diff_configs.py
+# Author: Mokka
+#
+# Description: Lists the structural changes of the configs between two builds
+#
+# Usage: python ./tools/diff_configs.py OLD NEW
+#
+
+# The MIT License (MIT)
+
+# Copyright (c) 2026-2026 Mokka
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+###############################################################################
+
+__version__ = "0.1"
+
+import sys
+
+if sys.version_info[0] == 2:
+    print("Python 3 is required.")
+    sys.exit(1)
+
+import os
+import io
+import argparse
+from utils import data_rap as rap
+from utils import diagnostics
+from utils import parallel
+from utils import profiling
+from utils.diagnostics import print_error, print_warning, print_trace, print_info, print_green, print_blue
+from utils.data_cfg import CFG_Reader, CFG_Error
+from utils.manifest import hash_buffer
+from utils.pbo_layout import open_pbo, PBOLayout_Error
+
+def resolve_build_dir(dir):
+    # accepts the project directory, its .hemttout folder or the build directory itself
+    for candidate in (os.path.join(dir, '.hemttout', 'build'), os.path.join(dir, 'build'), dir):
+        if (os.path.isdir(candidate)):
+            print_trace("using build dir: {}", candidate)
+            return candidate
+    raise Exception("NoBuildDir","Build directory could not be found: {}".format(dir))
+
+def grab_built_pbo_files(dir):
+    # return all pbos of the build as {name relative to the build dir: path}
+    pbos = {}
+    for (path, dirs, files) in os.walk(dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.lower().endswith(".pbo"):
+                filepath = os.path.join(path, file)
+                pbos[os.path.relpath(filepath, dir).replace(os.sep, "/")] = filepath
+    print_trace("pbo files returned: {}", pbos)
+
+    return pbos
+
+def read_config_digests(task):
+    # returns the hashes of the stored configs of a pbo, may run in a worker process
+    (name, filepath) = task
+    diagnostics.set_addon(name)
+    digests = {}
+    try:
+        with open_pbo(filepath) as (layout, buffer):
+            for entry in layout.entries:
+                if entry.filename.lower().endswith("config.bin"):
+                    digests[entry.filename.replace("\\", "/").lower()] = hash_buffer(buffer, entry.offset, entry.end)
+    except (OSError, PBOLayout_Error) as e:
+        print_error("PBO could not be read: {}", e)
+        digests = None
+    diagnostics.set_addon(None)
+
+    return digests
+
+def read_config(task):
+    # parses one config of a pbo, may run in a worker process
+    (name, filepath, filename) = task
+    diagnostics.set_addon(name)
+    output = None
+    try:
+        with open_pbo(filepath) as (layout, buffer):
+            for entry in layout.entries:
+                if entry.filename.replace("\\", "/").lower() != filename:
+                    continue
+                if entry.compressed:
+                    print_error("Config {} is compressed and cannot be read", entry.filename)
+                    break
+                with layout.data(buffer, entry) as data:
+                    output = rap.RAP_Reader.read_raw(io.BufferedReader(io.BytesIO(bytes(data))))
+                break
+    except Exception as e:
+        print_error("Config {} could not be read: {}", filename, e)
+    diagnostics.set_addon(None)
+
+    return output
+
+def format_entry(entry):
+    if entry.type == rap.RAP.EntryType.CLASS:
+        return "class %s%s" % (entry.name, ": " + entry.body.inherits if entry.body.inherits != "" else "")
+    elif entry.type == rap.RAP.EntryType.ARRAY:
+        return "%s[] %s %s" % (entry.name, "+=" if entry.flag is not None else "=", format_value(entry))
+    elif entry.type == rap.RAP.EntryType.SCALAR:
+        return "%s = %s" % (entry.name, format_value(entry))
+    return str(entry)
+
+def format_value(value):
+    if value.type == rap.RAP.EntryType.ARRAY:
+        elements = value.body.elements if hasattr(value, "body") else value.elements
+        return "{%s}" % ", ".join(format_value(element) for element in elements)
+    elif value.subtype == rap.RAP.EntrySubType.STRING:
+        return '"%s"' % value.value.replace('"', '""')
+    elif value.subtype == rap.RAP.EntrySubType.FLOAT:
+        return "%g" % value.value
+    return str(value.value)
+
+def diff_bodies(old, new, path, changes):
+    # only descends into classes whose content hashes differ, identical subtrees are skipped as a whole
+    if (old.content_hash == new.content_hash):
+        return
+    if (old.inherits.lower() != new.inherits.lower()):
+        changes.append(("~", path, "inherits {} -> {}".format(old.inherits or "nothing", new.inherits or "nothing")))
+
+    old_entries = {entry.name.lower(): entry for entry in old.entries}
+    new_entries = {entry.name.lower(): entry for entry in new.entries}
+    for (key, entry) in old_entries.items():
+        if (key not in new_entries):
+            changes.append(("-", path, format_entry(entry)))
+    for (key, entry) in new_entries.items():
+        previous = old_entries.get(key)
+        if (previous is None):
+            changes.append(("+", path, format_entry(entry)))
+        elif (previous.type == rap.RAP.EntryType.CLASS and entry.type == rap.RAP.EntryType.CLASS):
+            diff_bodies(previous.body, entry.body, path + (entry.name,), changes)
+        elif (rap.RAP.entry_key(previous) != rap.RAP.entry_key(entry)):
+            changes.append(("~", path, "{} -> {}".format(format_entry(previous), format_entry(entry))))
+
+def collect_bodies(body, path, addon, bodies):
+    for entry in body.entries:
+        if (entry.type == rap.RAP.EntryType.CLASS):
+            if (len(entry.body.entries) > 0):
+                bodies.setdefault(entry.body.content_hash, []).append((addon, path + (entry.name,)))
+            collect_bodies(entry.body, path + (entry.name,), addon, bodies)
+
+def find_duplicate_bodies(configs):
+    # classes in different addons whose bodies, including everything nested, are identical
+    bodies = {}
+    for ((name, filename), cfg) in sorted(configs.items()):
+        collect_bodies(cfg.body, (), name, bodies)
+
+    duplicates = []
+    for classes in bodies.values():
+        if (len(set(addon for (addon, path) in classes)) > 1):
+            duplicates.append(classes)
+    duplicates.sort()
+    return duplicates
+
+def print_changes(title, changes):
+    print_blue("{}:", title)
+    for (kind, path, change) in changes:
+        print_info("  {} {}{}", kind, "".join("{} >> ".format(part) for part in path), change)
+
+def diff_text_configs(old, new):
+    # compares two config text files, like the generated .hpp files, returns the number of changes
+    old_cfg = CFG_Reader.read_file(old)
+    new_cfg = CFG_Reader.read_file(new)
+    changes = []
+    diff_bodies(old_cfg.body, new_cfg.body, (), changes)
+    if (len(changes) > 0):
+        print_changes(new, changes)
+    return len(changes)
+
+def read_configs(tasks, jobs):
+    # returns {(name, filename): root} of the configs that could be parsed and [(name, filename)] of those that could not
+    configs = {}
+    failed = []
+    for ((name, filepath, filename), cfg) in zip(tasks, parallel.map_ordered(read_config, tasks, jobs)):
+        if (cfg is not None):
+            configs[(name, filename)] = cfg
+        else:
+            failed.append((name, filename))
+    return (configs, failed)
+
+
+def main(argv):
+    print_blue("## diff_configs.py, version {} ##\n", __version__)
+
+    # parse args
+    parser = argparse.ArgumentParser(description="This script lists the classes and properties that changed between the configs of two HEMTT builds or two config text files.")
+    parser.add_argument('old',help='project, .hemttout or build directory of the old build, or an old config text file')
+    parser.add_argument('new',help='project, .hemttout or build directory of the new build, or a new config text file')
+    parser.add_argument('-v', '--verbose',help='enables tracel-level logging',action='store_true')
+    parser.add_argument('--duplicates',help='also lists classes of the new build whose bodies are identical in several addons',action='store_true')
+    parallel.add_arguments(parser)
+    diagnostics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    diagnostics.configure_from_args("diff_configs.py", __version__, args)
+    if (profiling.configure_from_args("diff_configs.py", args)):
+        profiling.instrument(globals(), {
+            "grab_built_pbo_files": "list pbos",
+            "read_config_digests": "hash configs",
+            "read_config": "parse configs",
+            "diff_text_configs": "diff config text",
+            "diff_bodies": "diff configs",
+            "find_duplicate_bodies": "find duplicate classes"
+        })
+
+    # two config text files without preprocessor directives are parsed and compared directly
+    if (os.path.isfile(args.old) and os.path.isfile(args.new)):
+        try:
+            count = diff_text_configs(args.old, args.new)
+        except (OSError, CFG_Error) as e:
+            print_error("Config text could not be read: {}", e)
+            sys.exit(1)
+        print_green("\n{} changes", count)
+        sys.exit(0)
+
+    try:
+        old_pbos = grab_built_pbo_files(resolve_build_dir(os.path.abspath(args.old)))
+        new_pbos = grab_built_pbo_files(resolve_build_dir(os.path.abspath(args.new)))
+    except Exception as e:
+        print_error("An exception occurred while attempting to find the build directories: {}", e)
+        sys.exit(1)
+
+    # configs whose stored bytes are unchanged are not parsed at all
+    names = sorted(set(old_pbos) | set(new_pbos))
+    old_digests = dict(zip(old_pbos, parallel.map_ordered(read_config_digests, list(old_pbos.items()), args.jobs)))
+    new_digests = dict(zip(new_pbos, parallel.map_ordered(read_config_digests, list(new_pbos.items()), args.jobs)))
+    errors = [name for name in names if old_digests.get(name, {}) is None or new_digests.get(name, {}) is None]
+
+    changed = []
+    for name in names:
+        if (name not in new_pbos):
+            print_info("- {}", name)
+        elif (name not in old_pbos):
+            print_info("+ {}", name)
+        elif (name not in errors):
+            for filename in sorted(set(old_digests[name]) | set(new_digests[name])):
+                if (old_digests[name].get(filename) != new_digests[name].get(filename)):
+                    changed.append((name, filename))
+    print_trace("configs changed: {}", changed)
+
+    old_tasks = [(name, old_pbos[name], filename) for (name, filename) in changed if filename in old_digests[name]]
+    if (args.duplicates):
+        new_tasks = [(name, new_pbos[name], filename) for name in sorted(new_pbos) if name not in errors for filename in sorted(new_digests[name])]
+    else:
+        new_tasks = [(name, new_pbos[name], filename) for (name, filename) in changed if filename in new_digests[name]]
+    (old_configs, old_failed) = read_configs(old_tasks, args.jobs)
+    (new_configs, new_failed) = read_configs(new_tasks, args.jobs)
+    for key in old_failed + new_failed:
+        if (key not in errors):
+            errors.append(key)
+
+    count = 0
+    for (name, filename) in changed:
+        if ((name, filename) in errors):
+            continue
+        changes = []
+        # configs that only exist in one of the builds are compared against an empty one
+        empty = rap.RAP.ClassBody()
+        diff_bodies(old_configs[(name, filename)].body if (name, filename) in old_configs else empty, new_configs[(name, filename)].body if (name, filename) in new_configs else empty, (), changes)
+        if (len(changes) == 0):
+            continue
+        print_changes("{} ({})".format(name, filename), changes)
+        count += len(changes)
+
+    if (args.duplicates):
+        print_blue("\nClasses with identical bodies in several addons:")
+        for classes in find_duplicate_bodies(new_configs):
+            print_info("  {}", ", ".join("{} ({})".format(" >> ".join(path), addon) for (addon, path) in classes))
+
+    if (len(errors) == 0):
+        print_green("\n{} changes in {} configs", count, len(changed))
+        sys.exit(0)
+    else:
+        print_error("Reading one or more pbos or configs has failed: {}", errors)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# File: export_ref_graph.py
+# Author: Mokka
+#
+# Description: Exports the cross-addon reference graph of classes and files
+#
+# Usage: python ./tools/export_ref_graph.py
+#
+###############################################################################
+
+# The MIT License (MIT)
+
+# Copyright (c) 2026-2026 Mokka
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+###############################################################################
+
+__version__ = "0.1"
+
+import sys
+
+if sys.version_info[0] == 2:
+    print("Python 3 is required.")
+    sys.exit(1)
+
+from yapbol import PBOFile
+import os
+import argparse
+import io
+from utils import data_rap as rap
+from utils import diagnostics
+from utils import profiling
+from utils.diagnostics import print_error, print_warning, print_trace, print_info, print_green, print_blue
+from utils.ref_graph import RefGraph, RefGraph_Error
+
+# Set Globals
+root_dir = ""
+build_dir = ""
+only_list = []
+property_blacklist = ['hardpoints']
+
+class ConfigBin:
+    def __init__(self, data, prefix):
+        self.data = data
+        self.prefix = prefix
+
+    def __repr__(self):
+        return "ConfigBin(data={}, prefix={})".format(self.data, self.prefix)
+
+def find_build_dir(pwd):
+    # check if we find the .hemttout folder here, otherwise try one directory further up
+    print_trace("Searching for .hemttout in {}", pwd)
+    hemttout_dir = os.path.join(pwd,'.hemttout')
+    if (os.path.isdir(hemttout_dir)):
+        print_trace("Searching for build dir in {}", hemttout_dir)
+        build_dir = os.path.join(hemttout_dir,'build')
+        if (os.path.isdir(build_dir)):
+            print_trace("HEMTT build dir found: {}", build_dir)
+            return build_dir
+        else:
+            raise Exception("NoBuildDir","HEMTT build output directory could not be found!")
+    else:
+        return find_build_dir(os.path.join(pwd,'..'))
+
+def grab_built_pbos(dir):
+    # return all built pbos as PBOFile objects
+    addons_dir = os.path.join(dir,'addons')
+    print_trace("grabbing pbo files from addons dir: {}", addons_dir)
+    addons_pbos = next(os.walk(addons_dir), (None, None, []))[2]
+    print_trace("pbo files returned: {}", addons_pbos)
+
+    pbos = []
+
+    for file in addons_pbos:
+        print_trace("reading pbo file: {}", file)
+        pbo = PBOFile.read_file(os.path.join(addons_dir,file))
+        pbos.append([file,pbo])
+
+    return pbos
+
+def read_pbo_contents(pbo):
+    # grab pboprefix to find root path
+    pboprefix = pbo.pbo_header.header_extension.strings[1].lower()
+    searchprefix = pboprefix.split('\\')[1]
+    print_trace("found pboprefix as {}, searchprefix as {}", pboprefix,searchprefix)
+
+    # grab all files within the data directory and the config.bin
+    config_bin = []
+    data_files = []
+    for file in pbo:
+        filename = "\\" + pboprefix + "\\" + file.filename.lower()
+        if (not ".hpp" in filename):
+            data_files.append(filename)
+
+        if "config.bin" in filename:
+            print_trace("found config.bin")
+            config_bin.append(ConfigBin(rap.RAP_Reader.read_raw(io.BufferedReader(io.BytesIO(file.data))), searchprefix))
+
+    if (len(config_bin) == 0):
+        print_warning("PBO does not contain a config.bin!")
+
+    return (data_files, config_bin)
+
+def get_owner_classes(cfg_root):
+    # classes directly inside a root class (configFile >> 'CfgWeapons' >> 'x') own everything below them
+    for container in cfg_root.entries:
+        if container.type != rap.RAP.EntryType.CLASS:
+            continue
+        for entry in container.body.entries:
+            if entry.type == rap.RAP.EntryType.CLASS:
+                yield (container.name, entry)
+
+def is_file_ref(value):
+    # file paths have at least one directory and a file extension
+    return ("\\" in value) and ("." in value.split("\\")[-1])
+
+def is_class_ref(value, searchprefix, known_classes):
+    if (value in known_classes):
+        return True
+    return (value.find(searchprefix) == 0) and (not "_fnc_" in value)
+
+def add_ref_from_entry(graph, node, entry, searchprefix, known_classes, prop):
+    if (entry.subtype != rap.RAP.EntrySubType.STRING):
+        return
+
+    value = entry.value.lower()
+    if (is_file_ref(value)):
+        graph.add_edge(node, graph.add_node(RefGraph.NodeType.FILE, value), RefGraph.EdgeType.FILE_REF, prop)
+    elif (prop.split(" >> ")[-1].lower() in property_blacklist):
+        return
+    elif (is_class_ref(value, searchprefix, known_classes)):
+        # a class name in a string does not say its container, link every class of that name
+        # and keep the bare name if none is defined in the build
+        for container in known_classes.get(value, [None]):
+            target = value if container is None else RefGraph.class_path(container, value)
+            graph.add_edge(node, graph.add_node(RefGraph.NodeType.CLASS, target), RefGraph.EdgeType.CLASS_REF, prop)
+
+def recurse_refs(graph, node, cfg, searchprefix, known_classes, parents=[]):
+    for entry in cfg.entries:
+        prop = " >> ".join(parents + [entry.name])
+        if entry.type == rap.RAP.EntryType.CLASS:
+            recurse_refs(graph, node, entry.body, searchprefix, known_classes, parents + [entry.name])
+        elif entry.type == rap.RAP.EntryType.ARRAY:
+            for subentry in entry.body.elements:
+                add_ref_from_entry(graph, node, subentry, searchprefix, known_classes, prop)
+        elif entry.type == rap.RAP.EntryType.SCALAR:
+            add_ref_from_entry(graph, node, entry, searchprefix, known_classes, prop)
+
+def add_config_to_graph(graph, addon_node, config, known_classes):
+    for (container, entry) in get_owner_classes(config.data.body):
+        node = graph.add_node(RefGraph.NodeType.CLASS, RefGraph.class_path(container, entry.name))
+        graph.add_edge(addon_node, node, RefGraph.EdgeType.CONTAINS, container)
+        if (entry.body.inherits != ""):
+            # the parent is looked up in the same container
+            parent = graph.add_node(RefGraph.NodeType.CLASS, RefGraph.class_path(container, entry.body.inherits))
+            graph.add_edge(node, parent, RefGraph.EdgeType.INHERITS)
+
+        recurse_refs(graph, node, entry.body, config.prefix, known_classes)
+
+def build_graph(pbos):
+    graph = RefGraph()
+
+    # first pass, register all addons, their files and the classes they define to match cross-refs
+    # {lowercase class name: [containers defining it]}
+    known_classes = {}
+    config_bins = {}
+    for (file,pbo) in pbos:
+        print_trace("reading contents of pbo {}", file)
+        addon_node = graph.add_node(RefGraph.NodeType.ADDON, file)
+        data_files, config_bins[file] = read_pbo_contents(pbo)
+        for path in data_files:
+            graph.add_edge(addon_node, graph.add_node(RefGraph.NodeType.FILE, path), RefGraph.EdgeType.CONTAINS)
+        for config in config_bins[file]:
+            for (container, entry) in get_owner_classes(config.data.body):
+                containers = known_classes.setdefault(entry.name.lower(), [])
+                if (container not in containers):
+                    containers.append(container)
+
+    # second pass, collect inheritance, class and file references
+    for (file,pbo) in pbos:
+        print_trace("collecting references from pbo {}", file)
+        addon_node = graph.find_node(RefGraph.NodeType.ADDON, file)
+        for config in config_bins[file]:
+            add_config_to_graph(graph, addon_node, config, known_classes)
+
+    graph.freeze()
+    return graph
+
+def guess_node_type(name):
+    if (name.lower().endswith(".pbo")):
+        return RefGraph.NodeType.ADDON
+    if (is_file_ref(name)):
+        return RefGraph.NodeType.FILE
+    return RefGraph.NodeType.CLASS
+
+def resolve_target(graph, target):
+    # classes may be given without their container if the name is unique
+    type = guess_node_type(target)
+    if (type != RefGraph.NodeType.CLASS or ">>" in target or graph.find_node(type, target) is not None):
+        return (type, target)
+
+    paths = graph.find_classes(target)
+    if (len(paths) > 1):
+        raise RefGraph_Error("Ambiguous class node: {}, use one of {}".format(target, ", ".join(paths)))
+    return (type, paths[0] if len(paths) == 1 else target)
+
+def print_users(graph, target):
+    users = graph.users(*resolve_target(graph, target))
+    print_blue("{} is used by {} entries:", target, len(users))
+    for edge in users:
+        print_info("    {}", edge)
+    print_info('')
+
+def print_impact(graph, target):
+    impact = graph.impact(*resolve_target(graph, target))
+    print_blue("Deleting {} affects {} classes:", target, len(impact))
+    for (name, distance) in sorted(impact.items(), key=lambda item: (item[1], item[0])):
+        print_info("    [{}] {}", distance, name)
+    print_info('')
+
+
+def main(argv):
+    print_blue("## export_ref_graph.py, version {} ##\n", __version__)
+
+    # parse args
+    parser = argparse.ArgumentParser(description="This script exports the reference graph between classes, files and addons in the output of this project's HEMTT build.")
+    parser.add_argument('directory',nargs='?',help='directory to operate on',default='.')
+    parser.add_argument('-v', '--verbose',help='enables tracel-level logging',action='store_true')
+    parser.add_argument('-f', '--format',help='export formats to write',nargs='+',choices=['json','graphml','sqlite'],default=[])
+    parser.add_argument('--output',help='output path without file extension, defaults to .hemttout/ref_graph')
+    parser.add_argument('--users',help='list the direct users of the following classes (e.g. CfgVehicles>>Name), files or addons',nargs='+',default=[])
+    parser.add_argument('--impact',help='list all classes affected by deleting the following classes or files',nargs='+',default=[])
+    diagnostics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    diagnostics.configure_from_args("export_ref_graph.py", __version__, args)
+    if (profiling.configure_from_args("export_ref_graph.py", args)):
+        profiling.instrument(globals(), {
+            "grab_built_pbos": "load pbos",
+            "read_pbo_contents": "read pbo contents",
+            "recurse_refs": "traverse config",
+            "build_graph": "build graph"
+        })
+
+    global root_dir
+    root_dir = os.path.abspath(args.directory)
+    print_trace("setting root_dir to {}", root_dir)
+
+    # preliminary stuffs
+    global build_dir
+    try:
+        build_dir = find_build_dir(root_dir)
+    except:
+        print_error("An exception occurred while attempting to find the build directory!")
+        sys.exit(1)
+
+    pbos = grab_built_pbos(build_dir)
+    graph = build_graph(pbos)
+    print_blue("Built reference graph with {} nodes and {} edges", len(graph), len(graph.edge_source))
+    print_info('')
+
+    output = args.output
+    if (output is None):
+        output = os.path.join(os.path.dirname(build_dir), "ref_graph")
+
+    writers = {'json': graph.write_json, 'graphml': graph.write_graphml, 'sqlite': graph.write_sqlite}
+    for fmt in args.format:
+        filepath = "{}.{}".format(output, fmt if fmt != 'sqlite' else 'db')
+        writers[fmt](filepath)
+        print_blue("Wrote reference graph to file: {}", filepath)
+
+    errors = []
+    for target in args.users:
+        try:
+            print_users(graph, target)
+        except RefGraph_Error as e:
+            print_error(e)
+            errors.append(target)
+
+    for target in args.impact:
+        try:
+            print_impact(graph, target)
+        except RefGraph_Error as e:
+            print_error(e)
+            errors.append(target)
+
+    if (len(errors) == 0):
+        sys.exit(0)
+    else:
+        print_error("Querying one or more nodes failed: {}", errors)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
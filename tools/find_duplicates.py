@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# File: find_duplicates.py
+# Author: Mokka
+#
+# Description: Finds files that are stored with identical content in several places of the build
+#
+# Usage: python ./tools/find_duplicates.py
+#
+
+# The MIT License (MIT)
+
+# Copyright (c) 2026-2026 Mokka
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+###############################################################################
+
+__version__ = "0.1"
+
+import sys
+
+if sys.version_info[0] == 2:
+    print("Python 3 is required.")
+    sys.exit(1)
+
+import os
+import argparse
+from utils import diagnostics
+from utils import parallel
+from utils import profiling
+from utils.diagnostics import print_error, print_warning, print_trace, print_info, print_green, print_blue
+from utils.manifest import hash_buffer
+from utils.pbo_layout import open_pbo, PBOLayout_Error
+
+# Set Globals
+root_dir = ""
+build_dir = ""
+
+def find_build_dir(pwd):
+    # check if we find the .hemttout folder here, otherwise try one directory further up
+    print_trace("Searching for .hemttout in {}", pwd)
+    hemttout_dir = os.path.join(pwd,'.hemttout')
+    if (os.path.isdir(hemttout_dir)):
+        print_trace("Searching for build dir in {}", hemttout_dir)
+        build_dir = os.path.join(hemttout_dir,'build')
+        if (os.path.isdir(build_dir)):
+            print_trace("HEMTT build dir found: {}", build_dir)
+            return build_dir
+        else:
+            raise Exception("NoBuildDir","HEMTT build output directory could not be found!")
+    else:
+        return find_build_dir(os.path.join(pwd,'..'))
+
+def grab_built_pbo_files(dir):
+    # return all pbos of the build as (name relative to the build dir, path)
+    pbos = []
+    for (path, dirs, files) in os.walk(dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.lower().endswith(".pbo"):
+                filepath = os.path.join(path, file)
+                pbos.append((os.path.relpath(filepath, dir).replace(os.sep, "/"), filepath))
+    print_trace("pbo files returned: {}", pbos)
+
+    return pbos
+
+def read_pbo_entries(task):
+    # returns (path, entry index, stored size) of every entry of a pbo, may run in a worker process
+    (name, filepath) = task
+    diagnostics.set_addon(name)
+    entries = []
+    valid = True
+    try:
+        with open_pbo(filepath) as (layout, buffer):
+            prefix = layout.prefix.strip("\\")
+            for (idx, entry) in enumerate(layout.entries):
+                entries.append(("\\%s\\%s" % (prefix, entry.filename), idx, entry.data_size))
+    except (OSError, PBOLayout_Error) as e:
+        print_error("PBO could not be read: {}", e)
+        valid = False
+    diagnostics.set_addon(None)
+
+    return (name, entries, valid)
+
+def group_by_size(pbos, entries_by_pbo, min_size):
+    # only entries sharing their size with another one can be duplicates, returns the entries to hash per pbo
+    buckets = {}
+    for (name, entries) in entries_by_pbo.items():
+        for (path, idx, size) in entries:
+            if (size >= max(min_size, 1)):
+                buckets.setdefault(size, []).append((name, idx))
+
+    candidates = {}
+    for bucket in buckets.values():
+        if (len(bucket) > 1):
+            for (name, idx) in bucket:
+                candidates.setdefault(name, []).append(idx)
+
+    return [(name, filepath, sorted(candidates[name])) for (name, filepath) in pbos if name in candidates]
+
+def hash_pbo_entries(task):
+    # hashes the stored data of the given entries of a pbo as slices of the memory mapped file, may run in a worker process
+    (name, filepath, indices) = task
+    diagnostics.set_addon(name)
+    hashes = {}
+    valid = True
+    try:
+        with open_pbo(filepath) as (layout, buffer):
+            for idx in indices:
+                entry = layout.entries[idx]
+                hashes[idx] = hash_buffer(buffer, entry.offset, entry.end)
+    except (OSError, PBOLayout_Error) as e:
+        print_error("PBO could not be read: {}", e)
+        valid = False
+    diagnostics.set_addon(None)
+
+    return (name, hashes, valid)
+
+def find_duplicates(entries_by_pbo, hashes_by_pbo):
+    # returns groups of (size, [(pbo, path)]) with identical content, the most wasted bytes first
+    groups = {}
+    for (name, hashes) in hashes_by_pbo.items():
+        entries = entries_by_pbo[name]
+        for (idx, digest) in hashes.items():
+            (path, idx, size) = entries[idx]
+            groups.setdefault((size, digest), []).append((name, path))
+
+    duplicates = [(size, sorted(files)) for ((size, digest), files) in groups.items() if len(files) > 1]
+    duplicates.sort(key=lambda group: (-group[0] * (len(group[1]) - 1), group[1]))
+    return duplicates
+
+
+def main(argv):
+    print_blue("## find_duplicates.py, version {} ##\n", __version__)
+
+    # parse args
+    parser = argparse.ArgumentParser(description="This script finds files with identical content in the pbos of this project's HEMTT build.")
+    parser.add_argument('directory',nargs='?',help='directory to operate on',default='.')
+    parser.add_argument('-v', '--verbose',help='enables tracel-level logging',action='store_true')
+    parser.add_argument('--min-size',help='ignores files smaller than this many bytes, defaults to 1024',type=int,default=1024)
+    parallel.add_arguments(parser)
+    diagnostics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    diagnostics.configure_from_args("find_duplicates.py", __version__, args)
+    if (profiling.configure_from_args("find_duplicates.py", args)):
+        profiling.instrument(globals(), {
+            "grab_built_pbo_files": "list pbos",
+            "read_pbo_entries": "read headers",
+            "group_by_size": "group by size",
+            "hash_pbo_entries": "hash candidates",
+            "find_duplicates": "find duplicates"
+        })
+
+    global root_dir
+    root_dir = os.path.abspath(args.directory)
+    print_trace("setting root_dir to {}", root_dir)
+
+    # preliminary stuffs
+    global build_dir
+    try:
+        build_dir = find_build_dir(root_dir)
+    except:
+        print_error("An exception occurred while attempting to find the build directory!")
+        sys.exit(1)
+
+    pbos = grab_built_pbo_files(build_dir)
+    if (len(pbos) == 0):
+        print_error("No pbos found in {}", build_dir)
+        sys.exit(1)
+
+    errors = []
+    entries_by_pbo = {}
+    for (name, entries, valid) in parallel.map_ordered(read_pbo_entries, pbos, args.jobs):
+        if (not valid):
+            errors.append(name)
+        entries_by_pbo[name] = entries
+
+    tasks = group_by_size(pbos, entries_by_pbo, args.min_size)
+    print_trace("hashing {} candidates in {} pbos", sum(len(indices) for (name, filepath, indices) in tasks), len(tasks))
+    hashes_by_pbo = {}
+    for (name, hashes, valid) in parallel.map_ordered(hash_pbo_entries, tasks, args.jobs):
+        if (not valid and name not in errors):
+            errors.append(name)
+        hashes_by_pbo[name] = hashes
+
+    duplicates = find_duplicates(entries_by_pbo, hashes_by_pbo)
+    wasted = 0
+    for (size, files) in duplicates:
+        wasted += size * (len(files) - 1)
+        print_warning("{} copies of {} bytes, {} bytes wasted:\n    {}", len(files), size, size * (len(files) - 1), "\n    ".join("{} ({})".format(path, name) for (name, path) in files),
+            addon=files[0][0], value=files[0][1])
+
+    if (len(errors) == 0):
+        print_green("\nFound {} groups of duplicate files, {} bytes could be saved", len(duplicates), wasted)
+        sys.exit(0)
+    else:
+        print_error("Reading one or more pbos has failed: {}", errors)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# File: index_configs.py
+# Author: Mokka
+#
+# Description: Indexes the built configs into an SQLite database for ad-hoc queries
+#
+# Usage: python ./tools/index_configs.py
+#
+###############################################################################
+
+# The MIT License (MIT)
+
+# Copyright (c) 2026-2026 Mokka
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+###############################################################################
+
+__version__ = "0.1"
+
+import sys
+
+if sys.version_info[0] == 2:
+    print("Python 3 is required.")
+    sys.exit(1)
+
+from yapbol import PBOFile
+import os
+import argparse
+import io
+from utils import data_rap as rap
+from utils import diagnostics
+from utils import profiling
+from utils.diagnostics import print_error, print_warning, print_trace, print_info, print_green, print_blue
+from utils.config_index import ConfigIndex, ConfigIndex_Error
+
+# Set Globals
+root_dir = ""
+build_dir = ""
+
+def find_build_dir(pwd):
+    # check if we find the .hemttout folder here, otherwise try one directory further up
+    print_trace("Searching for .hemttout in {}", pwd)
+    hemttout_dir = os.path.join(pwd,'.hemttout')
+    if (os.path.isdir(hemttout_dir)):
+        print_trace("Searching for build dir in {}", hemttout_dir)
+        build_dir = os.path.join(hemttout_dir,'build')
+        if (os.path.isdir(build_dir)):
+            print_trace("HEMTT build dir found: {}", build_dir)
+            return build_dir
+        else:
+            raise Exception("NoBuildDir","HEMTT build output directory could not be found!")
+    else:
+        return find_build_dir(os.path.join(pwd,'..'))
+
+def grab_built_pbo_files(dir):
+    # return the paths of all built pbos
+    addons_dir = os.path.join(dir,'addons')
+    print_trace("grabbing pbo files from addons dir: {}", addons_dir)
+    addons_pbos = next(os.walk(addons_dir), (None, None, []))[2]
+    print_trace("pbo files returned: {}", addons_pbos)
+
+    return [os.path.join(addons_dir,file) for file in sorted(addons_pbos)]
+
+def index_pbo(index, filepath):
+    # returns False if the pbo could not be read, nothing of it is indexed then
+    name = os.path.basename(filepath)
+    try:
+        pbo = PBOFile.read_file(filepath)
+        pboprefix = pbo.pbo_header.header_extension.strings[1].lower()
+        print_trace("found pboprefix as {}", pboprefix)
+
+        configs = []
+        for file in pbo:
+            if "config.bin" in file.filename.lower():
+                print_trace("parsing {}", file.filename)
+                configs.append(rap.RAP_Reader.read_raw(io.BufferedReader(io.BytesIO(file.data))))
+    except Exception as e:
+        print_error("PBO {} could not be indexed: {}", name, e)
+        return False
+
+    # the source is only recorded for complete pbos, so a partial index is rebuilt on the next run
+    index.add_source(filepath)
+    for cfg in configs:
+        index.add_config(name, pboprefix, cfg)
+
+    return True
+
+def print_result(columns, rows):
+    print_info("\t".join(columns))
+    for row in rows:
+        print_info("\t".join("" if value is None else str(value) for value in row))
+    print_blue("({} rows)", len(rows))
+    print_info('')
+
+
+def main(argv):
+    print_blue("## index_configs.py, version {} ##\n", __version__)
+
+    # parse args
+    parser = argparse.ArgumentParser(
+        description="This script indexes all config.bin files in the output of this project's HEMTT build into an SQLite database and runs queries against it.",
+        epilog="example: python ./tools/index_configs.py -q \"SELECT class_path, number FROM class_properties WHERE class_path LIKE 'configFile >> CfgWeapons >> %' AND property = 'mass' AND number > 50\""
+    )
+    parser.add_argument('directory',nargs='?',help='directory to operate on',default='.')
+    parser.add_argument('-v', '--verbose',help='enables tracel-level logging',action='store_true')
+    parser.add_argument('--db',help='path of the index database, defaults to .hemttout/config_index.db')
+    parser.add_argument('--rebuild',help='rebuilds the index even if the build has not changed',action='store_true')
+    parser.add_argument('-q', '--query',help='SQL queries to run against the index',nargs='+',default=[])
+    diagnostics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    diagnostics.configure_from_args("index_configs.py", __version__, args)
+    if (profiling.configure_from_args("index_configs.py", args)):
+        profiling.instrument(globals(), {
+            "index_pbo": "index pbo"
+        })
+
+    global root_dir
+    root_dir = os.path.abspath(args.directory)
+    print_trace("setting root_dir to {}", root_dir)
+
+    # preliminary stuffs
+    global build_dir
+    try:
+        build_dir = find_build_dir(root_dir)
+    except:
+        print_error("An exception occurred while attempting to find the build directory!")
+        sys.exit(1)
+
+    db_path = args.db
+    if (db_path is None):
+        db_path = os.path.join(os.path.dirname(build_dir), "config_index.db")
+
+    pbo_files = grab_built_pbo_files(build_dir)
+
+    errors = []
+    with ConfigIndex(db_path) as index:
+        if (not args.rebuild and index.is_current(pbo_files)):
+            print_blue("Index {} is up to date", db_path)
+        else:
+            for filepath in pbo_files:
+                print_trace("reading pbo file: {}", filepath)
+                if (not index_pbo(index, filepath)):
+                    errors.append(os.path.basename(filepath))
+            class_count = len(index.classes)
+            property_count = len(index.properties)
+            index.commit()
+            print_blue("Indexed {} classes and {} properties from {} pbos into {}", class_count, property_count, len(pbo_files) - len(errors), db_path)
+        print_info('')
+
+        for query in args.query:
+            print_blue("> {}", query)
+            try:
+                print_result(*index.query(query))
+            except ConfigIndex_Error as e:
+                print_error(e)
+                errors.append(query)
+
+    if (len(errors) == 0):
+        sys.exit(0)
+    else:
+        print_error("Indexing one or more pbos or running one or more queries has failed: {}", errors)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
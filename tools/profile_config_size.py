@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# File: profile_config_size.py
+# Author: Mokka
+#
+# Description: Attributes the bytes of the built config.bin files to their classes and properties
+#
+# Usage: python ./tools/profile_config_size.py
+#
+
+# The MIT License (MIT)
+
+# Copyright (c) 2026-2026 Mokka
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+###############################################################################
+
+__version__ = "0.1"
+
+import sys
+
+if sys.version_info[0] == 2:
+    print("Python 3 is required.")
+    sys.exit(1)
+
+import os
+import io
+import argparse
+from utils import data_rap as rap
+from utils import diagnostics
+from utils import incremental
+from utils import parallel
+from utils import profiling
+from utils.diagnostics import print_error, print_warning, print_trace, print_info, print_green, print_blue
+from utils.pbo_layout import open_pbo, PBOLayout_Error
+
+# Set Globals
+root_dir = ""
+build_dir = ""
+
+HEADER_FRAME = "(file header)"
+
+
+class ConfigSizes():
+    # Byte sizes of configs, collected per pbo and merged in the main process.
+    # stacks maps collapsed stacks (frames joined by ";") to the bytes owned by
+    # exactly that frame, the other maps hold the totals including everything below.
+    def __init__(self):
+        self.stacks = {}
+        self.addons = {}
+        self.sections = {}
+        self.classes = {}
+        self.properties = {}
+
+    def merge(self, other):
+        for (target, source) in ((self.stacks, other.stacks), (self.addons, other.addons), (self.sections, other.sections), (self.classes, other.classes)):
+            for (key, size) in source.items():
+                target[key] = target.get(key, 0) + size
+        for (name, (size, count)) in other.properties.items():
+            (total, occurrences) = self.properties.get(name, (0, 0))
+            self.properties[name] = (total + size, occurrences + count)
+
+    def add_stack(self, stack, size):
+        key = ";".join(frame.replace(";", "_") for frame in stack)
+        self.stacks[key] = self.stacks.get(key, 0) + size
+
+    def add_property(self, name, size):
+        (total, count) = self.properties.get(name, (0, 0))
+        self.properties[name] = (total + size, count + 1)
+
+    def total(self):
+        return sum(self.addons.values())
+
+
+def find_build_dir(pwd):
+    # check if we find the .hemttout folder here, otherwise try one directory further up
+    print_trace("Searching for .hemttout in {}", pwd)
+    hemttout_dir = os.path.join(pwd,'.hemttout')
+    if (os.path.isdir(hemttout_dir)):
+        print_trace("Searching for build dir in {}", hemttout_dir)
+        build_dir = os.path.join(hemttout_dir,'build')
+        if (os.path.isdir(build_dir)):
+            print_trace("HEMTT build dir found: {}", build_dir)
+            return build_dir
+        else:
+            raise Exception("NoBuildDir","HEMTT build output directory could not be found!")
+    else:
+        return find_build_dir(os.path.join(pwd,'..'))
+
+def grab_built_pbo_files(dir):
+    # return all pbos of the build as (name relative to the build dir, path)
+    pbos = []
+    for (path, dirs, files) in os.walk(dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.lower().endswith(".pbo"):
+                filepath = os.path.join(path, file)
+                pbos.append((os.path.relpath(filepath, dir).replace(os.sep, "/"), filepath))
+    print_trace("pbo files returned: {}", pbos)
+
+    return pbos
+
+def entry_frame(entry):
+    if entry.type == rap.RAP.EntryType.ARRAY:
+        return entry.name + "[]"
+    elif entry.type == rap.RAP.EntryType.EXTERN:
+        return "class %s;" % entry.name
+    elif entry.type == rap.RAP.EntryType.DELETE:
+        return "delete %s;" % entry.name
+    return entry.name
+
+def recurse_class_sizes(entry, stack, sizes):
+    # attributes the bytes of a class to its frame and those of its entries to theirs, returns the total size
+    own = entry.size + entry.body.size
+    total = own
+    for subentry in entry.body.entries:
+        own -= subentry.size
+        if subentry.type == rap.RAP.EntryType.CLASS:
+            size = recurse_class_sizes(subentry, stack + (subentry.name,), sizes)
+            if len(stack) == 2:
+                sizes.classes[(stack[1], subentry.name)] = size
+        else:
+            size = subentry.size
+            sizes.add_stack(stack + (entry_frame(subentry),), size)
+            if subentry.type in (rap.RAP.EntryType.SCALAR, rap.RAP.EntryType.ARRAY):
+                sizes.add_property(entry_frame(subentry).lower(), size)
+        total += size - subentry.size
+
+    sizes.add_stack(stack, own)
+    return total
+
+def read_config_sizes(cfg, size, stack, sizes):
+    # everything not listed in a class, the file header, the root body header and the enums, goes to one frame
+    listed = 0
+    for entry in cfg.body.entries:
+        if entry.type == rap.RAP.EntryType.CLASS:
+            section_size = recurse_class_sizes(entry, stack + (entry.name,), sizes)
+            sizes.sections[entry.name] = sizes.sections.get(entry.name, 0) + section_size
+        else:
+            section_size = entry.size
+            sizes.add_stack(stack + (entry_frame(entry),), section_size)
+        listed += section_size
+
+    sizes.add_stack(stack + (HEADER_FRAME,), size - listed)
+
+def profile_pbo(task):
+    # measures the configs of a single pbo, may run in a worker process
+    (name, filepath) = task
+    diagnostics.set_addon(name)
+    print_trace("profiling pbo file: {}", filepath)
+    sizes = ConfigSizes()
+    valid = True
+    try:
+        with open_pbo(filepath) as (layout, buffer):
+            for entry in layout.entries:
+                filename = entry.filename.replace("\\", "/")
+                if not filename.lower().endswith("config.bin"):
+                    continue
+                if entry.compressed:
+                    print_warning("Skipping compressed config {}", entry.filename)
+                    continue
+
+                with layout.data(buffer, entry) as data:
+                    content = bytes(data)
+                try:
+                    cfg = rap.RAP_SizeReader.read_raw(io.BufferedReader(io.BytesIO(content)))
+                except Exception as e:
+                    print_error("Config {} could not be parsed: {}", entry.filename, e)
+                    valid = False
+                    continue
+
+                stack = (name,) if filename.lower() == "config.bin" else (name, filename)
+                read_config_sizes(cfg, len(content), stack, sizes)
+                sizes.addons[name] = sizes.addons.get(name, 0) + len(content)
+    except (OSError, PBOLayout_Error) as e:
+        print_error("PBO could not be read: {}", e)
+        valid = False
+    diagnostics.set_addon(None)
+
+    return (name, sizes, valid)
+
+def percentage(size, total):
+    return 100 * size / total if total > 0 else 0
+
+def print_ranking(title, items, total, top):
+    # items are (label, size) or (label, size, count) tuples
+    items = sorted(items, key=lambda item: (-item[1], item[0]))
+    print_blue("\n{} (top {} of {}):", title, min(top, len(items)), len(items))
+    for item in items[:top]:
+        count = "  {:>6}x".format(item[2]) if len(item) > 2 else ""
+        print_info("  {:>10} {:>5.1f}%{}  {}", item[1], percentage(item[1], total), count, item[0])
+
+def write_collapsed_stacks(filepath, sizes):
+    # one "frame;frame;frame bytes" line per stack, as read by flamegraph.pl, inferno and speedscope
+    lines = ["%s %d\n" % (stack, size) for (stack, size) in sorted(sizes.stacks.items()) if size > 0]
+    incremental.write_atomic(filepath, "".join(lines).encode("utf-8"))
+
+
+def main(argv):
+    print_blue("## profile_config_size.py, version {} ##\n", __version__)
+
+    # parse args
+    parser = argparse.ArgumentParser(description="This script attributes the bytes of the config.bin files of this project's HEMTT build to the classes, arrays and strings they hold.")
+    parser.add_argument('directory',nargs='?',help='directory to operate on',default='.')
+    parser.add_argument('-v', '--verbose',help='enables tracel-level logging',action='store_true')
+    parser.add_argument('--top',help='number of entries to list per ranking, defaults to 20',type=int,default=20)
+    parser.add_argument('--output',help='path of the collapsed stack file for flame graphs, defaults to .hemttout/config_size.folded')
+    parallel.add_arguments(parser)
+    diagnostics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    diagnostics.configure_from_args("profile_config_size.py", __version__, args)
+    if (profiling.configure_from_args("profile_config_size.py", args)):
+        profiling.instrument(globals(), {
+            "grab_built_pbo_files": "list pbos",
+            "read_config_sizes": "measure configs",
+            "profile_pbo": "profile pbos",
+            "write_collapsed_stacks": "write stacks"
+        })
+
+    global root_dir
+    root_dir = os.path.abspath(args.directory)
+    print_trace("setting root_dir to {}", root_dir)
+
+    # preliminary stuffs
+    global build_dir
+    try:
+        build_dir = find_build_dir(root_dir)
+    except:
+        print_error("An exception occurred while attempting to find the build directory!")
+        sys.exit(1)
+
+    pbos = grab_built_pbo_files(build_dir)
+    if (len(pbos) == 0):
+        print_error("No pbos found in {}", build_dir)
+        sys.exit(1)
+
+    sizes = ConfigSizes()
+    errors = []
+    for (name, pbo_sizes, valid) in parallel.map_ordered(profile_pbo, pbos, args.jobs):
+        if (not valid):
+            errors.append(name)
+        sizes.merge(pbo_sizes)
+
+    total = sizes.total()
+    print_ranking("Config size by addon", sizes.addons.items(), total, args.top)
+    print_ranking("Config size by top level class", sizes.sections.items(), total, args.top)
+    print_ranking("Largest classes", (("{} >> '{}'".format(section, classname), size) for ((section, classname), size) in sizes.classes.items()), total, args.top)
+    print_ranking("Largest properties by name", ((name, size, count) for (name, (size, count)) in sizes.properties.items()), total, args.top)
+
+    output_path = args.output
+    if (output_path is None):
+        output_path = os.path.join(os.path.dirname(build_dir), "config_size.folded")
+    try:
+        write_collapsed_stacks(output_path, sizes)
+    except OSError as e:
+        print_error("An error occurred while writing to file {}: {}", output_path, e)
+        sys.exit(1)
+    print_blue("\nWrote collapsed stacks to file: {}", output_path)
+
+    if (len(errors) == 0):
+        print_green("\nProfiled {} bytes of config in {} addons", total, len(sizes.addons))
+        sys.exit(0)
+    else:
+        print_error("Profiling one or more pbos has failed: {}", errors)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
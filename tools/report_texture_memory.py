@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# File: report_texture_memory.py
+# Author: Mokka
+#
+# Description: Estimates the texture memory every config class and addon pulls in
+#
+# Usage: python ./tools/report_texture_memory.py
+#
+
+# The MIT License (MIT)
+
+# Copyright (c) 2026-2026 Mokka
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+###############################################################################
+
+__version__ = "0.1"
+
+import sys
+
+if sys.version_info[0] == 2:
+    print("Python 3 is required.")
+    sys.exit(1)
+
+import os
+import io
+import argparse
+import json
+import statistics
+import struct
+from collections import namedtuple
+from utils import data_rap as rap
+from utils import data_rvmat
+from utils import diagnostics
+from utils import incremental
+from utils import parallel
+from utils import profiling
+from utils.diagnostics import print_error, print_warning, print_trace, print_info, print_green, print_blue
+from utils.data_paa import PAA_Reader, PAA_Error
+from utils.pbo_layout import open_pbo, PBOLayout_Error
+
+# Set Globals
+root_dir = ""
+build_dir = ""
+
+MIB = 1024 * 1024
+TEXTURE_EXTENSIONS = (".paa", ".pac")
+MATERIAL_EXTENSION = ".rvmat"
+
+# A class as defined by one addon. refs maps the path of every string property
+# within the class (nested classes included) to the textures and materials it
+# references, appends holds the same for arrays extended with +=.
+ClassDef = namedtuple("ClassDef", ["section", "classname", "inherits", "refs", "appends", "addon"])
+ClassCost = namedtuple("ClassCost", ["section", "classname", "addon", "size", "textures", "unknown"])
+
+def find_build_dir(pwd):
+    # check if we find the .hemttout folder here, otherwise try one directory further up
+    print_trace("Searching for .hemttout in {}", pwd)
+    hemttout_dir = os.path.join(pwd,'.hemttout')
+    if (os.path.isdir(hemttout_dir)):
+        print_trace("Searching for build dir in {}", hemttout_dir)
+        build_dir = os.path.join(hemttout_dir,'build')
+        if (os.path.isdir(build_dir)):
+            print_trace("HEMTT build dir found: {}", build_dir)
+            return build_dir
+        else:
+            raise Exception("NoBuildDir","HEMTT build output directory could not be found!")
+    else:
+        return find_build_dir(os.path.join(pwd,'..'))
+
+def grab_built_pbo_files(dir):
+    # return all pbos of the build as (name relative to the build dir, path)
+    pbos = []
+    for (path, dirs, files) in os.walk(dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.lower().endswith(".pbo"):
+                filepath = os.path.join(path, file)
+                pbos.append((os.path.relpath(filepath, dir).replace(os.sep, "/"), filepath))
+    print_trace("pbo files returned: {}", pbos)
+
+    return pbos
+
+def format_size(size):
+    return "{:.2f} MiB".format(size / MIB)
+
+def normalize_path(path):
+    path = path.lower()
+    return path if path.startswith("\\") else "\\" + path
+
+def is_texture_ref(value):
+    value = value.lower()
+    return value.endswith(TEXTURE_EXTENSIONS) or value.endswith(MATERIAL_EXTENSION)
+
+def collect_strings(elements, values):
+    for element in elements:
+        if element.type == rap.RAP.EntryType.ARRAY:
+            collect_strings(element.elements, values)
+        elif element.subtype == rap.RAP.EntrySubType.STRING:
+            values.append(element.value)
+
+def recurse_texture_refs(body, refs, appends, path=""):
+    # every string property is recorded, so that overriding a texture with anything else hides the inherited one
+    for entry in body.entries:
+        if entry.type == rap.RAP.EntryType.CLASS:
+            recurse_texture_refs(entry.body, refs, appends, path + entry.name.lower() + ">>")
+            continue
+
+        values = []
+        if entry.type == rap.RAP.EntryType.ARRAY:
+            collect_strings(entry.body.elements, values)
+        elif entry.type == rap.RAP.EntryType.SCALAR and entry.subtype == rap.RAP.EntrySubType.STRING:
+            values.append(entry.value)
+        else:
+            continue
+
+        textures = tuple(normalize_path(value) for value in values if is_texture_ref(value))
+        if entry.type == rap.RAP.EntryType.ARRAY and entry.flag is not None:
+            appends[path + entry.name.lower()] = textures
+        else:
+            refs[path + entry.name.lower()] = textures
+
+def read_class_defs(cfg, addon):
+    # the classes within the top level classes (CfgWeapons, CfgVehicles, ...) are the ones costs are attributed to
+    classes = []
+    for section in cfg.body.entries:
+        if section.type != rap.RAP.EntryType.CLASS:
+            continue
+        for entry in section.body.entries:
+            if entry.type != rap.RAP.EntryType.CLASS:
+                continue
+            refs = {}
+            appends = {}
+            recurse_texture_refs(entry.body, refs, appends)
+            classes.append(ClassDef(section.name, entry.name, entry.body.inherits, refs, appends, addon))
+
+    return classes
+
+def scan_pbo(task):
+    # reads the texture headers, materials and config classes of a single pbo, may run in a worker process
+    (name, filepath) = task
+    diagnostics.set_addon(name)
+    print_trace("scanning pbo file: {}", filepath)
+    textures = {}
+    materials = {}
+    classes = []
+    valid = True
+    try:
+        with open_pbo(filepath) as (layout, buffer):
+            pboprefix = normalize_path(layout.prefix.strip("\\"))
+            for entry in layout.entries:
+                filename = entry.filename.lower()
+                path = pboprefix + "\\" + filename
+                if not (filename.endswith(TEXTURE_EXTENSIONS) or filename.endswith(MATERIAL_EXTENSION) or filename.endswith("config.bin")):
+                    continue
+                if entry.compressed:
+                    print_warning("Skipping compressed entry {}", entry.filename)
+                    continue
+
+                if filename.endswith(TEXTURE_EXTENSIONS):
+                    buffer.seek(entry.offset)
+                    try:
+                        textures[path] = PAA_Reader.read_header(buffer, entry.data_size).video_memory()
+                    except (PAA_Error, struct.error, ValueError) as e:
+                        print_warning("Texture {} could not be read: {}", path, e)
+                    continue
+
+                with layout.data(buffer, entry) as data:
+                    content = bytes(data)
+                try:
+                    if filename.endswith(MATERIAL_EXTENSION):
+                        materials[path] = [normalize_path(texture) for (stage, texture) in data_rvmat.read_textures(content)]
+                    else:
+                        classes.extend(read_class_defs(rap.RAP_Reader.read_raw(io.BufferedReader(io.BytesIO(content))), name))
+                except Exception as e:
+                    print_warning("{} could not be parsed: {}", path, e)
+    except (OSError, PBOLayout_Error) as e:
+        print_error("PBO could not be read: {}", e)
+        valid = False
+    diagnostics.set_addon(None)
+
+    return (name, textures, materials, classes, valid)
+
+
+class TextureMemory():
+    # Joins the classes of all addons with the memory of the textures they reference.
+    # Inherited references and the textures of materials are resolved once and memoized,
+    # every texture is counted once per class and once per addon, however often it is used.
+    def __init__(self):
+        self.costs = {}
+        self.materials = {}
+        self.classes = {}
+        self.resolved = {}
+        self.expanded = {}
+
+    def add_pbo(self, textures, materials, classes):
+        self.costs.update(textures)
+        self.materials.update(materials)
+        for classdef in classes:
+            key = (classdef.section.lower(), classdef.classname.lower())
+            existing = self.classes.get(key)
+            if existing is None:
+                self.classes[key] = classdef
+                continue
+            # a class patched by a later addon keeps its owner, properties are merged
+            self.classes[key] = existing._replace(
+                inherits=classdef.inherits or existing.inherits,
+                refs={**existing.refs, **classdef.refs},
+                appends={**existing.appends, **classdef.appends}
+            )
+
+    def resolve(self, key):
+        # returns the texture refs of a class including the inherited ones
+        chain = []
+        seen = set()
+        inherited = {}
+        current = key
+        while True:
+            if current in self.resolved:
+                inherited = self.resolved[current]
+                break
+            classdef = self.classes.get(current)
+            if classdef is None or current in seen:
+                # parent outside of the build or an inheritance cycle
+                break
+            seen.add(current)
+            chain.append((current, classdef))
+            if classdef.inherits == "":
+                break
+            current = (current[0], classdef.inherits.lower())
+
+        for (current, classdef) in reversed(chain):
+            refs = {**inherited, **classdef.refs}
+            for (path, textures) in classdef.appends.items():
+                refs[path] = inherited.get(path, ()) + textures
+            inherited = self.resolved[current] = {path: textures for (path, textures) in refs.items() if len(textures) > 0}
+
+        return inherited
+
+    def expand(self, path):
+        # materials stand for the textures of their stages, unknown materials are kept as they are
+        textures = self.expanded.get(path)
+        if textures is None:
+            textures = self.expanded[path] = tuple(self.materials.get(path, (path,))) if path.endswith(MATERIAL_EXTENSION) else (path,)
+        return textures
+
+    def textures(self, key):
+        output = set()
+        for refs in self.resolve(key).values():
+            for path in refs:
+                output.update(self.expand(path))
+        return output
+
+    def size(self, textures):
+        return sum(self.costs.get(texture, 0) for texture in textures)
+
+    def known(self, textures):
+        return sum(1 for texture in textures if texture in self.costs)
+
+    def class_costs(self):
+        output = []
+        for (key, classdef) in self.classes.items():
+            textures = self.textures(key)
+            if len(textures) == 0:
+                continue
+            known = self.known(textures)
+            output.append(ClassCost(classdef.section, classdef.classname, classdef.addon, self.size(textures), known, len(textures) - known))
+
+        output.sort(key=lambda cost: (-cost.size, cost.section.lower(), cost.classname.lower()))
+        return output
+
+    def addon_textures(self):
+        # returns {addon: textures used by the classes it defines}
+        output = {}
+        for (key, classdef) in self.classes.items():
+            output.setdefault(classdef.addon, set()).update(self.textures(key))
+        return output
+
+
+def resolve_costs(memory):
+    return (memory.class_costs(), memory.addon_textures())
+
+def find_outliers(costs):
+    # classes more than three standard deviations above the mean
+    sizes = [cost.size for cost in costs if cost.size > 0]
+    if (len(sizes) < 2):
+        return []
+
+    threshold = statistics.mean(sizes) + 3 * statistics.pstdev(sizes)
+    return [cost for cost in costs if cost.size > threshold]
+
+def write_report(filepath, costs, addons, memory):
+    data = {
+        "total": memory.size(set().union(*addons.values())),
+        "addons": {addon: {"size": memory.size(textures), "textures": memory.known(textures)} for (addon, textures) in sorted(addons.items())},
+        "classes": [cost._asdict() for cost in costs]
+    }
+    incremental.write_atomic(filepath, json.dumps(data, indent=1).encode("utf-8"))
+
+
+def main(argv):
+    print_blue("## report_texture_memory.py, version {} ##\n", __version__)
+
+    # parse args
+    parser = argparse.ArgumentParser(description="This script estimates the video memory taken up by the textures every config class and addon of this project's HEMTT build references.")
+    parser.add_argument('directory',nargs='?',help='directory to operate on',default='.')
+    parser.add_argument('-v', '--verbose',help='enables tracel-level logging',action='store_true')
+    parser.add_argument('--top',help='number of classes to list, defaults to 20',type=int,default=20)
+    parser.add_argument('--budget',help='fails if a single class needs more than this many MiB of texture memory',type=float)
+    parser.add_argument('--output',help='file to write the full report to as JSON')
+    parallel.add_arguments(parser)
+    diagnostics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    diagnostics.configure_from_args("report_texture_memory.py", __version__, args)
+    if (profiling.configure_from_args("report_texture_memory.py", args)):
+        profiling.instrument(globals(), {
+            "grab_built_pbo_files": "list pbos",
+            "read_class_defs": "read configs",
+            "scan_pbo": "scan pbos",
+            "resolve_costs": "resolve classes",
+            "find_outliers": "find outliers"
+        })
+
+    global root_dir
+    root_dir = os.path.abspath(args.directory)
+    print_trace("setting root_dir to {}", root_dir)
+
+    # preliminary stuffs
+    global build_dir
+    try:
+        build_dir = find_build_dir(root_dir)
+    except:
+        print_error("An exception occurred while attempting to find the build directory!")
+        sys.exit(1)
+
+    pbos = grab_built_pbo_files(build_dir)
+    if (len(pbos) == 0):
+        print_error("No pbos found in {}", build_dir)
+        sys.exit(1)
+
+    memory = TextureMemory()
+    errors = []
+    for (name, textures, materials, classes, valid) in parallel.map_ordered(scan_pbo, pbos, args.jobs):
+        if (not valid):
+            errors.append(name)
+        memory.add_pbo(textures, materials, classes)
+
+    (costs, addons) = resolve_costs(memory)
+
+    print_blue("Texture memory by class (top {} of {}):", min(args.top, len(costs)), len(costs))
+    for cost in costs[:args.top]:
+        print_info("  {:>10}  {:>4} textures  {} >> '{}' ({})", format_size(cost.size), cost.textures, cost.section, cost.classname, cost.addon)
+
+    print_blue("\nTexture memory by addon:")
+    for (addon, textures) in sorted(addons.items(), key=lambda item: -memory.size(item[1])):
+        if (len(textures) > 0):
+            print_info("  {:>10}  {:>4} textures  {}", format_size(memory.size(textures)), memory.known(textures), addon)
+
+    referenced = set().union(*addons.values())
+    unknown = [texture for texture in referenced if texture not in memory.costs]
+    if (len(unknown) > 0):
+        print_info("\n{} referenced textures are outside of the build and not counted", len(unknown))
+        for texture in sorted(unknown):
+            print_trace("  {}", texture)
+
+    for cost in find_outliers(costs):
+        config_path = "{} >> '{}'".format(cost.section, cost.classname)
+        print_warning("{} needs {} of texture memory, far above the other classes", config_path, format_size(cost.size), addon=cost.addon, config_path=config_path)
+
+    if (args.budget is not None):
+        for cost in costs:
+            if (cost.size > args.budget * MIB):
+                config_path = "{} >> '{}'".format(cost.section, cost.classname)
+                print_error("{} needs {} of texture memory, over the budget of {}", config_path, format_size(cost.size), format_size(args.budget * MIB), addon=cost.addon, config_path=config_path)
+                errors.append(cost.classname)
+
+    if (args.output is not None):
+        try:
+            write_report(args.output, costs, addons, memory)
+        except OSError as e:
+            print_error("An error occurred while writing to file {}: {}", args.output, e)
+            sys.exit(1)
+        print_blue("Wrote report to file: {}", args.output)
+
+    if (len(errors) == 0):
+        print_green("\nAll {} addons need {} of texture memory for {} textures", len(addons), format_size(memory.size(referenced)), len(referenced) - len(unknown))
+        sys.exit(0)
+    else:
+        print_error("One or more pbos could not be read or classes are over budget: {}", errors)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
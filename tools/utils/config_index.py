@@ -0,0 +1,302 @@
+# SQLite index over the contents of rapified configs.
+# Every class, property, array element and inheritance edge of the read configs
+# is flattened into indexed tables, so ad-hoc questions about a build can be
+# answered with a single SQL query instead of re-parsing all config.bin files.
+
+
+import os
+import sqlite3
+
+from .data_rap import RAP
+
+
+SCHEMA = """
+    CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    CREATE TABLE sources (name TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime INTEGER NOT NULL);
+    CREATE TABLE addons (id INTEGER PRIMARY KEY, name TEXT NOT NULL, prefix TEXT NOT NULL);
+    CREATE TABLE classes (
+        id INTEGER PRIMARY KEY,
+        addon_id INTEGER NOT NULL,
+        parent_id INTEGER,
+        depth INTEGER NOT NULL,
+        name TEXT NOT NULL COLLATE NOCASE,
+        inherits TEXT NOT NULL COLLATE NOCASE,
+        path TEXT NOT NULL COLLATE NOCASE
+    );
+    CREATE TABLE properties (
+        id INTEGER PRIMARY KEY,
+        class_id INTEGER NOT NULL,
+        name TEXT NOT NULL COLLATE NOCASE,
+        kind TEXT NOT NULL,
+        value TEXT,
+        number REAL
+    );
+    CREATE TABLE array_elements (
+        property_id INTEGER NOT NULL,
+        idx INTEGER NOT NULL,
+        depth INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        value TEXT,
+        number REAL
+    );
+    CREATE TABLE inheritance (
+        class_id INTEGER NOT NULL,
+        parent_path TEXT NOT NULL COLLATE NOCASE,
+        parent_id INTEGER
+    );
+"""
+
+INDICES = """
+    CREATE INDEX classes_name ON classes (name);
+    CREATE INDEX classes_path ON classes (path);
+    CREATE INDEX classes_parent ON classes (parent_id);
+    CREATE INDEX properties_class ON properties (class_id);
+    CREATE INDEX properties_name ON properties (name, number);
+    CREATE INDEX properties_value ON properties (value);
+    CREATE INDEX array_elements_property ON array_elements (property_id);
+    CREATE INDEX array_elements_value ON array_elements (value);
+    CREATE INDEX inheritance_class ON inheritance (class_id);
+    CREATE INDEX inheritance_parent ON inheritance (parent_id);
+    CREATE VIEW class_properties AS
+        SELECT classes.path AS class_path, classes.name AS class_name, addons.name AS addon,
+               properties.name AS property, properties.kind AS kind, properties.value AS value, properties.number AS number
+        FROM properties
+        JOIN classes ON classes.id = properties.class_id
+        JOIN addons ON addons.id = classes.addon_id;
+"""
+
+KIND_NAMES = {
+    RAP.EntrySubType.STRING: "string",
+    RAP.EntrySubType.FLOAT: "float",
+    RAP.EntrySubType.LONG: "long",
+    RAP.EntrySubType.VARIABLE: "variable"
+}
+
+
+class ConfigIndex_Error(Exception):
+    def __str__(self):
+        return "ConfigIndex - %s" % super().__str__()
+
+
+class ParentResolver():
+    # Resolves the parent of every class the way the game does: within the container of
+    # the class, then in the classes the container inherits from, then in the containers
+    # further out. Paths are lowercase tuples of class names, external class declarations
+    # (class X;) count as members of their container but have no parent of their own.
+    def __init__(self):
+        self.classes = {}
+        self.externs = set()
+        self.parents = {}
+
+    @staticmethod
+    def key(path):
+        return tuple(path.lower().split(" >> "))
+
+    def add_class(self, path, inherits):
+        key = self.key(path)
+        # a class patched by a later addon keeps its parent unless it names a new one
+        self.classes[key] = inherits.lower() or self.classes.get(key, "")
+
+    def add_extern(self, path):
+        self.externs.add(self.key(path))
+
+    def find_member(self, container, name, key):
+        seen = set()
+        while container is not None and container not in seen:
+            seen.add(container)
+            candidate = container + (name,)
+            if candidate != key and (candidate in self.classes or candidate in self.externs):
+                return candidate
+            container = self.parent(container) if container in self.classes else None
+        return None
+
+    def parent(self, key):
+        # key of the class a class inherits from, None if it has none or it is not part of the build
+        if key in self.parents:
+            return self.parents[key]
+        self.parents[key] = None # guards against cycles while resolving
+
+        output = None
+        inherits = self.classes[key]
+        if inherits != "":
+            container = key[:-1]
+            while len(container) > 0:
+                output = self.find_member(container, inherits, key)
+                if output is not None:
+                    break
+                container = container[:-1]
+
+        self.parents[key] = output
+        return output
+
+
+class ConfigIndex():
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.connection = sqlite3.connect(filepath)
+
+        # rows are collected in memory and inserted in bulk by commit()
+        self.next_addon = 1
+        self.next_class = 1
+        self.next_property = 1
+        self.addons = []
+        self.classes = []
+        self.properties = []
+        self.array_elements = []
+        self.externs = []
+        self.sources = []
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def fingerprint(filepath):
+        stat = os.stat(filepath)
+        return (os.path.basename(filepath), stat.st_size, int(stat.st_mtime))
+
+    # Returns True if the index was built from exactly the given source files.
+    def is_current(self, filepaths):
+        try:
+            stored = set(self.connection.execute("SELECT name, size, mtime FROM sources"))
+        except sqlite3.DatabaseError:
+            return False
+
+        return len(stored) > 0 and stored == set(self.fingerprint(path) for path in filepaths)
+
+    def add_source(self, filepath):
+        self.sources.append(self.fingerprint(filepath))
+
+    def add_config(self, addon, prefix, root):
+        addon_id = self.next_addon
+        self.next_addon += 1
+        self.addons.append((addon_id, addon, prefix))
+
+        self.add_class_body(addon_id, None, 0, "configFile", root.body)
+
+    def add_class_body(self, addon_id, class_id, depth, path, body):
+        for entry in body.entries:
+            if entry.type == RAP.EntryType.CLASS:
+                child_id = self.next_class
+                self.next_class += 1
+                child_path = "%s >> %s" % (path, entry.name)
+                self.classes.append((child_id, addon_id, class_id, depth + 1, entry.name, entry.body.inherits, child_path))
+                self.add_class_body(addon_id, child_id, depth + 1, child_path, entry.body)
+                continue
+
+            if entry.type == RAP.EntryType.EXTERN:
+                self.externs.append("%s >> %s" % (path, entry.name))
+
+            if class_id is None:
+                continue
+
+            property_id = self.next_property
+            self.next_property += 1
+
+            if entry.type == RAP.EntryType.ARRAY:
+                kind = "array" if entry.flag is None else "array_append"
+                self.properties.append((property_id, class_id, entry.name, kind, None, entry.body.element_count))
+                self.add_array_elements(property_id, entry.body, 0, 0)
+
+            elif entry.type == RAP.EntryType.SCALAR:
+                number = entry.value if entry.subtype in (RAP.EntrySubType.FLOAT, RAP.EntrySubType.LONG) else None
+                self.properties.append((property_id, class_id, entry.name, KIND_NAMES[entry.subtype], str(entry.value), number))
+
+            elif entry.type == RAP.EntryType.EXTERN:
+                self.properties.append((property_id, class_id, entry.name, "extern", None, None))
+
+            elif entry.type == RAP.EntryType.DELETE:
+                self.properties.append((property_id, class_id, entry.name, "delete", None, None))
+
+    def add_array_elements(self, property_id, body, idx, depth):
+        for element in body.elements:
+            if element.type == RAP.EntryType.ARRAY:
+                self.array_elements.append((property_id, idx, depth, "array", None, element.element_count))
+                idx = self.add_array_elements(property_id, element, idx + 1, depth + 1)
+                continue
+
+            number = element.value if element.subtype in (RAP.EntrySubType.FLOAT, RAP.EntrySubType.LONG) else None
+            self.array_elements.append((property_id, idx, depth, KIND_NAMES.get(element.subtype, "none"), str(element.value), number))
+            idx += 1
+
+        return idx
+
+    def resolve_inheritance(self):
+        # (class id, parent path, parent id) of every class with a parent, the parent path is the
+        # name as written if the parent is not declared anywhere in the build
+        resolver = ParentResolver()
+        ids = {}
+        paths = {}
+        for (class_id, addon_id, container_id, depth, name, inherits, path) in self.classes:
+            resolver.add_class(path, inherits)
+            ids.setdefault(resolver.key(path), class_id)
+            paths.setdefault(resolver.key(path), path)
+        for path in self.externs:
+            resolver.add_extern(path)
+            paths.setdefault(resolver.key(path), path)
+
+        output = []
+        for (class_id, addon_id, container_id, depth, name, inherits, path) in self.classes:
+            if inherits == "":
+                continue
+            parent = resolver.parent(resolver.key(path))
+            if parent is None:
+                output.append((class_id, inherits, None))
+            else:
+                output.append((class_id, paths[parent], ids.get(parent)))
+
+        return output
+
+    @staticmethod
+    def statements(script):
+        return [statement for statement in script.split(";") if statement.strip() != ""]
+
+    # Replaces the contents of the database with the collected rows in a single transaction.
+    def commit(self):
+        self.connection.isolation_level = None
+        self.connection.execute("BEGIN")
+        try:
+            self.connection.execute("DROP VIEW IF EXISTS class_properties")
+            tables = [row[0] for row in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            for name in tables:
+                self.connection.execute("DROP TABLE IF EXISTS %s" % name)
+
+            for statement in self.statements(SCHEMA):
+                self.connection.execute(statement)
+
+            self.connection.executemany("INSERT INTO sources VALUES (?, ?, ?)", self.sources)
+            self.connection.executemany("INSERT INTO addons VALUES (?, ?, ?)", self.addons)
+            self.connection.executemany("INSERT INTO classes VALUES (?, ?, ?, ?, ?, ?, ?)", self.classes)
+            self.connection.executemany("INSERT INTO properties VALUES (?, ?, ?, ?, ?, ?)", self.properties)
+            self.connection.executemany("INSERT INTO array_elements VALUES (?, ?, ?, ?, ?, ?)", self.array_elements)
+            self.connection.executemany("INSERT INTO inheritance VALUES (?, ?, ?)", self.resolve_inheritance())
+
+            for statement in self.statements(INDICES):
+                self.connection.execute(statement)
+
+            self.connection.execute("INSERT INTO meta VALUES ('classes', ?)", (str(len(self.classes)),))
+            self.connection.execute("COMMIT")
+        except:
+            self.connection.execute("ROLLBACK")
+            raise
+
+        self.addons = []
+        self.classes = []
+        self.properties = []
+        self.array_elements = []
+        self.externs = []
+        self.sources = []
+
+    def query(self, sql, parameters = ()):
+        try:
+            cursor = self.connection.execute(sql, parameters)
+        except sqlite3.Error as e:
+            raise ConfigIndex_Error("Query failed: %s" % e)
+
+        columns = [column[0] for column in cursor.description] if cursor.description else []
+        return (columns, cursor.fetchall())
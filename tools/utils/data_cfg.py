@@ -0,0 +1,298 @@
+# Reader and writer functions to convert between config text (config.cpp, .hpp) and the
+# RAP data structure. The text is expected to be preprocessed already, comments are
+# skipped nevertheless so generated files can be read as they are.
+# Format specifications: https://community.bistudio.com/wiki/Config.cpp/bin_File_Format
+
+
+import io
+import re
+import struct
+
+from .data_rap import RAP, CFG_Formatter
+
+
+class CFG_Error(Exception):
+    def __str__(self):
+        return "CFG - %s" % super().__str__()
+
+
+# Every token is matched with the whitespace and comments in front of it, so a single
+# findall() splits the whole text. A lone quote is an unterminated string.
+TOKEN_REGEX = re.compile(r'''
+    ((?:\s+|//[^\n]*|/\*.*?\*/)*)
+    ("(?:[^"]|"")*"|\+=|[{}\[\];=,:]|[^\s{}\[\];=,:"/]+|/|")
+''', re.VERBOSE | re.DOTALL)
+
+INT_REGEX = re.compile(r'^[+-]?(?:0x[0-9a-f]+|\d+)$', re.IGNORECASE)
+FLOAT_REGEX = re.compile(r'^[+-]?(?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?$', re.IGNORECASE)
+
+PUNCTUATION = frozenset(("{", "}", "[", "]", ";", "=", ",", ":", "+="))
+# tokens after the last one, the parser may look up to two tokens ahead
+END = ""
+
+
+class CFG_Reader():
+    # Recursive descent parser over the token list. The parse functions take the index
+    # of their first token and return the index after their last one, so the hot loops
+    # only index lists instead of calling methods per token. Values that are not quoted
+    # are put back together from their tokens and the whitespace between them.
+    def __init__(self, text):
+        self.text = text
+        matches = TOKEN_REGEX.findall(text)
+        self.spaces = [space for (space, token) in matches]
+        self.tokens = [token for (space, token) in matches] + [END, END, END]
+
+    def error(self, message, pos):
+        offset = sum(len(space) + len(token) for (space, token) in zip(self.spaces[:pos], self.tokens[:pos]))
+        if pos < len(self.spaces):
+            offset += len(self.spaces[pos])
+        return CFG_Error("%s in line %d" % (message, self.text.count("\n", 0, offset) + 1))
+
+    def expect(self, value, pos):
+        if self.tokens[pos] != value:
+            raise self.error("Expected '%s' but found '%s'" % (value, self.tokens[pos] or "end of file"), pos)
+        return pos + 1
+
+    def name(self, pos):
+        token = self.tokens[pos]
+        if token == END or token in PUNCTUATION or token[0] == '"':
+            raise self.error("Expected a name but found '%s'" % (token or "end of file"), pos)
+        return token
+
+    @staticmethod
+    def scalar(raw):
+        # numbers are stored like the binarizer does, everything else unquoted is a string
+        number = None
+        if INT_REGEX.match(raw):
+            number = int(raw, 16) if "x" in raw.lower() else int(raw)
+            if -2**31 <= number < 2**31:
+                output = RAP.Long()
+                output.value = number
+                return output
+        elif FLOAT_REGEX.match(raw):
+            number = float(raw)
+
+        if number is not None:
+            output = RAP.Float()
+            output.value = struct.unpack("<f", struct.pack("<f", number))[0]
+            return output
+
+        output = RAP.String()
+        output.value = raw
+        return output
+
+    def value(self, pos, terminators):
+        tokens = self.tokens
+        token = tokens[pos]
+        if token[0:1] == '"' and len(token) > 1 and tokens[pos + 1] in terminators:
+            output = RAP.String()
+            output.value = token[1:-1].replace('""', '"')
+            return (output, pos + 1)
+
+        # unquoted values run up to the next terminator, they never contain braces
+        end = pos
+        while tokens[end] not in terminators and tokens[end] not in ("{", "}", END):
+            if tokens[end] == '"':
+                raise self.error("Unterminated string", end)
+            end += 1
+        if end == pos:
+            raise self.error("Expected a value but found '%s'" % token, pos)
+        raw = token + "".join(self.spaces[idx] + tokens[idx] for idx in range(pos + 1, end))
+        return (self.scalar(raw.strip()), end)
+
+    def array_body(self, pos):
+        tokens = self.tokens
+        output = RAP.ArrayBody()
+        elements = output.elements
+        pos = self.expect("{", pos)
+        while tokens[pos] != "}":
+            token = tokens[pos]
+            if token == "{":
+                (element, pos) = self.array_body(pos)
+            elif token[0:1] == '"' and len(token) > 1 and tokens[pos + 1] in (",", "}"):
+                element = RAP.String()
+                element.value = token[1:-1].replace('""', '"')
+                pos += 1
+            else:
+                (element, pos) = self.value(pos, (",", "}"))
+            elements.append(element)
+            if tokens[pos] != ",":
+                break
+            pos += 1
+        output.element_count = len(elements)
+        return (output, self.expect("}", pos))
+
+    def enum(self, pos, enums):
+        tokens = self.tokens
+        pos = self.expect("{", pos)
+        value = 0
+        while tokens[pos] != "}":
+            item = RAP.EnumItem()
+            item.name = self.name(pos)
+            pos += 1
+            if tokens[pos] == "=":
+                (raw, end) = self.value(pos + 1, (",", "}"))
+                if raw.subtype != RAP.EntrySubType.LONG:
+                    raise self.error("Enum value of %s is not a number" % item.name, pos + 1)
+                value = raw.value
+                pos = end
+            item.value = value
+            value += 1
+            enums.append(item)
+            if tokens[pos] != ",":
+                break
+            pos += 1
+        pos = self.expect("}", pos)
+        return self.expect(";", pos)
+
+    def class_body(self, pos, inherits, enums):
+        tokens = self.tokens
+        output = RAP.ClassBody()
+        output.inherits = inherits
+        entries = output.entries
+        while True:
+            token = tokens[pos]
+            if token == "}" or token == END:
+                break
+            if token == ";":
+                pos += 1
+                continue
+            if token in PUNCTUATION or token[0] == '"':
+                raise self.error("Unexpected '%s'" % token, pos)
+
+            following = tokens[pos + 1]
+            if following == "=":
+                # the most common entry by far, a scalar property
+                value = tokens[pos + 2]
+                if value[0:1] == '"' and len(value) > 1 and tokens[pos + 3] == ";":
+                    entry = RAP.String()
+                    entry.value = value[1:-1].replace('""', '"')
+                    pos += 3
+                else:
+                    (entry, pos) = self.value(pos + 2, (";",))
+                entry.name = token
+            elif token == "class":
+                name = self.name(pos + 1)
+                pos += 2
+                if tokens[pos] == ";":
+                    entry = RAP.External()
+                    entry.name = name
+                    entries.append(entry)
+                    pos += 1
+                    continue
+                parent = ""
+                if tokens[pos] == ":":
+                    parent = self.name(pos + 1)
+                    pos += 2
+                pos = self.expect("{", pos)
+                entry = RAP.Class()
+                entry.name = name
+                (entry.body, pos) = self.class_body(pos, parent, enums)
+                pos = self.expect("}", pos)
+            elif token == "delete" and tokens[pos + 2] == ";":
+                entry = RAP.Delete()
+                entry.name = self.name(pos + 1)
+                pos += 2
+            elif token == "enum" and following == "{":
+                pos = self.enum(pos + 1, enums)
+                continue
+            elif following == "[":
+                pos = self.expect("]", pos + 2)
+                operator = tokens[pos]
+                if operator != "=" and operator != "+=":
+                    raise self.error("Expected '=' or '+=' but found '%s'" % operator, pos)
+                entry = RAP.Array()
+                entry.name = token
+                (entry.body, pos) = self.array_body(pos + 1)
+                if operator == "+=":
+                    entry.flag = 1
+            else:
+                raise self.error("Expected '=' but found '%s'" % following, pos + 1)
+
+            pos = self.expect(";", pos)
+            entries.append(entry)
+
+        output.entry_count = len(entries)
+        return (output, pos)
+
+    def root(self):
+        output = RAP.Root()
+        (output.body, pos) = self.class_body(0, "", output.enums)
+        if self.tokens[pos] != END:
+            raise self.error("Unexpected '%s'" % self.tokens[pos], pos)
+        return output
+
+    @classmethod
+    def read_text(cls, text):
+        return cls(text).root()
+
+    @classmethod
+    def read_file(cls, filepath):
+        with open(filepath, "r", encoding="utf-8-sig", errors="replace") as file:
+            return cls.read_text(file.read())
+
+
+class CFG_Writer():
+    # Writes RAP data structures as config text. CFG_Reader reads the output back into
+    # entries with equal content hashes, so generated files can be compared in RAP form.
+    @classmethod
+    def value(cls, value):
+        if value.type == RAP.EntryType.ARRAY:
+            elements = value.body.elements if hasattr(value, "body") else value.elements
+            return "{%s}" % ", ".join(cls.value(element) for element in elements)
+        if value.subtype == RAP.EntrySubType.STRING:
+            return CFG_Formatter.quoted(value.value)
+        if value.subtype == RAP.EntrySubType.FLOAT:
+            return CFG_Formatter.number(value.value)
+        return str(value.value)
+
+    @classmethod
+    def write_body(cls, formatter, body):
+        for entry in body.entries:
+            if entry.type == RAP.EntryType.CLASS:
+                if len(entry.body.entries) == 0 and entry.body.inherits != "":
+                    formatter.class_copy(entry.name, entry.body.inherits)
+                    continue
+                formatter.class_open(entry.name, entry.body.inherits)
+                cls.write_body(formatter, entry.body)
+                formatter.class_close()
+            elif entry.type == RAP.EntryType.EXTERN:
+                formatter.class_reference(entry.name)
+            elif entry.type == RAP.EntryType.DELETE:
+                formatter.class_delete(entry.name)
+            elif entry.type == RAP.EntryType.ARRAY:
+                items = [cls.value(element) for element in entry.body.elements]
+                if entry.flag is not None:
+                    formatter.array_flagged_open(entry.name)
+                elif len(items) == 0:
+                    formatter.array_empty(entry.name)
+                    continue
+                else:
+                    formatter.array_open(entry.name)
+                if len(items) > 0:
+                    formatter.array_items(items)
+                formatter.array_close()
+            elif entry.subtype == RAP.EntrySubType.STRING:
+                formatter.property_string(entry.name, entry.value)
+            elif entry.subtype == RAP.EntrySubType.FLOAT:
+                formatter.property_float(entry.name, entry.value)
+            elif entry.subtype == RAP.EntrySubType.LONG:
+                formatter.property_int(entry.name, entry.value)
+            else:
+                formatter.variable(entry.name, entry.value)
+
+    @classmethod
+    def write_file(cls, root, file):
+        formatter = CFG_Formatter(file)
+        if len(root.enums) > 0:
+            formatter.enum_open()
+            for item in root.enums:
+                formatter.enum_item(item.name, item.value)
+            formatter.enum_close()
+        cls.write_body(formatter, root.body)
+
+    @classmethod
+    def write_text(cls, root):
+        output = io.StringIO()
+        cls.write_file(root, output)
+        return output.getvalue()
@@ -0,0 +1,143 @@
+# Reader functions to import the header data of PAA textures.
+# Only the type tag, the TAGGs and the mipmap headers are read, the pixel data
+# is skipped, so headers can be read straight out of a memory mapped PBO.
+# Format specifications: https://community.bistudio.com/wiki/PAA_File_Format
+
+
+from enum import Enum
+import struct
+
+from . import binary_handler as binary
+
+
+class PAA_Error(Exception):
+    def __str__(self):
+        return "PAA - %s" % super().__str__()
+
+
+class PAA():
+    class Type(Enum):
+        DXT1 = 0xFF01
+        DXT2 = 0xFF02
+        DXT3 = 0xFF03
+        DXT4 = 0xFF04
+        DXT5 = 0xFF05
+        ARGB4444 = 0x4444
+        ARGB1555 = 0x1555
+        ARGB8888 = 0x8888
+        AI88 = 0x8080
+
+    # bits per pixel of the texture data in video memory
+    BITS_PER_PIXEL = {
+        Type.DXT1: 4,
+        Type.DXT2: 8,
+        Type.DXT3: 8,
+        Type.DXT4: 8,
+        Type.DXT5: 8,
+        Type.ARGB4444: 16,
+        Type.ARGB1555: 16,
+        Type.ARGB8888: 32,
+        Type.AI88: 16
+    }
+
+    class Mipmap():
+        def __init__(self):
+            self.width = 0
+            self.height = 0
+            self.lzo_compressed = False
+            self.data_size = 0
+
+        def __str__(self):
+            return "%dx%d" % (self.width, self.height)
+
+    class Header():
+        def __init__(self):
+            self.type = PAA.Type.DXT1
+            self.taggs = {}
+            self.mipmaps = []
+
+        def __str__(self):
+            return "%s %dx%d, %d mipmaps" % (self.type.name, self.width, self.height, len(self.mipmaps))
+
+        @property
+        def width(self):
+            return self.mipmaps[0].width if len(self.mipmaps) > 0 else 0
+
+        @property
+        def height(self):
+            return self.mipmaps[0].height if len(self.mipmaps) > 0 else 0
+
+        def is_power_of_two(self):
+            return all(value > 0 and value & (value - 1) == 0 for value in (self.width, self.height))
+
+        def video_memory(self):
+            # bytes the texture takes up once loaded, the full mipmap chain of the stored mipmaps
+            # DXT formats are stored in blocks of 4x4 pixels, smaller mipmaps still take up a block
+            bits = PAA.BITS_PER_PIXEL[self.type]
+            total = 0
+            for mipmap in self.mipmaps:
+                width = mipmap.width
+                height = mipmap.height
+                if self.type.name.startswith("DXT"):
+                    width = max(4, (width + 3) // 4 * 4)
+                    height = max(4, (height + 3) // 4 * 4)
+                total += width * height * bits // 8
+            return total
+
+
+class PAA_Reader():
+    @classmethod
+    def read_mipmap_header(cls, file, texture_type):
+        output = PAA.Mipmap()
+        output.width = binary.read_ushort(file)
+        output.height = binary.read_ushort(file)
+
+        # the top bit of the width marks LZO compressed DXT data
+        if texture_type.name.startswith("DXT") and output.width & 0x8000:
+            output.lzo_compressed = True
+            output.width &= 0x7FFF
+
+        output.data_size = struct.unpack('<I', file.read(3) + b"\x00")[0]
+
+        return output
+
+    # Reads the header of the texture at the current position of file, size is the
+    # number of bytes the texture takes up. Mipmap data is skipped with seeks.
+    @classmethod
+    def read_header(cls, file, size):
+        start = file.tell()
+        output = PAA.Header()
+
+        type_tag = binary.read_ushort(file)
+        try:
+            output.type = PAA.Type(type_tag)
+        except ValueError:
+            raise PAA_Error("Unknown texture type: 0x%04X" % type_tag)
+
+        while True:
+            signature = file.read(4)
+            if signature != b"GGAT":
+                file.seek(-len(signature), 1)
+                break
+            name = binary.read_char(file, 4)
+            length = binary.read_ulong(file)
+            if file.tell() + length > start + size:
+                raise PAA_Error("TAGG %s exceeds texture size" % name)
+            output.taggs[name] = file.read(length)
+
+        palette_count = binary.read_ushort(file)
+        file.seek(palette_count * 3, 1)
+
+        while file.tell() + 7 <= start + size:
+            mipmap = cls.read_mipmap_header(file, output.type)
+            if mipmap.width == 0 or mipmap.height == 0:
+                break
+            if file.tell() + mipmap.data_size > start + size:
+                raise PAA_Error("Mipmap %s exceeds texture size" % mipmap)
+            output.mipmaps.append(mipmap)
+            file.seek(mipmap.data_size, 1)
+
+        if len(output.mipmaps) == 0:
+            raise PAA_Error("Texture contains no mipmaps")
+
+        return output
@@ -3,10 +3,15 @@
 
 
 from enum import Enum
+import hashlib
+import struct
 
 from . import binary_handler as binary
 
 
+HASH_SIZE = 16
+
+
 class RAP_Error(Exception):
     def __str__(self):
         return "RAP - %s" % super().__str__()
@@ -25,13 +30,24 @@ class CFG_Formatter():
     
     @staticmethod
     def quoted(value):
-        return "\"%s\"" % value
+        return "\"%s\"" % value.replace("\"", "\"\"")
+
+    @staticmethod
+    def number(value):
+        # shortest text that reads back as the same 32-bit float, with a decimal point so it is not read as an int
+        for precision in (6, 9):
+            output = "%.*g" % (precision, value)
+            if struct.unpack("<f", struct.pack("<f", float(output)))[0] == value:
+                break
+        if not any(char in output for char in ".en"):
+            output += ".0"
+        return output
     
     def comment(self, content):
         self.write("// %s" % content)
 
     def class_delete(self, name):
-        self.write("del %s;" % name)
+        self.write("delete %s;" % name)
 
     def class_reference(self, name):
         self.write("class %s;" % name)
@@ -72,7 +88,7 @@ class CFG_Formatter():
         self.write("%s = %s;" % (name, self.quoted(value)))
     
     def property_float(self, name, value):
-        self.write("%s = %f;" % (name, value))
+        self.write("%s = %s;" % (name, self.number(value)))
     
     def property_int(self, name, value):
         self.write("%s = %d;" % (name, value))
@@ -89,7 +105,7 @@ class CFG_Formatter():
         self.write("};")
     
     def enum_item(self, name, value):
-        self.write("%s = %d;" % (name, value))
+        self.write("%s = %d," % (name, value))
 
 
 # Internal data structure to store the read data.
@@ -123,9 +139,21 @@ class RAP():
             self.inherits = ""
             self.entry_count = 0
             self.entries = []
+            self.hash = None
         
         def __str__(self):
             return "Inherits: %s" % (self.inherits if self.inherits != "" else "nothing")
+
+        @property
+        def content_hash(self):
+            # hash over the inherited class and all entries, nested bodies are hashed
+            # once and reused, so equal hashes mean equal subtrees
+            if self.hash is None:
+                digest = hashlib.blake2b(self.inherits.lower().encode("utf-8"), digest_size=HASH_SIZE)
+                for entry in self.entries:
+                    digest.update(RAP.entry_key(entry))
+                self.hash = digest.digest()
+            return self.hash
         
         def find(self, name):
             for item in self.entries:
@@ -150,6 +178,10 @@ class RAP():
             self.value = ""
             self.body_offset = 0
             self.body = RAP.ClassBody()
+
+        @property
+        def content_hash(self):
+            return hashlib.blake2b(self.name.lower().encode("utf-8") + b"\0" + self.body.content_hash, digest_size=HASH_SIZE).digest()
         
         def __str__(self):
             if self.body:
@@ -254,6 +286,30 @@ class RAP():
         def __str__(self):
             return "delete %s;" % self.name
 
+    @staticmethod
+    def value_key(value):
+        if value.type == RAP.EntryType.ARRAY:
+            elements = value.body.elements if hasattr(value, "body") else value.elements
+            return b"[" + b"".join(RAP.value_key(element) for element in elements) + b"]"
+        if value.subtype == RAP.EntrySubType.FLOAT:
+            content = struct.pack("<f", value.value)
+        else:
+            content = str(value.value).encode("utf-8")
+        return bytes((value.subtype.value,)) + struct.pack("<I", len(content)) + content
+
+    @staticmethod
+    def entry_key(entry):
+        # unambiguous byte representation of an entry, classes are represented by the hash of their body
+        name = entry.name.lower().encode("utf-8")
+        head = bytes((entry.type.value,)) + struct.pack("<I", len(name)) + name
+        if entry.type == RAP.EntryType.CLASS:
+            return head + entry.body.content_hash
+        if entry.type == RAP.EntryType.ARRAY:
+            return head + (b"+" if entry.flag is not None else b"=") + RAP.value_key(entry)
+        if entry.type == RAP.EntryType.SCALAR:
+            return head + RAP.value_key(entry)
+        return head
+
     class Root():
         def __init__(self):
             self.enum_offset = 0
@@ -467,4 +523,33 @@ class RAP_Reader():
             raise RAP_Error("Invalid EOF")
 
 
-        return output
\ No newline at end of file
+        return output
+
+# Reader that also records how many bytes of the file every entry takes up.
+# entry.size covers the entry where it is listed in its parent (for classes the
+# name and the offset of the body), body.size covers the inherited class name,
+# the entry count and the listed entries of a class body. The bodies of nested
+# classes are stored separately and not included in the size of their parent.
+class RAP_SizeReader(RAP_Reader):
+    @classmethod
+    def read_entry_class_body(cls, file, body_offset):
+        output = RAP.ClassBody()
+        current_pos = file.tell()
+        file.seek(body_offset, 0)
+
+        output.inherits = binary.read_asciiz(file)
+        output.entry_count = binary.read_compressed_uint(file)
+        output.entries = cls.read_entries(file, output.entry_count)
+        output.size = file.tell() - body_offset
+
+        file.seek(current_pos, 0)
+
+        return output
+
+    @classmethod
+    def read_entry(cls, file):
+        start = file.tell()
+        output = super().read_entry(file)
+        output.size = file.tell() - start
+
+        return output
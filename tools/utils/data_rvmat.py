@@ -0,0 +1,37 @@
+# Reader function to import the texture references of materials (rvmat files).
+# Rapified materials are read with RAP_Reader, text materials are scanned for
+# their stage classes and texture properties.
+# Format specifications: https://community.bistudio.com/wiki/RVMAT_basics
+
+
+import io
+import re
+
+from . import data_rap as rap
+
+
+# stage classes and their textures in text (not rapified) materials
+TEXTURE_REGEX = re.compile(r'\bclass\s+(stage\w*)|\btexture\s*=\s*"([^"]*)"', re.IGNORECASE)
+
+
+# Returns the (stage, texture) pairs of a material, in the order of the stages.
+# Procedural textures like #(argb,8,8,3)color(...) are not files and left out.
+def read_textures(data):
+    textures = []
+    if data[:4] == b"\0raP":
+        cfg = rap.RAP_Reader.read_raw(io.BufferedReader(io.BytesIO(data)))
+        for stage in cfg.body.entries:
+            if stage.type != rap.RAP.EntryType.CLASS or not stage.name.lower().startswith("stage"):
+                continue
+            texture = stage.body.find("texture")
+            if texture is not None and texture.type == rap.RAP.EntryType.SCALAR and texture.subtype == rap.RAP.EntrySubType.STRING:
+                textures.append((stage.name, texture.value))
+    else:
+        stage = ""
+        for (classname, texture) in TEXTURE_REGEX.findall(data.decode("utf-8", "replace")):
+            if classname != "":
+                stage = classname
+            elif stage != "":
+                textures.append((stage, texture))
+
+    return [(stage, texture) for (stage, texture) in textures if texture != "" and not texture.startswith("#")]
@@ -0,0 +1,272 @@
+# Persistent indices of the PBOs of external dependencies (CBA, ACE, vanilla).
+# The results are cached per PBO and reused until its size or modification
+# time changes, so checking references into thousands of dependency PBOs does
+# not require opening them on every run. File names are kept in a compressed
+# JSON index, class names in a sorted binary file per dependency directory that
+# is memory mapped and searched by bisection instead of being loaded.
+
+
+import gzip
+import io
+import json
+import mmap
+import os
+import struct
+
+from . import data_rap as rap
+from . import incremental
+from . import parallel
+from .diagnostics import print_warning, print_trace
+from .pbo_layout import open_pbo, PBOLayout_Error
+
+
+def grab_dependency_pbo_files(dirs):
+    # return the paths of all pbos within the given directories and their subdirectories
+    pbos = []
+    for dir in dirs:
+        if not os.path.isdir(dir):
+            print_warning("Dependency directory does not exist: {}", dir)
+            continue
+        for (path, subdirs, files) in os.walk(dir):
+            subdirs.sort()
+            for file in sorted(files):
+                if file.lower().endswith(".pbo"):
+                    pbos.append(os.path.abspath(os.path.join(path, file)))
+
+    return pbos
+
+def normalize_prefix(prefix):
+    prefix = prefix.lower().strip("\\")
+    return "\\" + prefix if prefix != "" else ""
+
+def read_pbo_filenames(filepath):
+    # returns the prefix and the lowercase file names of a pbo, or None if it cannot be read
+    try:
+        with open_pbo(filepath) as (layout, buffer):
+            return (normalize_prefix(layout.prefix), [entry.filename.lower() for entry in layout.entries])
+    except (OSError, PBOLayout_Error) as e:
+        print_warning("Dependency pbo could not be read: {}", e, addon=os.path.basename(filepath))
+        return None
+
+
+class FileIndex():
+    # Maps every dependency pbo to its prefix and file names, stored gzip compressed.
+    # files() returns the set of "\prefix\filename" paths of all indexed pbos.
+    def __init__(self, filepath, version):
+        self.filepath = filepath
+        self.version = version
+        self.entries = {}
+        self.changed = False
+
+        try:
+            with gzip.open(filepath, "rt", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, EOFError, ValueError):
+            return
+
+        if data.get("version") == version:
+            self.entries = data.get("entries", {})
+
+    def __repr__(self):
+        return "FileIndex(filepath=%s, pbos=%d)" % (self.filepath, len(self.entries))
+
+    # Indexes the pbos that are new or changed since the last run and drops the ones that are gone.
+    # Returns the number of pbos that were read.
+    def update(self, pbo_files, jobs):
+        tasks = []
+        for filepath in pbo_files:
+            entry = self.entries.get(filepath)
+            if entry is not None and entry["source"] == incremental.source_fingerprint(filepath):
+                continue
+            tasks.append(filepath)
+
+        present = set(pbo_files)
+        removed = [filepath for filepath in self.entries if filepath not in present]
+        for filepath in removed:
+            print_trace("dependency pbo no longer present, dropping it from the index: {}", filepath)
+            del self.entries[filepath]
+
+        for (filepath, result) in zip(tasks, parallel.map_ordered(read_pbo_filenames, tasks, jobs)):
+            if result is None:
+                self.entries.pop(filepath, None)
+                continue
+            (prefix, files) = result
+            self.entries[filepath] = {"source": incremental.source_fingerprint(filepath), "prefix": prefix, "files": files}
+
+        self.changed = self.changed or len(tasks) > 0 or len(removed) > 0
+        return len(tasks)
+
+    def files(self):
+        output = set()
+        for entry in self.entries.values():
+            prefix = entry["prefix"]
+            output.update("%s\\%s" % (prefix, file) for file in entry["files"])
+        return output
+
+    def save(self):
+        if not self.changed:
+            return
+
+        data = {"version": self.version, "entries": self.entries}
+        incremental.write_atomic(self.filepath, gzip.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"), compresslevel=6))
+        self.changed = False
+
+
+def collect_class_names(body, names):
+    for entry in body.entries:
+        if entry.type == rap.RAP.EntryType.CLASS:
+            names.add(entry.name.lower())
+            collect_class_names(entry.body, names)
+
+def read_pbo_class_names(filepath):
+    # returns the names of all classes defined in the configs of a pbo, or None if it cannot be read
+    names = set()
+    try:
+        with open_pbo(filepath) as (layout, buffer):
+            for entry in layout.entries:
+                if not entry.filename.lower().endswith("config.bin"):
+                    continue
+                if entry.compressed:
+                    print_warning("Skipping compressed config {}", entry.filename, addon=os.path.basename(filepath))
+                    continue
+                with layout.data(buffer, entry) as data:
+                    cfg = rap.RAP_Reader.read_raw(io.BufferedReader(io.BytesIO(bytes(data))))
+                collect_class_names(cfg.body, names)
+    except Exception as e:
+        print_warning("Dependency config could not be read: {}", e, addon=os.path.basename(filepath))
+        return None
+
+    return sorted(names)
+
+
+class ClassIndex():
+    # Sorted class names of the configs in the pbos of one dependency directory.
+    # Layout: magic, format version, length of a JSON header listing the source
+    # pbos, name count, offset table, pbo id per name, then the names themselves.
+    MAGIC = b"MTCI"
+    FORMAT = 1
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.header = {"version": None, "pbos": []}
+        self.count = 0
+        self.buffer = None
+        self.file = None
+
+        try:
+            self.file = open(filepath, "rb")
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, format, header_size = struct.unpack_from("<4sII", self.buffer, 0)
+            if magic != self.MAGIC or format != self.FORMAT:
+                raise ValueError("not a class index")
+            self.header = json.loads(bytes(self.buffer[12:12 + header_size]).decode("utf-8"))
+            offset = 12 + header_size
+            self.count = struct.unpack_from("<I", self.buffer, offset)[0]
+        except (OSError, ValueError, struct.error):
+            self.close()
+            self.header = {"version": None, "pbos": []}
+            self.count = 0
+            return
+
+        self.offsets_start = offset + 4
+        self.ids_start = self.offsets_start + 4 * (self.count + 1)
+        self.names_start = self.ids_start + 4 * self.count
+
+    def __repr__(self):
+        return "ClassIndex(filepath=%s, names=%d)" % (self.filepath, self.count)
+
+    def __getstate__(self):
+        # the memory map cannot be sent to worker processes, they open the file again
+        return self.filepath
+
+    def __setstate__(self, filepath):
+        self.__init__(filepath)
+
+    def __len__(self):
+        return self.count
+
+    def name(self, idx):
+        start, end = struct.unpack_from("<II", self.buffer, self.offsets_start + 4 * idx)
+        return self.buffer[self.names_start + start:self.names_start + end]
+
+    def __contains__(self, classname):
+        key = classname.lower().encode("utf-8")
+        low = 0
+        high = self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self.name(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        return low < self.count and self.name(low) == key
+
+    def names_by_pbo(self):
+        # returns {pbo path: [class names]} of the indexed pbos
+        pbos = [entry[0] for entry in self.header["pbos"]]
+        output = {filepath: [] for filepath in pbos}
+        for idx in range(self.count):
+            pbo_id = struct.unpack_from("<I", self.buffer, self.ids_start + 4 * idx)[0]
+            output[pbos[pbo_id]].append(self.name(idx).decode("utf-8"))
+        return output
+
+    def close(self):
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    @classmethod
+    def write(cls, filepath, version, sources, names_by_pbo):
+        # sources holds [path, size, mtime_ns] per pbo, in the order of the pbo ids
+        records = []
+        for (pbo_id, source) in enumerate(sources):
+            records.extend((name.encode("utf-8"), pbo_id) for name in names_by_pbo[source[0]])
+        records.sort()
+
+        header = json.dumps({"version": version, "pbos": sources}).encode("utf-8")
+        offsets = [0]
+        for (name, pbo_id) in records:
+            offsets.append(offsets[-1] + len(name))
+
+        data = io.BytesIO()
+        data.write(struct.pack("<4sII", cls.MAGIC, cls.FORMAT, len(header)))
+        data.write(header)
+        data.write(struct.pack("<I", len(records)))
+        data.write(struct.pack("<%dI" % len(offsets), *offsets))
+        data.write(struct.pack("<%dI" % len(records), *(pbo_id for (name, pbo_id) in records)))
+        data.write(b"".join(name for (name, pbo_id) in records))
+        incremental.write_atomic(filepath, data.getvalue())
+
+    # Returns the index of the given pbos, rebuilding it first if any of them changed.
+    # Only the configs of new or changed pbos are parsed, the names of the others are
+    # taken from the previous index. Also returns the number of pbos that were parsed.
+    @classmethod
+    def update(cls, filepath, version, pbo_files, jobs):
+        index = cls(filepath)
+        sources = [[pbo, *incremental.source_fingerprint(pbo)] for pbo in pbo_files]
+        if index.header["version"] == version and index.header["pbos"] == sources:
+            return (index, 0)
+
+        previous = {}
+        if index.header["version"] == version:
+            previous = {entry[0]: entry for entry in index.header["pbos"]}
+            names_by_pbo = index.names_by_pbo()
+        index.close()
+
+        output = {}
+        tasks = []
+        for source in sources:
+            if previous.get(source[0]) == source:
+                output[source[0]] = names_by_pbo[source[0]]
+            else:
+                tasks.append(source[0])
+
+        for (pbo, names) in zip(tasks, parallel.map_ordered(read_pbo_class_names, tasks, jobs)):
+            output[pbo] = [] if names is None else names
+            print_trace("indexed {} classes from {}", len(output[pbo]), pbo)
+
+        cls.write(filepath, version, sources, output)
+        return (cls(filepath), len(tasks))
@@ -0,0 +1,309 @@
+# Structured diagnostics shared by the tools.
+# Messages are collected as records (severity, addon, config path, property,
+# value) into a buffer and written out in one go as colored text, JSON lines
+# or a SARIF log. Message formatting is deferred until a record is actually
+# kept, so disabled trace calls cost next to nothing.
+
+
+import atexit
+from enum import Enum
+import json
+import sys
+
+
+############################################################
+# Console colors
+# Copyright (c) André Burgaud
+# http://www.burgaud.com/bring-colors-to-the-windows-console-with-python/
+if sys.platform == "win32":
+    from ctypes import windll, Structure, c_short, c_ushort, byref
+
+    SHORT = c_short
+    WORD = c_ushort
+
+    class COORD(Structure):
+      """struct in wincon.h."""
+      _fields_ = [
+        ("X", SHORT),
+        ("Y", SHORT)]
+
+    class SMALL_RECT(Structure):
+      """struct in wincon.h."""
+      _fields_ = [
+        ("Left", SHORT),
+        ("Top", SHORT),
+        ("Right", SHORT),
+        ("Bottom", SHORT)]
+
+    class CONSOLE_SCREEN_BUFFER_INFO(Structure):
+      """struct in wincon.h."""
+      _fields_ = [
+        ("dwSize", COORD),
+        ("dwCursorPosition", COORD),
+        ("wAttributes", WORD),
+        ("srWindow", SMALL_RECT),
+        ("dwMaximumWindowSize", COORD)]
+
+    # winbase.h
+    STD_INPUT_HANDLE = -10
+    STD_OUTPUT_HANDLE = -11
+    STD_ERROR_HANDLE = -12
+
+    # wincon.h
+    FOREGROUND_BLACK     = 0x0000
+    FOREGROUND_BLUE      = 0x0001
+    FOREGROUND_GREEN     = 0x0002
+    FOREGROUND_CYAN      = 0x0003
+    FOREGROUND_RED       = 0x0004
+    FOREGROUND_MAGENTA   = 0x0005
+    FOREGROUND_YELLOW    = 0x0006
+    FOREGROUND_GREY      = 0x0007
+    FOREGROUND_INTENSITY = 0x0008 # foreground color is intensified.
+
+    stdout_handle = windll.kernel32.GetStdHandle(STD_OUTPUT_HANDLE)
+    SetConsoleTextAttribute = windll.kernel32.SetConsoleTextAttribute
+    GetConsoleScreenBufferInfo = windll.kernel32.GetConsoleScreenBufferInfo
+
+    def get_text_attr():
+      """Returns the character attributes (colors) of the console screen
+      buffer."""
+      csbi = CONSOLE_SCREEN_BUFFER_INFO()
+      GetConsoleScreenBufferInfo(stdout_handle, byref(csbi))
+      return csbi.wAttributes
+
+    def set_text_attr(color):
+      """Sets the character attributes (colors) of the console screen
+      buffer. Color is a combination of foreground and background color,
+      foreground and background intensity."""
+      SetConsoleTextAttribute(stdout_handle, color)
+
+    WIN32_COLORS = {
+        "green": FOREGROUND_GREEN | FOREGROUND_INTENSITY,
+        "yellow": FOREGROUND_YELLOW | FOREGROUND_INTENSITY,
+        "red": FOREGROUND_RED | FOREGROUND_INTENSITY,
+        "blue": FOREGROUND_BLUE | FOREGROUND_INTENSITY,
+        "magenta": FOREGROUND_MAGENTA | FOREGROUND_INTENSITY,
+        "reset": FOREGROUND_GREY,
+        "grey": FOREGROUND_GREY
+    }
+
+ANSI_COLORS = {
+    "green": "\033[92m",
+    "yellow": "\033[93m",
+    "red": "\033[91m",
+    "blue": "\033[94m",
+    "magenta": "\033[95m",
+    "reset": "\033[0m",
+    "grey": "\033[0m"
+}
+
+def color(color):
+    """Set the color. Works on Win32 and normal terminals."""
+    if sys.platform == "win32":
+        set_text_attr(WIN32_COLORS[color] | get_text_attr() & 0x0070)
+    else:
+        sys.stdout.write(ANSI_COLORS[color])
+############################################################
+
+
+class Severity(Enum):
+    ERROR = 0
+    WARNING = 1
+    INFO = 2
+    TRACE = 3
+
+# label prefix and color of the text output per severity, INFO records carry their own color
+SEVERITY_TEXT = {
+    Severity.ERROR: ("ERROR: ", "red"),
+    Severity.WARNING: ("WARNING: ", "yellow"),
+    Severity.INFO: ("", None),
+    Severity.TRACE: ("TRACE: ", "magenta")
+}
+
+SARIF_LEVELS = {
+    Severity.ERROR: "error",
+    Severity.WARNING: "warning",
+    Severity.INFO: "note",
+    Severity.TRACE: "none"
+}
+
+FORMATS = ['text', 'jsonl', 'sarif']
+
+
+class Record():
+    __slots__ = ("severity", "message", "addon", "config_path", "property", "value", "color")
+
+    def __init__(self, severity, message, addon = None, config_path = None, property = None, value = None, color = None):
+        self.severity = severity
+        self.message = message
+        self.addon = addon
+        self.config_path = config_path
+        self.property = property
+        self.value = value
+        self.color = color
+
+    def __repr__(self):
+        return "Record(severity=%s, message=%s)" % (self.severity.name, self.message)
+
+    def as_dict(self):
+        output = {"severity": self.severity.name.lower(), "message": self.message}
+        for key in ("addon", "config_path", "property", "value"):
+            value = getattr(self, key)
+            if value is not None:
+                output[key] = value if isinstance(value, (str, int, float)) else str(value)
+
+        return output
+
+    def as_text(self, colored):
+        label, color_name = SEVERITY_TEXT[self.severity]
+        color_name = self.color or color_name
+        text = label + self.message
+        if colored and color_name is not None:
+            return ANSI_COLORS[color_name] + text + ANSI_COLORS["reset"] + "\n"
+        return text + "\n"
+
+
+class Diagnostics():
+    def __init__(self):
+        self.records = []
+        self.level = Severity.INFO
+        self.format = "text"
+        self.stream = sys.stdout
+        self.tool = ""
+        self.version = ""
+        self.addon = None
+        self.colored = True
+
+        # text and JSON lines output are flushed in chunks, SARIF needs the whole log
+        self.flush_threshold = 4096
+
+    def enabled(self, severity):
+        return severity.value <= self.level.value
+
+    def emit(self, severity, message, args = (), addon = None, config_path = None, prop = None, value = None, color = None):
+        if not self.enabled(severity):
+            return
+
+        if args:
+            message = message.format(*args)
+
+        if addon is None:
+            addon = self.addon
+
+        self.records.append(Record(severity, str(message), addon, config_path, prop, value, color))
+        if self.format != "sarif" and len(self.records) >= self.flush_threshold:
+            self.flush()
+
+    def extend(self, records):
+        # adds records collected elsewhere, e.g. in a worker process
+        self.records.extend(records)
+        if self.format != "sarif" and len(self.records) >= self.flush_threshold:
+            self.flush()
+
+    def render_text(self):
+        return "".join(record.as_text(self.colored) for record in self.records)
+
+    def render_jsonl(self):
+        # blank INFO records only space out the console output
+        return "".join(json.dumps(record.as_dict()) + "\n" for record in self.records if record.message.strip() != "" or record.severity != Severity.INFO)
+
+    def render_sarif(self):
+        results = []
+        for record in self.records:
+            if record.severity == Severity.TRACE or (record.severity == Severity.INFO and record.config_path is None):
+                continue
+
+            result = {
+                "level": SARIF_LEVELS[record.severity],
+                "message": {"text": record.message},
+                "properties": record.as_dict()
+            }
+            if record.addon is not None:
+                result["locations"] = [{
+                    "physicalLocation": {"artifactLocation": {"uri": record.addon}},
+                    "logicalLocations": [{"fullyQualifiedName": record.config_path or record.addon}]
+                }]
+            results.append(result)
+
+        log = {
+            "version": "2.1.0",
+            "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+            "runs": [{
+                "tool": {"driver": {"name": self.tool, "version": self.version}},
+                "results": results
+            }]
+        }
+        return json.dumps(log, indent=1) + "\n"
+
+    def flush(self):
+        if len(self.records) == 0:
+            return
+
+        if self.format == "jsonl":
+            self.stream.write(self.render_jsonl())
+        elif self.format == "sarif":
+            self.stream.write(self.render_sarif())
+        elif self.colored and sys.platform == "win32" and self.stream is sys.stdout:
+            # the legacy console sets colors through API calls between writes
+            for record in self.records:
+                label, color_name = SEVERITY_TEXT[record.severity]
+                color_name = record.color or color_name
+                if color_name is not None:
+                    color(color_name)
+                self.stream.write(label + record.message + "\n")
+                if color_name is not None:
+                    color("reset")
+        else:
+            self.stream.write(self.render_text())
+
+        self.stream.flush()
+        self.records = []
+
+
+diagnostics = Diagnostics()
+
+def add_arguments(parser):
+    parser.add_argument('--diagnostics-format',help='output format of the diagnostics',choices=FORMATS,default='text')
+    parser.add_argument('--diagnostics-output',help='file to write the diagnostics to instead of the console')
+
+def configure(tool, version, verbose = False, format = "text", output = None):
+    # sets up the shared diagnostics buffer, all records are flushed on exit
+    diagnostics.tool = tool
+    diagnostics.version = version
+    diagnostics.level = Severity.TRACE if verbose else Severity.INFO
+    diagnostics.format = format
+
+    if output is not None:
+        diagnostics.stream = open(output, "w", encoding="utf-8")
+        diagnostics.colored = False
+
+    atexit.register(diagnostics.flush)
+
+def configure_from_args(tool, version, args):
+    configure(tool, version, args.verbose, args.diagnostics_format, args.diagnostics_output)
+
+def set_addon(addon):
+    diagnostics.addon = addon
+
+def trace_enabled():
+    return diagnostics.enabled(Severity.TRACE)
+
+def print_error(msg, *args, addon = None, config_path = None, prop = None, value = None):
+    diagnostics.emit(Severity.ERROR, msg, args, addon, config_path, prop, value)
+
+def print_warning(msg, *args, addon = None, config_path = None, prop = None, value = None):
+    diagnostics.emit(Severity.WARNING, msg, args, addon, config_path, prop, value)
+
+def print_trace(msg, *args, addon = None, config_path = None, prop = None, value = None):
+    if diagnostics.level != Severity.TRACE:
+        return
+    diagnostics.emit(Severity.TRACE, msg, args, addon, config_path, prop, value)
+
+def print_info(msg, *args):
+    diagnostics.emit(Severity.INFO, msg, args)
+
+def print_green(msg, *args):
+    diagnostics.emit(Severity.INFO, msg, args, color = "green")
+
+def print_blue(msg, *args):
+    diagnostics.emit(Severity.INFO, msg, args, color = "blue")
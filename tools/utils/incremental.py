@@ -0,0 +1,160 @@
+# Helpers for regenerating output files only when their content changes.
+# Generated files are rendered into memory and compared by hash against the
+# file on disk, and only replaced (atomically) if they differ, so unchanged
+# files keep their mtime and do not trigger rebuilds. A fingerprint cache
+# remembers which source PBO produced which outputs, so generation can be
+# skipped entirely while the PBO is unchanged. Large outputs can instead be
+# streamed into a staged temporary file that is hashed while it is written.
+
+
+from collections import namedtuple
+import hashlib
+import json
+import os
+import tempfile
+
+
+CHUNK_SIZE = 1 << 20
+
+
+def content_hash(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def file_hash(filepath):
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(filepath, "rb") as file:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+def create_temp_file(filepath):
+    # temporary file next to the target, with the permissions a newly created file would get
+    directory = os.path.dirname(os.path.abspath(filepath))
+    handle, temp_path = tempfile.mkstemp(prefix=".%s." % os.path.basename(filepath), suffix=".tmp", dir=directory)
+    umask = os.umask(0)
+    os.umask(umask)
+    try:
+        os.chmod(temp_path, 0o666 & ~umask)
+    except OSError:
+        pass
+    return (handle, temp_path)
+
+def write_atomic(filepath, data):
+    # writes to a temporary file next to the target and renames it into place
+    handle, temp_path = create_temp_file(filepath)
+    try:
+        with os.fdopen(handle, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, filepath)
+    except:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+# Writes content to filepath unless the file already holds exactly that content.
+# Returns True if the file was written.
+def write_if_changed(filepath, content):
+    data = content.encode("utf-8")
+    if file_hash(filepath) == content_hash(data):
+        return False
+
+    write_atomic(filepath, data)
+    return True
+
+Staged = namedtuple("Staged", ["filepath", "temp_path", "digest"])
+
+class StagedWriter():
+    # Streams text into a temporary file next to filepath through a large buffer,
+    # hashing it on the way. close() returns a Staged result that can be passed
+    # to another process, commit_staged() then puts it in place if it changed.
+    def __init__(self, filepath, buffer_size = CHUNK_SIZE):
+        self.filepath = filepath
+        handle, self.temp_path = create_temp_file(filepath)
+        self.file = os.fdopen(handle, "wb", buffering=buffer_size)
+        self.digest = hashlib.blake2b(digest_size=16)
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        self.digest.update(data)
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+        return Staged(self.filepath, self.temp_path, self.digest.hexdigest())
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+# Replaces the target of a staged file unless it already holds exactly that content.
+# Returns True if the file was written.
+def commit_staged(staged):
+    try:
+        if file_hash(staged.filepath) == staged.digest:
+            os.remove(staged.temp_path)
+            return False
+
+        os.replace(staged.temp_path, staged.filepath)
+    except:
+        if os.path.exists(staged.temp_path):
+            os.remove(staged.temp_path)
+        raise
+    return True
+
+def discard_staged(staged):
+    if os.path.exists(staged.temp_path):
+        os.remove(staged.temp_path)
+
+def source_fingerprint(filepath):
+    stat = os.stat(filepath)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class FingerprintCache():
+    def __init__(self, filepath, version, root_dir):
+        self.filepath = filepath
+        self.version = version
+        self.root_dir = root_dir
+        self.entries = {}
+
+        try:
+            with open(filepath, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+
+        # results of another tool version or project directory cannot be reused
+        if data.get("version") == version and data.get("root_dir") == root_dir:
+            self.entries = data.get("entries", {})
+
+    # Returns True if the source is unchanged since the last run and all outputs
+    # generated from it still hold the content that was written back then.
+    def is_unchanged(self, key, source_path):
+        entry = self.entries.get(key)
+        if entry is None or entry["source"] != source_fingerprint(source_path):
+            return False
+
+        for (output, digest) in entry["outputs"].items():
+            if file_hash(output) != digest:
+                return False
+
+        return True
+
+    def update(self, key, source_path, outputs):
+        self.entries[key] = {
+            "source": source_fingerprint(source_path),
+            "outputs": {output: file_hash(output) for output in outputs}
+        }
+
+    def invalidate(self, key):
+        self.entries.pop(key, None)
+
+    def save(self):
+        data = {"version": self.version, "root_dir": self.root_dir, "entries": self.entries}
+        write_atomic(self.filepath, json.dumps(data, indent=1, sort_keys=True).encode("utf-8"))
@@ -0,0 +1,119 @@
+# Content-addressed fingerprints of the PBOs of a build.
+# Every PBO is hashed as a whole and per entry (over the stored data, read as
+# slices of the memory mapped file), and the results are kept in a JSON
+# manifest. Two manifests can be diffed to list the PBOs and the files inside
+# them that changed between builds, without opening any PBO again.
+
+
+from collections import namedtuple
+import hashlib
+import json
+import os
+
+from . import incremental
+from .pbo_layout import open_pbo, update_hash
+
+
+MANIFEST_VERSION = 1
+DIGEST_SIZE = 16
+
+
+class Manifest_Error(Exception):
+    def __str__(self):
+        return "Manifest - %s" % super().__str__()
+
+
+EntryDiff = namedtuple("EntryDiff", ["added", "removed", "changed"])
+ManifestDiff = namedtuple("ManifestDiff", ["added", "removed", "changed"])
+
+
+def hash_buffer(buffer, start = 0, end = None):
+    return update_hash(hashlib.blake2b(digest_size=DIGEST_SIZE), buffer, start, end).hexdigest()
+
+def fingerprint_pbo(filepath):
+    stat = os.stat(filepath)
+    with open_pbo(filepath) as (layout, buffer):
+        entries = {}
+        for entry in layout.entries:
+            entries[entry.filename.replace("\\", "/").lower()] = {
+                "size": entry.original_size or entry.data_size,
+                "hash": hash_buffer(buffer, entry.offset, entry.end)
+            }
+
+        return {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "prefix": layout.prefix,
+            "hash": hash_buffer(buffer),
+            "entries": entries
+        }
+
+
+class Manifest():
+    def __init__(self, build_dir = "", pbos = None):
+        self.build_dir = build_dir
+        self.pbos = {} if pbos is None else pbos
+
+    def __repr__(self):
+        return "Manifest(build_dir=%s, pbos=%d)" % (self.build_dir, len(self.pbos))
+
+    @property
+    def fingerprint(self):
+        # identifies the whole build, independent of file times
+        digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+        for name in sorted(self.pbos):
+            digest.update(("%s=%s\n" % (name, self.pbos[name]["hash"])).encode("utf-8"))
+        return digest.hexdigest()
+
+    def is_unchanged(self, name, filepath):
+        # True if the recorded fingerprint of a PBO can be reused without hashing it again
+        record = self.pbos.get(name)
+        if record is None:
+            return False
+
+        stat = os.stat(filepath)
+        return record["size"] == stat.st_size and record["mtime_ns"] == stat.st_mtime_ns
+
+    def entry_count(self):
+        return sum(len(record["entries"]) for record in self.pbos.values())
+
+    @classmethod
+    def load(cls, filepath):
+        try:
+            with open(filepath, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            raise Manifest_Error("Could not read %s: %s" % (filepath, e))
+
+        if data.get("version") != MANIFEST_VERSION:
+            raise Manifest_Error("Unsupported manifest version in %s: %s" % (filepath, data.get("version")))
+
+        return cls(data.get("build_dir", ""), data.get("pbos", {}))
+
+    def save(self, filepath):
+        data = {
+            "version": MANIFEST_VERSION,
+            "build_dir": self.build_dir,
+            "fingerprint": self.fingerprint,
+            "pbos": self.pbos
+        }
+        incremental.write_atomic(filepath, json.dumps(data, indent=1, sort_keys=True).encode("utf-8"))
+
+
+def diff_entries(old, new):
+    added = sorted(name for name in new if name not in old)
+    removed = sorted(name for name in old if name not in new)
+    changed = sorted(name for name in new if name in old and new[name]["hash"] != old[name]["hash"])
+    return EntryDiff(added, removed, changed)
+
+# Lists the PBOs added to and removed from new compared to old, and for every
+# PBO present in both whose content differs, the entries that changed.
+def diff(old, new):
+    added = sorted(name for name in new.pbos if name not in old.pbos)
+    removed = sorted(name for name in old.pbos if name not in new.pbos)
+    changed = {}
+    for name in sorted(new.pbos):
+        if name in old.pbos and new.pbos[name]["hash"] != old.pbos[name]["hash"]:
+            changed[name] = diff_entries(old.pbos[name]["entries"], new.pbos[name]["entries"])
+
+    return ManifestDiff(added, removed, changed)
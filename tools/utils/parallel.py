@@ -0,0 +1,80 @@
+# Process pool helpers for running independent per-addon work in parallel.
+# Read-only data shared by all tasks (like the global file or class index) is
+# inherited copy-on-write where the fork start method is available, and sent
+# to each worker once through the pool initializer otherwise. Diagnostics
+# recorded by a task are shipped back with its result and re-emitted by the
+# main process in task order, so output stays grouped and deterministic.
+# Profiled phases come back the same way and are merged into the main profile.
+
+
+import multiprocessing
+import os
+
+from . import diagnostics
+from . import profiling
+
+
+shared_data = None
+
+def shared():
+    # read-only data passed to map_ordered, available inside the tasks
+    return shared_data
+
+def default_jobs():
+    return os.cpu_count() or 1
+
+def add_arguments(parser):
+    parser.add_argument('-j', '--jobs',help='number of worker processes, defaults to the number of CPUs',type=int,default=default_jobs())
+
+def init_worker(data, level, instrumented):
+    global shared_data
+    if data is not None:
+        shared_data = data
+    if instrumented is not None:
+        profiling.profiler.start_worker(instrumented)
+
+    # records are collected per task and returned to the main process, never flushed here
+    diagnostics.diagnostics.records = []
+    diagnostics.diagnostics.level = level
+    diagnostics.diagnostics.flush_threshold = float("inf")
+
+def run_task(args):
+    func, task = args
+    diagnostics.diagnostics.records = []
+    profiling.profiler.collect()
+    result = func(task)
+    records = diagnostics.diagnostics.records
+    diagnostics.diagnostics.records = []
+    profile = profiling.profiler.collect() if profiling.profiler.enabled else None
+    return (result, records, profile)
+
+def get_context():
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+# Runs func(task) for each task and yields the results in task order.
+# func must be a module-level function so it can be sent to the workers.
+def map_ordered(func, tasks, jobs, data = None):
+    global shared_data
+    shared_data = data
+
+    if jobs <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield func(task)
+        return
+
+    # make sure the workers do not inherit and later re-emit pending output, a sarif
+    # log is only written once at exit and the workers start with no records anyway
+    if diagnostics.diagnostics.format != "sarif":
+        diagnostics.diagnostics.flush()
+
+    context = get_context()
+    instrumented = profiling.profiler.instrumented if profiling.profiler.enabled else None
+    initargs = (None if context.get_start_method() == "fork" else data, diagnostics.diagnostics.level, instrumented)
+    with context.Pool(min(jobs, len(tasks)), init_worker, initargs) as pool:
+        for (result, records, profile) in pool.imap(run_task, [(func, task) for task in tasks]):
+            diagnostics.diagnostics.extend(records)
+            if profile is not None:
+                profiling.profiler.merge(*profile)
+            yield result
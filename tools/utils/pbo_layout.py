@@ -0,0 +1,139 @@
+# Reader for the header and layout of PBO files.
+# Only the header is parsed, the entries are described by their offset and size
+# within the file, so their data can be read as slices of a memory mapped file
+# instead of loading every PBO into memory.
+# Format specifications: https://community.bistudio.com/wiki/PBO_File_Format
+
+
+from collections import namedtuple
+from contextlib import contextmanager
+import mmap
+import os
+import struct
+
+
+class PBOLayout_Error(Exception):
+    def __str__(self):
+        return "PBO - %s" % super().__str__()
+
+
+CHUNK_SIZE = 1 << 20
+PACKING_VERSION = 0x56657273 # "Vers", marks the header extension
+PACKING_COMPRESSED = 0x43707273 # "Cprs"
+CHECKSUM_SIZE = 20
+
+
+class PBOEntry(namedtuple("PBOEntry", ["filename", "packing_method", "original_size", "timestamp", "data_size", "offset"])):
+    __slots__ = ()
+
+    @property
+    def end(self):
+        return self.offset + self.data_size
+
+    @property
+    def compressed(self):
+        return self.packing_method == PACKING_COMPRESSED
+
+
+class PBOLayout():
+    def __init__(self, filepath, size):
+        self.filepath = filepath
+        self.size = size
+        self.properties = {}
+        self.entries = []
+        self.header_size = 0 # offset of the data of the first entry
+        self.data_end = 0
+
+    def __repr__(self):
+        return "PBOLayout(filepath=%s, entries=%d)" % (self.filepath, len(self.entries))
+
+    @property
+    def prefix(self):
+        return self.properties.get("prefix", "")
+
+    @property
+    def checksum_offset(self):
+        # Arma 3 PBOs end with a zero byte and the SHA-1 of everything before it
+        if self.size == self.data_end + 1 + CHECKSUM_SIZE:
+            return self.data_end + 1
+        return None
+
+    def data(self, buffer, entry):
+        # zero-copy view of the stored data of an entry
+        return memoryview(buffer)[entry.offset:entry.end]
+
+    @staticmethod
+    def read_asciiz(buffer, offset):
+        end = buffer.find(b"\0", offset)
+        if end < 0:
+            raise PBOLayout_Error("Unterminated string at offset %d" % offset)
+
+        value = bytes(buffer[offset:end])
+        try:
+            return (value.decode("utf-8"), end + 1)
+        except UnicodeDecodeError:
+            return (value.decode("latin-1"), end + 1)
+
+    @classmethod
+    def read(cls, buffer, filepath = "", size = None):
+        output = cls(filepath, len(buffer) if size is None else size)
+        offset = 0
+        first = True
+        headers = []
+
+        while True:
+            filename, offset = cls.read_asciiz(buffer, offset)
+            if offset + 20 > output.size:
+                raise PBOLayout_Error("Header entry exceeds file size at offset %d" % offset)
+            packing_method, original_size, reserved, timestamp, data_size = struct.unpack_from("<5I", buffer, offset)
+            offset += 20
+
+            if filename != "":
+                headers.append((filename, packing_method, original_size, timestamp, data_size))
+            elif first and packing_method == PACKING_VERSION:
+                # header extension, key-value pairs terminated by an empty string
+                while True:
+                    key, offset = cls.read_asciiz(buffer, offset)
+                    if key == "":
+                        break
+                    value, offset = cls.read_asciiz(buffer, offset)
+                    output.properties[key.lower()] = value
+            else:
+                break
+
+            first = False
+
+        output.header_size = offset
+        for (filename, packing_method, original_size, timestamp, data_size) in headers:
+            output.entries.append(PBOEntry(filename, packing_method, original_size, timestamp, data_size, offset))
+            offset += data_size
+        output.data_end = offset
+
+        if output.data_end > output.size:
+            raise PBOLayout_Error("Entry data exceeds file size by %d bytes" % (output.data_end - output.size))
+
+        return output
+
+
+def update_hash(digest, buffer, start = 0, end = None):
+    # feeds a range of a buffer to a hashlib object in chunks, without copying the range
+    end = len(buffer) if end is None else end
+    with memoryview(buffer) as view:
+        for offset in range(start, end, CHUNK_SIZE):
+            with view[offset:min(offset + CHUNK_SIZE, end)] as chunk:
+                digest.update(chunk)
+    return digest
+
+@contextmanager
+def open_pbo(filepath):
+    # memory maps a PBO and yields (layout, buffer), the buffer is only valid within the block
+    with open(filepath, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            raise PBOLayout_Error("Empty file: %s" % filepath)
+
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield (PBOLayout.read(buffer, filepath, size), buffer)
+        finally:
+            buffer.close()
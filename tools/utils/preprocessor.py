@@ -0,0 +1,315 @@
+# Preprocessor for config source files, following the rules of the Arma preprocessor.
+# Handles #include, #define (with parameters, # and ##), #undef, #ifdef, #ifndef, #if,
+# #else and #endif. Unlike the C preprocessor, macro arguments are expanded before they
+# are stringified or concatenated and nothing within double quotes is replaced.
+# Includes starting with a backslash are resolved through the $PBOPREFIX$ files of the
+# addons and the include/ tree of the project.
+# Format specifications: https://community.bistudio.com/wiki/PreProcessor_Commands
+
+
+from collections import namedtuple
+import os
+import re
+
+from .data_cfg import CFG_Reader
+
+
+class Preprocessor_Error(Exception):
+    def __str__(self):
+        return "Preprocessor - %s" % super().__str__()
+
+
+COMMENT_REGEX = re.compile(r'"(?:[^"\n]|"")*"|//[^\n]*|/\*.*?\*/', re.DOTALL)
+DIRECTIVE_REGEX = re.compile(r'^\s*#\s*(\w+)\s*(.*)$', re.DOTALL)
+DEFINE_REGEX = re.compile(r'^([A-Za-z_]\w*)(?:\(([^)]*)\))?\s*(.*)$', re.DOTALL)
+TOKEN_REGEX = re.compile(r'"(?:[^"]|"")*"|[A-Za-z_]\w*|\d[\w.]*|##|\s+|.', re.DOTALL)
+DEFINED_REGEX = re.compile(r'\bdefined\s*(?:\(\s*(\w+)\s*\)|(\w+))')
+EXPRESSION_REGEX = re.compile(r'^[\d\s()<>=!&|+\-*/%]*$')
+
+Macro = namedtuple("Macro", ["name", "params", "body"])
+# A line of a source file after removing comments and joining continued lines,
+# directive is None for text lines. Cached per file along with its modification time.
+Line = namedtuple("Line", ["number", "directive", "content"])
+
+file_cache = {}
+
+
+def is_identifier(token):
+    return token[0].isalpha() or token[0] == "_"
+
+def tokenize(text):
+    return TOKEN_REGEX.findall(text)
+
+def strip_comments(text):
+    def replace(match):
+        value = match.group()
+        if value[0] == '"':
+            return value
+        # block comments keep their line breaks so line numbers stay valid
+        return "\n" * value.count("\n") if value.startswith("/*") else ""
+    return COMMENT_REGEX.sub(replace, text)
+
+def read_lines(filepath):
+    # returns the lines of a file, read files are reused until their modification time changes
+    mtime = os.stat(filepath).st_mtime_ns
+    cached = file_cache.get(filepath)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with open(filepath, "r", encoding="utf-8-sig", errors="replace") as file:
+        text = file.read()
+
+    # continued lines are joined, the joined line keeps the number of its first line
+    output = []
+    pending = None
+    number = 1
+    for line in strip_comments(text).split("\n"):
+        if pending is None:
+            pending = (number, line)
+        else:
+            pending = (pending[0], pending[1] + line)
+        number += 1
+        if line.rstrip().endswith("\\") and DIRECTIVE_REGEX.match(pending[1]):
+            pending = (pending[0], pending[1].rstrip()[:-1])
+            continue
+        match = DIRECTIVE_REGEX.match(pending[1])
+        if match is not None:
+            output.append(Line(pending[0], match.group(1), match.group(2).strip()))
+        else:
+            output.append(Line(pending[0], None, pending[1]))
+        pending = None
+    if pending is not None:
+        output.append(Line(pending[0], None, pending[1]))
+
+    file_cache[filepath] = (mtime, output)
+    return output
+
+
+class Preprocessor():
+    def __init__(self, root_dir, prefixes = None, defines = None):
+        self.root_dir = root_dir
+        self.include_dir = os.path.join(root_dir, "include")
+        # {lowercase prefix: directory} of the addons, see grab_source_addons
+        self.prefixes = sorted((prefixes or {}).items(), key=lambda item: -len(item[0]))
+        self.defines = dict(defines or {})
+        self.macros = {}
+        self.includes = []
+
+    def __repr__(self):
+        return "Preprocessor(root_dir=%s, macros=%d)" % (self.root_dir, len(self.macros))
+
+    def reset(self):
+        self.macros = {name: Macro(name, None, tokenize(value)) for (name, value) in self.defines.items()}
+        self.includes = []
+
+    def resolve_include(self, name, current_dir):
+        if name.startswith("\\"):
+            path = name.strip("\\")
+            lowered = path.lower()
+            for (prefix, directory) in self.prefixes:
+                if lowered.startswith(prefix + "\\"):
+                    return os.path.join(directory, *path[len(prefix) + 1:].split("\\"))
+            return os.path.join(self.include_dir, *path.split("\\"))
+        return os.path.join(current_dir, *name.replace("\\", "/").split("/"))
+
+    def collect_args(self, tokens, start):
+        # splits the arguments of a macro call at commas outside of parentheses, returns them and the index after the call
+        args = [[]]
+        depth = 0
+        for idx in range(start + 1, len(tokens)):
+            token = tokens[idx]
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                if depth == 0:
+                    return ([self.trim(arg) for arg in args], idx + 1)
+                depth -= 1
+            elif token == "," and depth == 0:
+                args.append([])
+                continue
+            args[-1].append(token)
+        raise Preprocessor_Error("Unterminated macro arguments")
+
+    @staticmethod
+    def trim(tokens):
+        start = 0
+        end = len(tokens)
+        while start < end and tokens[start].isspace():
+            start += 1
+        while end > start and tokens[end - 1].isspace():
+            end -= 1
+        return tokens[start:end]
+
+    def substitute(self, macro, args):
+        # replaces the parameters in the body of a macro, # stringifies and ## joins tokens
+        values = dict(zip(macro.params, args))
+        output = []
+        body = macro.body
+        idx = 0
+        while idx < len(body):
+            token = body[idx]
+            if token == "#" and idx + 1 < len(body) and body[idx + 1] in values:
+                output.append('"%s"' % "".join(values[body[idx + 1]]).strip())
+                idx += 2
+                continue
+            if token == "##":
+                while output and output[-1].isspace():
+                    output.pop()
+                idx += 1
+                while idx < len(body) and body[idx].isspace():
+                    idx += 1
+                output.append("\0")
+                continue
+            output.extend(values.get(token, [token]))
+            idx += 1
+        # the joined tokens are split again, so pasted names can be expanded
+        return tokenize("".join(output).replace("\0", ""))
+
+    def expand(self, tokens, hidden = frozenset()):
+        output = []
+        idx = 0
+        while idx < len(tokens):
+            token = tokens[idx]
+            macro = self.macros.get(token) if is_identifier(token) and token not in hidden else None
+            if macro is None:
+                output.append(token)
+                idx += 1
+                continue
+
+            if macro.params is None:
+                output.extend(self.expand(macro.body, hidden | {token}))
+                idx += 1
+                continue
+
+            start = idx + 1
+            while start < len(tokens) and tokens[start].isspace():
+                start += 1
+            if start >= len(tokens) or tokens[start] != "(":
+                output.append(token)
+                idx += 1
+                continue
+
+            (args, idx) = self.collect_args(tokens, start)
+            if len(macro.params) == 0 and args == [[]]:
+                args = []
+            if len(args) != len(macro.params):
+                raise Preprocessor_Error("Macro %s takes %d arguments but %d were given" % (macro.name, len(macro.params), len(args)))
+            args = [self.expand(arg, hidden) for arg in args]
+            output.extend(self.expand(self.substitute(macro, args), hidden | {token}))
+
+        return output
+
+    def evaluate(self, expression):
+        expression = DEFINED_REGEX.sub(lambda match: "1" if (match.group(1) or match.group(2)) in self.macros else "0", expression)
+        tokens = self.expand(tokenize(expression))
+        # names left over after expansion are undefined and count as 0
+        text = "".join("0" if is_identifier(token) else token for token in tokens)
+        if not EXPRESSION_REGEX.match(text):
+            raise Preprocessor_Error("Unsupported #if expression: %s" % expression)
+        text = text.replace("&&", " and ").replace("||", " or ")
+        text = re.sub(r'!(?!=)', " not ", text)
+        try:
+            return bool(eval(text, {"__builtins__": {}}, {}))
+        except Exception as e:
+            raise Preprocessor_Error("Invalid #if expression %s: %s" % (expression, e))
+
+    def define(self, content):
+        match = DEFINE_REGEX.match(content)
+        if match is None:
+            raise Preprocessor_Error("Invalid #define: %s" % content)
+        (name, params, body) = match.groups()
+        if params is not None:
+            params = [param.strip() for param in params.split(",")] if params.strip() != "" else []
+        self.macros[name] = Macro(name, params, tokenize(body.strip()))
+
+    def process_file(self, filepath, output):
+        if not os.path.isfile(filepath):
+            raise Preprocessor_Error("File not found: %s" % filepath)
+        if len(self.includes) > 64:
+            raise Preprocessor_Error("Includes nested too deep in %s" % filepath)
+        self.includes.append(filepath)
+
+        conditions = []
+        active = True
+        text = []
+        for line in read_lines(filepath):
+            if line.directive is None:
+                if active:
+                    text.append(line.content)
+                continue
+
+            # consecutive text lines are expanded together, macro calls may span several lines
+            if text:
+                output.append("".join(self.expand(tokenize("\n".join(text)))))
+                text = []
+
+            directive = line.directive
+            if directive in ("ifdef", "ifndef", "if"):
+                if not active:
+                    conditions.append((False, True))
+                    continue
+                if directive == "if":
+                    taken = self.evaluate(line.content)
+                else:
+                    taken = (line.content.split()[0] in self.macros) == (directive == "ifdef") if line.content != "" else False
+                conditions.append((True, taken))
+            elif directive == "else":
+                if not conditions:
+                    raise Preprocessor_Error("#else without #if in %s line %d" % (filepath, line.number))
+                (enclosing, taken) = conditions[-1]
+                conditions[-1] = (enclosing, not taken)
+            elif directive == "endif":
+                if not conditions:
+                    raise Preprocessor_Error("#endif without #if in %s line %d" % (filepath, line.number))
+                conditions.pop()
+            active = all(enclosing and taken for (enclosing, taken) in conditions)
+            if not active or directive in ("ifdef", "ifndef", "if", "else", "endif"):
+                continue
+
+            if directive == "define":
+                self.define(line.content)
+            elif directive == "undef":
+                self.macros.pop(line.content.strip(), None)
+            elif directive == "include":
+                name = line.content.strip()
+                if len(name) < 2 or name[0] not in "\"<" or name[-1] not in "\">":
+                    raise Preprocessor_Error("Invalid #include in %s line %d: %s" % (filepath, line.number, name))
+                path = self.resolve_include(name[1:-1], os.path.dirname(filepath))
+                try:
+                    self.process_file(path, output)
+                except Preprocessor_Error as e:
+                    raise Preprocessor_Error("%s\n    included from %s line %d" % (e.args[0], filepath, line.number))
+            # other directives like #pragma do not change the output
+
+        if conditions:
+            raise Preprocessor_Error("Unterminated #if in %s" % filepath)
+        if text:
+            output.append("".join(self.expand(tokenize("\n".join(text)))))
+        self.includes.pop()
+
+    def preprocess(self, filepath):
+        # returns the preprocessed text of a file, macros start out empty for every file
+        self.reset()
+        output = []
+        self.process_file(filepath, output)
+        return "\n".join(output)
+
+
+def grab_source_addons(root_dir):
+    # returns (name, directory, prefix) of every addon source folder with a config.cpp
+    addons_dir = os.path.join(root_dir, "addons")
+    addons = []
+    for name in sorted(next(os.walk(addons_dir), (None, [], None))[1]):
+        directory = os.path.join(addons_dir, name)
+        prefix_file = os.path.join(directory, "$PBOPREFIX$")
+        if not os.path.isfile(os.path.join(directory, "config.cpp")) or not os.path.isfile(prefix_file):
+            continue
+        with open(prefix_file, "r", encoding="utf-8-sig") as file:
+            prefix = file.read().strip().strip("\\")
+        addons.append((name, directory, prefix))
+
+    return addons
+
+def read_source_config(preprocessor, directory):
+    # preprocesses and parses the config.cpp of an addon source folder into a RAP.Root
+    return CFG_Reader.read_text(preprocessor.preprocess(os.path.join(directory, "config.cpp")))
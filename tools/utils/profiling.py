@@ -0,0 +1,223 @@
+# Phase timing instrumentation shared by the tools.
+# Functions are wrapped in place to record inclusive wall and CPU time per
+# phase, broken down by the addon being processed. Recursive functions are only
+# timed at their outermost call. Optionally tracks peak memory through
+# tracemalloc and writes a cProfile dump. Phases timed inside worker processes
+# are collected per task and merged by the main process, see parallel.py.
+
+
+import atexit
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from . import diagnostics
+
+
+class PhaseStats():
+    __slots__ = ("calls", "wall", "cpu")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def as_dict(self):
+        return {"calls": self.calls, "wall": round(self.wall, 6), "cpu": round(self.cpu, 6)}
+
+
+class Profiler():
+    def __init__(self):
+        self.enabled = False
+        self.tool = ""
+        self.output = None
+        self.cprofile_output = None
+        self.cprofile = None
+        self.track_memory = False
+        self.phases = {}
+        self.addons = {}
+        self.active = {}
+        # (module name, phases) of every instrument() call, repeated in spawned workers
+        self.instrumented = []
+        self.start_wall = 0.0
+        self.start_cpu = 0.0
+
+    def record(self, phase, addon, wall, cpu):
+        stats = self.phases.get(phase)
+        if stats is None:
+            stats = self.phases[phase] = PhaseStats()
+        stats.calls += 1
+        stats.wall += wall
+        stats.cpu += cpu
+
+        if addon is None:
+            return
+
+        addon_phases = self.addons.setdefault(addon, {})
+        stats = addon_phases.get(phase)
+        if stats is None:
+            stats = addon_phases[phase] = PhaseStats()
+        stats.calls += 1
+        stats.wall += wall
+        stats.cpu += cpu
+
+    # Returns a wrapper around func that times each outermost call as the given phase.
+    # addon_from maps the call arguments to an addon name, otherwise the addon the
+    # diagnostics are currently reported for is used.
+    def wrap(self, func, phase, addon_from = None):
+        def wrapper(*args, **kwargs):
+            if self.active.get(phase, 0) > 0:
+                return func(*args, **kwargs)
+
+            addon = addon_from(*args) if addon_from is not None else diagnostics.diagnostics.addon
+            self.active[phase] = 1
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(phase, addon, time.perf_counter() - wall, time.process_time() - cpu)
+                self.active[phase] = 0
+
+        # the wrapper replaces func in its module, so it is pickled by the same name
+        wrapper.__name__ = getattr(func, "__name__", phase)
+        wrapper.__qualname__ = getattr(func, "__qualname__", wrapper.__name__)
+        wrapper.__module__ = getattr(func, "__module__", None)
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def start(self):
+        self.enabled = True
+        if self.track_memory:
+            tracemalloc.start()
+        if self.cprofile_output is not None:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        atexit.register(self.stop)
+
+    def start_worker(self, instrumented):
+        # called in every worker process, spawned workers import the tool anew and have to be instrumented again
+        if self.enabled:
+            return
+        self.enabled = True
+        instrument_common()
+        for (module, phases) in instrumented:
+            # a spawned worker runs the main script through runpy, its functions keep
+            # their own globals apart from the module the pickled tasks are looked up in
+            namespaces = {id(vars(sys.modules[module])): vars(sys.modules[module])}
+            for name in phases:
+                func_globals = getattr(vars(sys.modules[module]).get(name), "__globals__", None)
+                if func_globals is not None:
+                    namespaces[id(func_globals)] = func_globals
+            for namespace in namespaces.values():
+                instrument(namespace, phases)
+
+    def collect(self):
+        # returns and resets the phases recorded so far, used by the workers after every task
+        output = (self.phases, self.addons)
+        self.phases = {}
+        self.addons = {}
+        return output
+
+    def merge(self, phases, addons):
+        # adds the phases recorded by a worker process
+        for (name, stats) in phases.items():
+            self.merge_stats(self.phases, name, stats)
+        for (addon, addon_phases) in addons.items():
+            target = self.addons.setdefault(addon, {})
+            for (name, stats) in addon_phases.items():
+                self.merge_stats(target, name, stats)
+
+    @staticmethod
+    def merge_stats(target, name, stats):
+        output = target.get(name)
+        if output is None:
+            output = target[name] = PhaseStats()
+        output.calls += stats.calls
+        output.wall += stats.wall
+        output.cpu += stats.cpu
+
+    def summary(self):
+        output = {
+            "tool": self.tool,
+            "wall": round(time.perf_counter() - self.start_wall, 6),
+            "cpu": round(time.process_time() - self.start_cpu, 6),
+            "phases": {name: stats.as_dict() for name, stats in self.phases.items()},
+            "addons": {addon: {name: stats.as_dict() for name, stats in phases.items()} for addon, phases in sorted(self.addons.items())}
+        }
+        if self.track_memory and tracemalloc.is_tracing():
+            output["peak_memory"] = tracemalloc.get_traced_memory()[1]
+
+        return output
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.cprofile_output)
+
+        summary = self.summary()
+        if self.track_memory:
+            tracemalloc.stop()
+
+        diagnostics.print_blue("## Profile ##")
+        diagnostics.print_info("total: {:.3f}s wall, {:.3f}s cpu", summary["wall"], summary["cpu"])
+        for name, stats in sorted(self.phases.items(), key=lambda item: -item[1].wall):
+            diagnostics.print_info("{:<24} {:>6} calls {:>10.3f}s wall {:>10.3f}s cpu", name, stats.calls, stats.wall, stats.cpu)
+        if "peak_memory" in summary:
+            diagnostics.print_info("peak memory: {:.1f} MiB", summary["peak_memory"] / (1024 * 1024))
+
+        if self.output is not None:
+            with open(self.output, "w", encoding="utf-8") as file:
+                json.dump(summary, file, indent=1)
+            diagnostics.print_blue("Wrote profile to file: {}", self.output)
+
+
+profiler = Profiler()
+
+def add_arguments(parser):
+    parser.add_argument('--profile',help='records per-phase timings and prints a summary at the end',action='store_true')
+    parser.add_argument('--profile-output',help='file to write the profile summary to as JSON, defaults to <tool>_profile.json')
+    parser.add_argument('--profile-memory',help='tracks peak memory usage with tracemalloc, slows down the run considerably',action='store_true')
+    parser.add_argument('--profile-cprofile',help='file to write a cProfile dump to')
+
+def configure_from_args(tool, args):
+    # must run after diagnostics.configure, so the summary is printed before the final flush
+    if not (args.profile or args.profile_cprofile):
+        return False
+
+    profiler.tool = tool
+    profiler.output = args.profile_output or "{}_profile.json".format(os.path.splitext(tool)[0])
+    profiler.track_memory = args.profile_memory
+    profiler.cprofile_output = args.profile_cprofile
+    profiler.start()
+    instrument_common()
+    return True
+
+def instrument(namespace, phases):
+    # replaces the named functions of a module namespace with timed wrappers
+    if namespace.get("__name__") is not None:
+        profiler.instrumented.append((namespace["__name__"], phases))
+    for name, phase in phases.items():
+        namespace[name] = profiler.wrap(namespace[name], phase)
+
+def instrument_common():
+    # PBO reading and config parsing are shared by every tool
+    from .data_rap import RAP_Reader
+    # rewrapped as a classmethod, so readers derived from RAP_Reader keep their own class
+    RAP_Reader.read_raw = classmethod(profiler.wrap(RAP_Reader.read_raw.__func__, "config parse"))
+
+    try:
+        from yapbol import PBOFile
+    except ImportError:
+        return
+    PBOFile.read_file = profiler.wrap(PBOFile.read_file, "pbo read", lambda filename: os.path.basename(filename))
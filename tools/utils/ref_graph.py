@@ -0,0 +1,292 @@
+# Reference graph of the classes, files and addons of a build.
+# Node names are interned into integer ids, edges are kept in flat typed arrays
+# and compiled into forward and reverse adjacency arrays (CSR layout) once the
+# graph is frozen, so that reverse lookups like "who uses this texture" do not
+# need to scan every edge.
+# Class nodes are named by their path below the config root, e.g.
+# "cfgvehicles>>my_car", as classes of the same name in different containers
+# are unrelated.
+
+
+from array import array
+from enum import Enum
+import json
+import sqlite3
+from xml.sax.saxutils import escape
+
+
+class RefGraph_Error(Exception):
+    def __str__(self):
+        return "RefGraph - %s" % super().__str__()
+
+
+class RefGraph():
+    class NodeType(Enum):
+        ADDON = 0
+        CLASS = 1
+        FILE = 2
+
+    class EdgeType(Enum):
+        CONTAINS = 0    # addon defines class / addon packs file
+        INHERITS = 1    # class X: Y
+        CLASS_REF = 2   # class X references class Y via property P
+        FILE_REF = 3    # class X references file F via property P
+
+    # Edge types along which a removal propagates to the source node.
+    DEPENDENCY_EDGES = (EdgeType.INHERITS, EdgeType.CLASS_REF, EdgeType.FILE_REF)
+
+    class Edge():
+        def __init__(self, source, target, type, prop):
+            self.source = source
+            self.target = target
+            self.type = type
+            self.prop = prop
+
+        def __repr__(self):
+            return "Edge(source=%s, target=%s, type=%s, prop=%s)" % (self.source, self.target, self.type.name, self.prop)
+
+        def __str__(self):
+            if self.prop != "":
+                return "%s -[%s: %s]-> %s" % (self.source, self.type.name, self.prop, self.target)
+            return "%s -[%s]-> %s" % (self.source, self.type.name, self.target)
+
+    def __init__(self):
+        # nodes
+        self.node_names = []
+        self.node_types = array('B')
+        self.node_index = {}
+
+        # interned property names, index 0 is "no property"
+        self.props = [""]
+        self.prop_index = {"": 0}
+
+        # edge list, in insertion order
+        self.edge_source = array('I')
+        self.edge_target = array('I')
+        self.edge_type = array('B')
+        self.edge_prop = array('I')
+        self.edge_set = set()
+
+        # compiled adjacency, built by freeze()
+        self.frozen = False
+        self.out_offsets = None
+        self.out_edges = None
+        self.in_offsets = None
+        self.in_edges = None
+
+    def __len__(self):
+        return len(self.node_names)
+
+    def __str__(self):
+        return "RefGraph(nodes=%d, edges=%d)" % (len(self.node_names), len(self.edge_source))
+
+    @staticmethod
+    def normalize(type, name):
+        name = name.lower()
+        if type == RefGraph.NodeType.FILE and not name.startswith("\\"):
+            name = "\\" + name
+        elif type == RefGraph.NodeType.CLASS:
+            name = ">>".join(part.strip() for part in name.split(">>"))
+
+        return name
+
+    @staticmethod
+    def class_path(container, name):
+        return "%s>>%s" % (container, name)
+
+    def add_node(self, type, name):
+        key = (type.value, self.normalize(type, name))
+        node = self.node_index.get(key)
+        if node is None:
+            node = len(self.node_names)
+            self.node_index[key] = node
+            self.node_names.append(key[1])
+            self.node_types.append(type.value)
+            self.frozen = False
+
+        return node
+
+    def find_node(self, type, name):
+        return self.node_index.get((type.value, self.normalize(type, name)))
+
+    # Class nodes whose path ends with the given name, to look up a class
+    # without knowing its container.
+    def find_classes(self, name):
+        suffix = ">>" + self.normalize(RefGraph.NodeType.CLASS, name)
+        return [
+            self.node_names[node] for node in range(len(self.node_names))
+            if self.node_types[node] == RefGraph.NodeType.CLASS.value and self.node_names[node].endswith(suffix)
+        ]
+
+    def node_type(self, node):
+        return RefGraph.NodeType(self.node_types[node])
+
+    def add_edge(self, source, target, type, prop = ""):
+        prop_id = self.prop_index.get(prop)
+        if prop_id is None:
+            prop_id = len(self.props)
+            self.prop_index[prop] = prop_id
+            self.props.append(prop)
+
+        key = (source, target, type.value, prop_id)
+        if key in self.edge_set:
+            return
+
+        self.edge_set.add(key)
+        self.edge_source.append(source)
+        self.edge_target.append(target)
+        self.edge_type.append(type.value)
+        self.edge_prop.append(prop_id)
+        self.frozen = False
+
+    def edge(self, idx):
+        return RefGraph.Edge(
+            self.node_names[self.edge_source[idx]],
+            self.node_names[self.edge_target[idx]],
+            RefGraph.EdgeType(self.edge_type[idx]),
+            self.props[self.edge_prop[idx]]
+        )
+
+    @staticmethod
+    def compile_adjacency(node_count, keys):
+        # counting sort of the edge ids by their key node
+        offsets = array('I', bytes(4 * (node_count + 1)))
+        for node in keys:
+            offsets[node + 1] += 1
+        for i in range(node_count):
+            offsets[i + 1] += offsets[i]
+
+        fill = array('I', offsets)
+        edges = array('I', bytes(4 * len(keys)))
+        for idx, node in enumerate(keys):
+            edges[fill[node]] = idx
+            fill[node] += 1
+
+        return (offsets, edges)
+
+    def freeze(self):
+        if self.frozen:
+            return
+
+        count = len(self.node_names)
+        self.out_offsets, self.out_edges = self.compile_adjacency(count, self.edge_source)
+        self.in_offsets, self.in_edges = self.compile_adjacency(count, self.edge_target)
+        self.frozen = True
+
+    def outgoing(self, node):
+        self.freeze()
+        return self.out_edges[self.out_offsets[node]:self.out_offsets[node + 1]]
+
+    def incoming(self, node):
+        self.freeze()
+        return self.in_edges[self.in_offsets[node]:self.in_offsets[node + 1]]
+
+    # Direct users of a node: every edge pointing at it, e.g. all classes
+    # referencing a texture, or the addons packing it.
+    def users(self, type, name):
+        node = self.find_node(type, name)
+        if node is None:
+            raise RefGraph_Error("Unknown %s node: %s" % (type.name.lower(), name))
+
+        return [self.edge(idx) for idx in self.incoming(node)]
+
+    # Direct dependencies of a node: every edge going out from it.
+    def dependencies(self, type, name):
+        node = self.find_node(type, name)
+        if node is None:
+            raise RefGraph_Error("Unknown %s node: %s" % (type.name.lower(), name))
+
+        return [self.edge(idx) for idx in self.outgoing(node)]
+
+    # Transitive closure over reverse dependency edges: every class that breaks
+    # if the given node is deleted, mapped to its distance from the node.
+    def impact(self, type, name):
+        start = self.find_node(type, name)
+        if start is None:
+            raise RefGraph_Error("Unknown %s node: %s" % (type.name.lower(), name))
+
+        self.freeze()
+        dependency_types = set(t.value for t in self.DEPENDENCY_EDGES)
+        distances = {start: 0}
+        queue = [start]
+        for node in queue:
+            for idx in self.incoming(node):
+                if self.edge_type[idx] not in dependency_types:
+                    continue
+
+                source = self.edge_source[idx]
+                if source not in distances:
+                    distances[source] = distances[node] + 1
+                    queue.append(source)
+
+        del distances[start]
+        return {self.node_names[node]: dist for node, dist in distances.items()}
+
+    def write_json(self, filepath):
+        output = {
+            "nodes": [{"id": idx, "type": self.node_type(idx).name.lower(), "name": name} for idx, name in enumerate(self.node_names)],
+            "edges": [
+                {
+                    "source": self.edge_source[idx],
+                    "target": self.edge_target[idx],
+                    "type": RefGraph.EdgeType(self.edge_type[idx]).name.lower(),
+                    "prop": self.props[self.edge_prop[idx]]
+                }
+                for idx in range(len(self.edge_source))
+            ]
+        }
+
+        with open(filepath, "w", encoding="utf-8") as file:
+            json.dump(output, file, indent=1)
+
+    def write_graphml(self, filepath):
+        with open(filepath, "w", encoding="utf-8") as file:
+            file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            file.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+            file.write('\t<key id="type" for="all" attr.name="type" attr.type="string"/>\n')
+            file.write('\t<key id="name" for="node" attr.name="name" attr.type="string"/>\n')
+            file.write('\t<key id="prop" for="edge" attr.name="prop" attr.type="string"/>\n')
+            file.write('\t<graph id="refs" edgedefault="directed">\n')
+
+            for idx, name in enumerate(self.node_names):
+                file.write('\t\t<node id="n%d"><data key="type">%s</data><data key="name">%s</data></node>\n' % (idx, self.node_type(idx).name.lower(), escape(name)))
+
+            for idx in range(len(self.edge_source)):
+                file.write('\t\t<edge source="n%d" target="n%d"><data key="type">%s</data><data key="prop">%s</data></edge>\n' % (
+                    self.edge_source[idx],
+                    self.edge_target[idx],
+                    RefGraph.EdgeType(self.edge_type[idx]).name.lower(),
+                    escape(self.props[self.edge_prop[idx]])
+                ))
+
+            file.write('\t</graph>\n')
+            file.write('</graphml>\n')
+
+    def write_sqlite(self, filepath):
+        connection = sqlite3.connect(filepath)
+        try:
+            with connection:
+                connection.executescript("""
+                    DROP TABLE IF EXISTS nodes;
+                    DROP TABLE IF EXISTS edges;
+                    CREATE TABLE nodes (id INTEGER PRIMARY KEY, type TEXT NOT NULL, name TEXT NOT NULL);
+                    CREATE TABLE edges (source INTEGER NOT NULL, target INTEGER NOT NULL, type TEXT NOT NULL, prop TEXT NOT NULL);
+                """)
+                connection.executemany(
+                    "INSERT INTO nodes VALUES (?, ?, ?)",
+                    ((idx, self.node_type(idx).name.lower(), name) for idx, name in enumerate(self.node_names))
+                )
+                connection.executemany(
+                    "INSERT INTO edges VALUES (?, ?, ?, ?)",
+                    (
+                        (self.edge_source[idx], self.edge_target[idx], RefGraph.EdgeType(self.edge_type[idx]).name.lower(), self.props[self.edge_prop[idx]])
+                        for idx in range(len(self.edge_source))
+                    )
+                )
+                connection.executescript("""
+                    CREATE INDEX nodes_name ON nodes (name);
+                    CREATE INDEX edges_source ON edges (source);
+                    CREATE INDEX edges_target ON edges (target);
+                """)
+        finally:
+            connection.close()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# File: verify_pbos.py
+# Author: Mokka
+#
+# Description: Verifies the integrity of the built pbos
+#
+# Usage: python ./tools/verify_pbos.py
+#
+###############################################################################
+
+# The MIT License (MIT)
+
+# Copyright (c) 2026-2026 Mokka
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+###############################################################################
+
+__version__ = "0.1"
+
+import sys
+
+if sys.version_info[0] == 2:
+    print("Python 3 is required.")
+    sys.exit(1)
+
+import os
+import argparse
+import hashlib
+from utils import diagnostics
+from utils import parallel
+from utils import profiling
+from utils.diagnostics import print_error, print_warning, print_trace, print_info, print_green, print_blue
+from utils.pbo_layout import open_pbo, update_hash, PBOLayout_Error, CHECKSUM_SIZE
+
+# Set Globals
+root_dir = ""
+build_dir = ""
+
+def find_build_dir(pwd):
+    # check if we find the .hemttout folder here, otherwise try one directory further up
+    print_trace("Searching for .hemttout in {}", pwd)
+    hemttout_dir = os.path.join(pwd,'.hemttout')
+    if (os.path.isdir(hemttout_dir)):
+        print_trace("Searching for build dir in {}", hemttout_dir)
+        build_dir = os.path.join(hemttout_dir,'build')
+        if (os.path.isdir(build_dir)):
+            print_trace("HEMTT build dir found: {}", build_dir)
+            return build_dir
+        else:
+            raise Exception("NoBuildDir","HEMTT build output directory could not be found!")
+    else:
+        return find_build_dir(os.path.join(pwd,'..'))
+
+def grab_built_pbo_files(dir):
+    # return all pbos of the build as (name relative to the build dir, path)
+    pbos = []
+    for (path, dirs, files) in os.walk(dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.lower().endswith(".pbo"):
+                filepath = os.path.join(path, file)
+                pbos.append((os.path.relpath(filepath, dir).replace(os.sep, "/"), filepath))
+    print_trace("pbo files returned: {}", pbos)
+
+    return pbos
+
+def verify_layout(name, layout, buffer):
+    # checks the header and the trailing checksum, returns False if the pbo is damaged
+    valid = True
+    if (layout.prefix == ""):
+        print_warning("PBO {} has no prefix", name)
+
+    seen = set()
+    for entry in layout.entries:
+        filename = entry.filename.lower()
+        if (filename in seen):
+            print_warning("Duplicate entry in {}: {}", name, entry.filename)
+        seen.add(filename)
+    print_trace("{}: {} entries, data from offset {} to {}", name, len(layout.entries), layout.header_size, layout.data_end)
+
+    expected_size = layout.data_end + 1 + CHECKSUM_SIZE
+    if (layout.size < expected_size):
+        print_error("PBO {} is truncated, expected {} bytes but found {}", name, expected_size, layout.size)
+        return False
+    if (layout.size > expected_size):
+        print_error("PBO {} has {} unexpected bytes after the checksum", name, layout.size - expected_size)
+        valid = False
+    if (buffer[layout.data_end] != 0):
+        print_error("Missing zero byte before the checksum of {} at offset {}", name, layout.data_end)
+        valid = False
+
+    checksum = update_hash(hashlib.sha1(), buffer, 0, layout.data_end).digest()
+    stored = buffer[layout.data_end + 1:layout.data_end + 1 + CHECKSUM_SIZE]
+    if (checksum != stored):
+        print_error("Checksum mismatch in {}, stored {} but computed {}", name, stored.hex(), checksum.hex())
+        valid = False
+
+    return valid
+
+def verify_pbo(task):
+    # verifies a single pbo, may run in a worker process
+    (name, filepath) = task
+    diagnostics.set_addon(name)
+    print_trace("verifying pbo file: {}", filepath)
+    try:
+        with open_pbo(filepath) as (layout, buffer):
+            valid = verify_layout(name, layout, buffer)
+    except (OSError, PBOLayout_Error) as e:
+        print_error("PBO {} could not be read: {}", name, e)
+        valid = False
+    diagnostics.set_addon(None)
+
+    return (name, valid)
+
+
+def main(argv):
+    print_blue("## verify_pbos.py, version {} ##\n", __version__)
+
+    # parse args
+    parser = argparse.ArgumentParser(description="This script verifies the headers and checksums of all pbos in the output of this project's HEMTT build.")
+    parser.add_argument('directory',nargs='?',help='directory to operate on',default='.')
+    parser.add_argument('-v', '--verbose',help='enables tracel-level logging',action='store_true')
+    parallel.add_arguments(parser)
+    diagnostics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    diagnostics.configure_from_args("verify_pbos.py", __version__, args)
+    if (profiling.configure_from_args("verify_pbos.py", args)):
+        profiling.instrument(globals(), {
+            "grab_built_pbo_files": "list pbos",
+            "verify_layout": "verify pbo"
+        })
+
+    global root_dir
+    root_dir = os.path.abspath(args.directory)
+    print_trace("setting root_dir to {}", root_dir)
+
+    # preliminary stuffs
+    global build_dir
+    try:
+        build_dir = find_build_dir(root_dir)
+    except:
+        print_error("An exception occurred while attempting to find the build directory!")
+        sys.exit(1)
+
+    pbos = grab_built_pbo_files(build_dir)
+    if (len(pbos) == 0):
+        print_error("No pbos found in {}", build_dir)
+        sys.exit(1)
+
+    errors = []
+    for (name, valid) in parallel.map_ordered(verify_pbo, pbos, args.jobs):
+        if (not valid):
+            errors.append(name)
+
+    if (len(errors) == 0):
+        print_green("All {} pbos verified!", len(pbos))
+        sys.exit(0)
+    else:
+        print_error("One or more pbos are damaged: {}", errors)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -32,7 +32,7 @@
 
 ###############################################################################
 
-__version__ = "0.1"
+__version__ = "0.2"
 
 import sys
 
@@ -47,146 +47,20 @@ import io
 import re
 import struct
 from utils import binary_handler
+from utils import diagnostics
+from utils import incremental
+from utils import parallel
+from utils import profiling
+from utils.diagnostics import print_error, print_warning, print_trace, print_info, print_green, print_blue
 from utils import data_rap as rap
+from utils.data_cfg import CFG_Reader, CFG_Error
 
 # Set Globals
 root_dir = ""
 build_dir = ""
 only_list = []
-enable_trace = False
 output_file = "XtdGearModels.hpp"
 
-############################################################
-# Utility functions
-# Copyright (c) André Burgaud
-# http://www.burgaud.com/bring-colors-to-the-windows-console-with-python/
-if sys.platform == "win32":
-    from ctypes import windll, Structure, c_short, c_ushort, byref
-
-    SHORT = c_short
-    WORD = c_ushort
-
-    class COORD(Structure):
-      """struct in wincon.h."""
-      _fields_ = [
-        ("X", SHORT),
-        ("Y", SHORT)]
-
-    class SMALL_RECT(Structure):
-      """struct in wincon.h."""
-      _fields_ = [
-        ("Left", SHORT),
-        ("Top", SHORT),
-        ("Right", SHORT),
-        ("Bottom", SHORT)]
-
-    class CONSOLE_SCREEN_BUFFER_INFO(Structure):
-      """struct in wincon.h."""
-      _fields_ = [
-        ("dwSize", COORD),
-        ("dwCursorPosition", COORD),
-        ("wAttributes", WORD),
-        ("srWindow", SMALL_RECT),
-        ("dwMaximumWindowSize", COORD)]
-
-    # winbase.h
-    STD_INPUT_HANDLE = -10
-    STD_OUTPUT_HANDLE = -11
-    STD_ERROR_HANDLE = -12
-
-    # wincon.h
-    FOREGROUND_BLACK     = 0x0000
-    FOREGROUND_BLUE      = 0x0001
-    FOREGROUND_GREEN     = 0x0002
-    FOREGROUND_CYAN      = 0x0003
-    FOREGROUND_RED       = 0x0004
-    FOREGROUND_MAGENTA   = 0x0005
-    FOREGROUND_YELLOW    = 0x0006
-    FOREGROUND_GREY      = 0x0007
-    FOREGROUND_INTENSITY = 0x0008 # foreground color is intensified.
-
-    BACKGROUND_BLACK     = 0x0000
-    BACKGROUND_BLUE      = 0x0010
-    BACKGROUND_GREEN     = 0x0020
-    BACKGROUND_CYAN      = 0x0030
-    BACKGROUND_RED       = 0x0040
-    BACKGROUND_MAGENTA   = 0x0050
-    BACKGROUND_YELLOW    = 0x0060
-    BACKGROUND_GREY      = 0x0070
-    BACKGROUND_INTENSITY = 0x0080 # background color is intensified.
-
-    stdout_handle = windll.kernel32.GetStdHandle(STD_OUTPUT_HANDLE)
-    SetConsoleTextAttribute = windll.kernel32.SetConsoleTextAttribute
-    GetConsoleScreenBufferInfo = windll.kernel32.GetConsoleScreenBufferInfo
-
-    def get_text_attr():
-      """Returns the character attributes (colors) of the console screen
-      buffer."""
-      csbi = CONSOLE_SCREEN_BUFFER_INFO()
-      GetConsoleScreenBufferInfo(stdout_handle, byref(csbi))
-      return csbi.wAttributes
-
-    def set_text_attr(color):
-      """Sets the character attributes (colors) of the console screen
-      buffer. Color is a combination of foreground and background color,
-      foreground and background intensity."""
-      SetConsoleTextAttribute(stdout_handle, color)
-
-def color(color):
-    """Set the color. Works on Win32 and normal terminals."""
-    if sys.platform == "win32":
-        if color == "green":
-            set_text_attr(FOREGROUND_GREEN | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "yellow":
-            set_text_attr(FOREGROUND_YELLOW | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "red":
-            set_text_attr(FOREGROUND_RED | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "blue":
-            set_text_attr(FOREGROUND_BLUE | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "magenta":
-            set_text_attr(FOREGROUND_MAGENTA | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "reset":
-            set_text_attr(FOREGROUND_GREY | get_text_attr() & 0x0070)
-        elif color == "grey":
-            set_text_attr(FOREGROUND_GREY | get_text_attr() & 0x0070)
-    else :
-        if color == "green":
-            sys.stdout.write('\033[92m')
-        elif color == "red":
-            sys.stdout.write('\033[91m')
-        elif color == "blue":
-            sys.stdout.write('\033[94m')
-        elif color == "reset":
-            sys.stdout.write('\033[0m')
-
-def print_error(msg):
-    color("red")
-    print ("ERROR: {}".format(msg))
-    color("reset")
-
-def print_warning(msg):
-    color("yellow")
-    print ("WARNING: {}".format(msg))
-    color("reset")
-
-def print_trace(msg):
-    if (not enable_trace):
-        return
-    color("magenta")
-    print ("TRACE: {}".format(msg))
-    color("reset")
-
-def print_green(msg):
-    color("green")
-    print(msg)
-    color("reset")
-
-def print_blue(msg):
-    color("blue")
-    print(msg)
-    color("reset")
-############################################################
-
 class ClassRef:
     def __init__(self, classname, data):
         self.classname = classname
@@ -201,37 +75,85 @@ class ClassRef:
 class ModelRef:
     def __init__(self,name,data):
         self.name = name
-
-        for d in data:
-            data[d] = list(set(data[d]))
-            data[d].sort()
-
-        self.data = data
+        # option values are collected as sets, the output lists them sorted
+        self.data = {option: sorted(values) for (option, values) in data.items()}
 
     def __repr__(self):
         return "ModelRef(name={}, data={})".format(self.name,self.data)
 
     def __str__(self):
-        options = ""
-        data_str = ""
-        keys = self.data.keys()
-        for idx, k in enumerate(keys):
-            options = options + '"{}"'.format(k)
-            if (idx < (len(keys) - 1)):
-                options = options + ", "
-
-            data_str = data_str + "\n\t\t\tclass {} {{\n\t\t\t\tchangeingame = 0;\n\t\t\t\tvalues[] = {{".format(k)
-            for idy, o in enumerate(self.data[k]):
-                data_str = data_str + '"{}"'.format(o)
-                if (idy < (len(self.data[k]) - 1)):
-                    data_str = data_str + ", "
-            data_str = data_str + "};\n"
-            for o in self.data[k]:
-                data_str = data_str + '\n\t\t\t\tclass {0} {{ label = "{1}"; }};'.format(o.replace(" ","_"),o)
-            data_str = data_str + "\n\t\t\t};\n"
-
-
-        return '\t\tclass {} {{\n\t\t\tlabel = "";\n\t\t\tauthor = "MokTech Industries";\n\t\t\toptions[] = {{{}}};\n{}\t\t}};'.format(self.name,options,data_str)
+        options = ", ".join(rap.CFG_Formatter.quoted(k) for k in self.data)
+
+        data_str = []
+        for (k, values) in self.data.items():
+            data_str.append("\n\t\t\tclass {} {{\n\t\t\t\tchangeingame = 0;\n\t\t\t\tvalues[] = {{".format(k))
+            data_str.append(", ".join(rap.CFG_Formatter.quoted(o) for o in values))
+            data_str.append("};\n")
+            data_str.extend('\n\t\t\t\tclass {0} {{ label = {1}; }};'.format(o.replace(" ","_"),rap.CFG_Formatter.quoted(o)) for o in values)
+            data_str.append("\n\t\t\t};\n")
+
+        return '\t\tclass {} {{\n\t\t\tlabel = "";\n\t\t\tauthor = "MokTech Industries";\n\t\t\toptions[] = {{{}}};\n{}\t\t}};'.format(self.name,options,"".join(data_str))
+
+class XtdGearInfoResolver:
+    # Resolves the effective XtdGearInfo of the classes within one config class body.
+    # A class without its own XtdGearInfo inherits the one of its parent, one declared
+    # as "class XtdGearInfo: XtdGearInfo" overrides single keys of the parent's, and one
+    # without a parent replaces it. Merged results are cached per class, so every
+    # inheritance chain is only walked once.
+    def __init__(self, body):
+        self.classes = {}
+        for entry in body.entries:
+            if entry.type == rap.RAP.EntryType.CLASS:
+                self.classes[entry.name.lower()] = entry
+        self.cache = {}
+
+    def __repr__(self):
+        return "XtdGearInfoResolver(classes={}, cached={})".format(len(self.classes), len(self.cache))
+
+    # Returns the merged XtdGearInfo of a class as {lowercase key: (key, value)}, or None
+    def resolve(self, classname):
+        # walk up the chain until a class with a known result, then merge back down
+        chain = []
+        visited = set()
+        name = classname.lower()
+        while name not in self.cache:
+            entry = self.classes.get(name)
+            if (entry is None):
+                # parent is defined outside of this config, its XtdGearInfo is unknown
+                print_trace("class {} not found while resolving XtdGearInfo of {}", name, classname)
+                self.cache[name] = None
+                break
+            if (name in visited):
+                print_warning("Inheritance cycle found while resolving XtdGearInfo of {}", classname)
+                self.cache[name] = None
+                break
+            visited.add(name)
+            chain.append(entry)
+            if (entry.body.inherits == ""):
+                break
+            name = entry.body.inherits.lower()
+
+        info = self.cache.get(name)
+        for entry in reversed(chain):
+            info = self.merge(entry, info)
+            self.cache[entry.name.lower()] = info
+
+        return self.cache[classname.lower()]
+
+    @staticmethod
+    def merge(entry, inherited):
+        xtdgearinfo = next((e for e in entry.body.entries if e.type == rap.RAP.EntryType.CLASS and (e.name.lower() == "xtdgearinfo")), None)
+        if (xtdgearinfo is None):
+            return inherited
+
+        info = dict(inherited) if (inherited is not None and xtdgearinfo.body.inherits != "") else {}
+        for e in xtdgearinfo.body.entries:
+            if e.type == rap.RAP.EntryType.DELETE:
+                info.pop(e.name.lower(), None)
+            else:
+                info[e.name.lower()] = (e.name, e.value)
+
+        return info
 
 class ConfigBin:
     def __init__(self, data, prefix, addon, path):
@@ -250,51 +172,52 @@ class ConfigBin:
 
 def find_build_dir(pwd):
     # check if we find the .hemttout folder here, otherwise try one directory further up
-    print_trace("Searching for .hemttout in {}".format(pwd))
+    print_trace("Searching for .hemttout in {}", pwd)
     hemttout_dir = os.path.join(pwd,'.hemttout')
     if (os.path.isdir(hemttout_dir)):
-        print_trace("Searching for build dir in {}".format(hemttout_dir))
+        print_trace("Searching for build dir in {}", hemttout_dir)
         build_dir = os.path.join(hemttout_dir,'build')
         if (os.path.isdir(build_dir)):
-            print_trace("HEMTT build dir found: {}".format(build_dir))
+            print_trace("HEMTT build dir found: {}", build_dir)
             return build_dir
         else:
             raise Exception("NoBuildDir","HEMTT build output directory could not be found!")
     else:
         return find_build_dir(os.path.join(pwd,'..'))
 
-def grab_built_pbos(dir):
-    # return all built pbos as PBOFile objects
+def grab_built_pbo_files(dir, skip=None):
+    # return the names and paths of all built pbos, except those skip(file, path) rejects
     addons_dir = os.path.join(dir,'addons')
-    print_trace("grabbing pbo files from addons dir: {}".format(addons_dir))
+    print_trace("grabbing pbo files from addons dir: {}", addons_dir)
     addons_pbos = next(os.walk(addons_dir), (None, None, []))[2]
-    print_trace("pbo files returned: {}".format(addons_pbos))
+    print_trace("pbo files returned: {}", addons_pbos)
 
     pbos = []
 
-    for file in addons_pbos:
-        print_trace("reading pbo file: {}".format(file))
-        pbo = PBOFile.read_file(os.path.join(addons_dir,file))
-        pbos.append([file,pbo])
+    for file in sorted(addons_pbos):
+        if (skip is not None and skip(file, os.path.join(addons_dir,file))):
+            print_trace("pbo file unchanged since last run, skipping: {}", file)
+            continue
+        pbos.append([file,os.path.join(addons_dir,file)])
 
     return pbos
 
 def get_config_prefix(cfg, searchprefix):
     cfg_patches = next(entry for entry in cfg.body.entries if entry.type == rap.RAP.EntryType.CLASS and (entry.name.lower() == "cfgpatches"))
     prefix = cfg_patches.body.entries[0].name.lower() if len(cfg_patches.body.entries) > 0 else None
-    print_trace("found config prefix: {}".format(prefix))
+    print_trace("found config prefix: {}", prefix)
     return prefix
 
 def read_pbo_config_bin(pbo):
     # grab pboprefix to find root path
     pboprefix = pbo.pbo_header.header_extension.strings[1].lower()
     searchprefix = pboprefix.split('\\')[1]
-    print_trace("found pboprefix as {}, searchprefix as {}".format(pboprefix,searchprefix))
+    print_trace("found pboprefix as {}, searchprefix as {}", pboprefix,searchprefix)
 
     # grab all files within the data directory and the config.bin
     config_bin = []
     for file in pbo:
-        #print_trace("checking file {}".format(file.filename))
+        #print_trace("checking file {}", file.filename)
         filename = "\\" + pboprefix + "\\" + file.filename.lower()
 
         if "config.bin" in filename:
@@ -306,7 +229,7 @@ def read_pbo_config_bin(pbo):
             path = os.path.join(root_dir, '\\'.join(pboprefix.split('\\')[-2:]), addon)
             c_bin = ConfigBin(cfg, searchprefix, prefix, path)
             config_bin.append(c_bin)
-            print_trace("found config.bin: {}".format(c_bin))
+            print_trace("found config.bin: {}", c_bin)
 
     if (len(config_bin) == 0):
         print_error("PBO does not contain a config.bin!")
@@ -337,125 +260,186 @@ def get_classes_from_config(config):
     else:
         classes_vehicles = []
 
-    print_trace("found facewear classes {}".format(classes_facewear))
-    print_trace("found weapon classes {}".format(classes_weapons))
-    print_trace("found vehicle classes {}".format(classes_vehicles))
+    print_trace("found facewear classes {}", classes_facewear)
+    print_trace("found weapon classes {}", classes_weapons)
+    print_trace("found vehicle classes {}", classes_vehicles)
     return (classes_facewear, classes_weapons, classes_vehicles)
 
 def recurse_classes_from_config(cfg,searchprefix,parent="root",level=0):
-    print_trace("recurse level {}".format(level))
+    print_trace("recurse level {}", level)
     classes = []
     if (level > 1):
         return classes # don't traverse past the first level here
+    resolver = None
     for entry in cfg.entries:
         if entry.type == rap.RAP.EntryType.CLASS:
-            print_trace("checking {} with searchprefix {}".format(entry.name,searchprefix))
+            print_trace("checking {} with searchprefix {}", entry.name,searchprefix)
             if (entry.name.find(searchprefix) == 0):
-                print_trace("{} in searchprefix".format(entry.name))
-                classes.extend(get_classref_from_entry(entry,searchprefix))
+                print_trace("{} in searchprefix", entry.name)
+                if (resolver is None):
+                    resolver = XtdGearInfoResolver(cfg)
+                classes.extend(get_classref_from_entry(entry,searchprefix,resolver))
             classes.extend(recurse_classes_from_config(entry.body,searchprefix, entry.name,level + 1))
 
     return classes
 
-def get_classref_from_entry(entry,searchprefix):
-    # look for XtdGearInfo
-    xtdgearinfo = next((e for e in entry.body.entries if e.type == rap.RAP.EntryType.CLASS and (e.name.lower() == "xtdgearinfo")), None)
-    if (xtdgearinfo is None):
-        return []
-
-    if (len(xtdgearinfo.body.entries) == 0):
+def get_classref_from_entry(entry,searchprefix,resolver):
+    # look for XtdGearInfo, either declared in the class itself or inherited from its parents
+    compat_data = resolver.resolve(entry.name)
+    if (compat_data is None or len(compat_data) == 0):
         return []
 
-    compat_data = {}
-    for e in xtdgearinfo.body.entries:
-        compat_data.update({e.name: e.value})
-
-    class_ref = ClassRef(entry.name, compat_data)
+    class_ref = ClassRef(entry.name, {name: value for (name, value) in compat_data.values()})
     return [class_ref]
 
 def get_models_from_classes(classes):
+    # groups the classes by model in one pass, models and options keep the order they are first seen in
     models = {}
     for c in classes:
-        model = ""
-        options = {}
-        for x in c.data:
-            if x == "model":
-                model = c.data[x]
-            else:
-                options[x] = c.data[x]
-        if model != "":
-            print_trace("iterating options in model {}: {}".format(model,options))
-            all_options = models.get(model, {})
-            for o in options:
-                p = all_options.get(o, [])
-                p.append(options[o])
-                all_options[o] = p
-            models[model] = all_options
-    print_trace("found models {}".format(models))
-
-    out = []
-    for m in models:
-        out.append(ModelRef(m,models[m]))
-
-    return out
-
-def write_compat_to_file(classes_facewear, classes_weapons, classes_vehicles, path,addon):
+        model = c.data.get("model", "")
+        if model == "":
+            continue
+
+        print_trace("iterating options in model {}: {}", model,c.data)
+        all_options = models.get(model)
+        if all_options is None:
+            all_options = models[model] = {}
+        for (o, value) in c.data.items():
+            if o == "model":
+                continue
+            values = all_options.get(o)
+            if values is None:
+                values = all_options[o] = set()
+            values.add(value)
+    print_trace("found models {}", models)
+
+    return [ModelRef(m, options) for (m, options) in models.items()]
+
+def render_compat(classes_facewear, classes_weapons, classes_vehicles):
+    f = io.StringIO()
+    f.write("// This file is automatically generated by write_aceax_compat.py\n")
+    f.write("// Do not edit this file manually!\n\n")
+    f.write("class XtdGearModels {\n")
+    if (len(classes_facewear) > 0):
+        models = get_models_from_classes(classes_facewear)
+        f.write("\tclass CfgGlasses {\n")
+        f.write("".join("{}\n".format(m) for m in models))
+        f.write("\t};\n")
+    if (len(classes_weapons) > 0):
+        models = get_models_from_classes(classes_weapons)
+        f.write("\tclass CfgWeapons {\n")
+        f.write("".join("{}\n".format(m) for m in models))
+        f.write("\t};\n")
+    if (len(classes_vehicles) > 0):
+        models = get_models_from_classes(classes_vehicles)
+        f.write("\tclass CfgVehicles {\n")
+        f.write("".join("{}\n".format(m) for m in models))
+        f.write("\t};\n")
+    f.write("};\n")
+
+    return f.getvalue()
+
+def verify_compat(content):
+    # reads the rendered file back, returns why it does not describe the models it was rendered from or None
+    try:
+        cfg = CFG_Reader.read_text(content)
+    except CFG_Error as e:
+        return str(e)
+
+    for section in cfg.body.find("XtdGearModels").body.entries:
+        for model in section.body.entries:
+            for option in model.body.entries:
+                if option.type != rap.RAP.EntryType.CLASS:
+                    continue
+                values = [value.value for value in option.body.find("values").body.elements]
+                classes = [entry for entry in option.body.entries if entry.type == rap.RAP.EntryType.CLASS]
+                if len(set(entry.name.lower() for entry in classes)) != len(classes):
+                    return "values of option {} of model {} share class names".format(option.name, model.name)
+                if values != [entry.body.find("label").value for entry in classes]:
+                    return "values of option {} of model {} do not match their labels".format(option.name, model.name)
+
+    return None
+
+def write_compat_to_file(content, path):
+    # returns (success, written), the file is only replaced if its content changes
+    if content is None:
+        return (False, False)
     if not os.path.exists(path):
-        print_warning("Directory does not exist: {}".format(path))
-        return False
+        print_warning("Directory does not exist: {}", path)
+        return (False, False)
     xtdgearmodels = os.path.join(path, output_file)
 
     try:
-        with open(xtdgearmodels, 'w', encoding='utf-8') as f:
-            f.write("// This file is automatically generated by write_aceax_compat.py\n")
-            f.write("// Do not edit this file manually!\n\n")
-            f.write("class XtdGearModels {\n")
-            if (len(classes_facewear) > 0):
-                models = get_models_from_classes(classes_facewear)
-                f.write("\tclass CfgGlasses {\n")
-                for m in models:
-                    f.write("{}\n".format(m))
-                f.write("\t};\n")
-            if (len(classes_weapons) > 0):
-                models = get_models_from_classes(classes_weapons)
-                f.write("\tclass CfgWeapons {\n")
-                for m in models:
-                    f.write("{}\n".format(m))
-                f.write("\t};\n")
-            if (len(classes_vehicles) > 0):
-                models = get_models_from_classes(classes_vehicles)
-                f.write("\tclass CfgVehicles {\n")
-                for m in models:
-                    f.write("{}\n".format(m))
-                f.write("\t};\n")
-            f.write("};\n")
+        written = incremental.write_if_changed(xtdgearmodels, content)
+    except OSError as e:
+        print_error("An error occurred while writing to file {}: {}", xtdgearmodels, e)
+        return (False, False)
 
+    return (True, written)
 
-    except OSError as e:
-        print_error("An error occurred while writing to file {}: {}".format(xtdgearmodels, e))
-        return False
+def generate_addon(task):
+    # reads, parses and renders the files of a single pbo, may run in a worker process
+    global root_dir
+    root_dir = parallel.shared()
+    (file, filepath) = task
 
-    return True
+    diagnostics.set_addon(file)
+    outputs = []
+    try:
+        print_trace("reading pbo file: {}", file)
+        pbo = PBOFile.read_file(filepath)
+
+        for config in read_pbo_config_bin(pbo):
+            classes_facewear, classes_weapons, classes_vehicles = get_classes_from_config(config)
+            if (len(classes_facewear) == 0 and len(classes_weapons) == 0 and len(classes_vehicles) == 0):
+                print_blue("No vehicle/weapon/facewear classes found in config.bin for addon: {}", config.addon)
+                continue
+
+            content = render_compat(classes_facewear, classes_weapons, classes_vehicles)
+            error = verify_compat(content)
+            if (error is not None):
+                print_error("Generated {} of addon {} could not be read back: {}", output_file, config.addon, error)
+                content = None
+            outputs.append((config.addon, config.path, content, len(classes_facewear), len(classes_weapons), len(classes_vehicles)))
+    except Exception as e:
+        print_error("Generating {} failed: {}", output_file, e)
+        outputs = None
+    diagnostics.set_addon(None)
+
+    return (file, filepath, outputs)
 
 def main(argv):
-    print_blue("## write_aceax_compat.py, version {} ##\n".format(__version__))
+    print_blue("## write_aceax_compat.py, version {} ##\n", __version__)
 
     # parse args
     parser = argparse.ArgumentParser(description="This script checks all local classes in the output of this project's HEMTT build.")
     parser.add_argument('directory',nargs='?',help='directory to operate on',default='.')
     parser.add_argument('-v', '--verbose',help='enables tracel-level logging',action='store_true')
     parser.add_argument('-o','--only',help='only run the path checks on the following addon',nargs='+')
+    parser.add_argument('-f','--force',help='regenerates the files of all addons, even if their pbo is unchanged',action='store_true')
+    parallel.add_arguments(parser)
+    diagnostics.add_arguments(parser)
+    profiling.add_arguments(parser)
     args = parser.parse_args()
-    global enable_trace
-    enable_trace = args.verbose
+    diagnostics.configure_from_args("write_aceax_compat.py", __version__, args)
+    if (profiling.configure_from_args("write_aceax_compat.py", args)):
+        profiling.instrument(globals(), {
+            "grab_built_pbo_files": "list pbos",
+            "read_pbo_config_bin": "read pbo contents",
+            "recurse_classes_from_config": "traverse config",
+            "get_models_from_classes": "collect models",
+            "render_compat": "render file",
+            "verify_compat": "verify file",
+            "write_compat_to_file": "write file"
+        })
 
     global root_dir
     root_dir = os.path.abspath(args.directory)
-    print_trace("setting root_dir to {}".format(root_dir))
+    print_trace("setting root_dir to {}", root_dir)
 
     global only_list
     only_list = args.only
-    print_trace("setting only_list to {}".format(only_list))
+    print_trace("setting only_list to {}", only_list)
 
     # preliminary stuffs
     global build_dir
@@ -465,12 +449,12 @@ def main(argv):
         print_error("An exception occurred while attempting to find the build directory!")
         sys.exit(1)
 
-    pbos = grab_built_pbos(build_dir)
+    cache = incremental.FingerprintCache(os.path.join(os.path.dirname(build_dir), "write_aceax_compat.cache.json"), __version__, root_dir)
+    pbos = grab_built_pbo_files(build_dir, None if args.force else cache.is_unchanged)
 
-    classes = []
     errors = []
-    config_bins = {}
-    for (file,pbo) in pbos:
+    tasks = []
+    for (file,filepath) in pbos:
         skip = False
         if (not only_list is None):
             skip = True
@@ -478,34 +462,50 @@ def main(argv):
                 if (it in file):
                     skip = False
         if (skip):
-            print_trace("{} not in only_list, skipping".format(file))
+            print_trace("{} not in only_list, skipping", file)
             continue
 
-        print_trace("reading data files from pbo {}".format(file))
-        config_bins[file] = read_pbo_config_bin(pbo)
+        tasks.append((file, filepath))
 
-    for config_files in config_bins.values():
-        for config in config_files:
-            classes_facewear, classes_weapons, classes_vehicles = get_classes_from_config(config)
-            if (len(classes_facewear) == 0 and len(classes_weapons) == 0 and len(classes_vehicles) == 0):
-                print_blue("No vehicle/weapon/facewear classes found in config.bin for addon: {}".format(config.addon))
-                continue
-
-            result = write_compat_to_file(classes_facewear, classes_weapons, classes_vehicles, config.path, config.addon)
-
-            if (result):
-                print_blue("Wrote {} facewear classes, {} weapon classes and {} vehicle classes to file: {}".format(len(classes_facewear), len(classes_weapons), len(classes_vehicles), os.path.join(config.path,output_file)))
+    # pbos are parsed and rendered in parallel, the files are written here in pbo order
+    for (file, filepath, generated) in parallel.map_ordered(generate_addon, tasks, args.jobs, root_dir):
+        diagnostics.set_addon(file)
+        if (generated is None):
+            errors.append(file)
+            cache.invalidate(file)
+            continue
+        outputs = []
+        failed = False
+        for (addon, path, content, count_facewear, count_weapons, count_vehicles) in generated:
+            (result, written) = write_compat_to_file(content, path)
+
+            if (result and written):
+                print_blue("Wrote {} facewear classes, {} weapon classes and {} vehicle classes to file: {}", count_facewear, count_weapons, count_vehicles, os.path.join(path,output_file))
+            elif (result):
+                print_blue("File is up to date: {}", os.path.join(path,output_file))
             else:
-                print_error("Failed to write to file: {}".format(os.path.join(config.path,output_file)))
-                errors.append(config.addon)
+                print_error("Failed to write to file: {}", os.path.join(path,output_file))
+                errors.append(addon)
+                failed = True
+            if (result):
+                outputs.append(os.path.join(path,output_file))
 
+        if (failed):
+            cache.invalidate(file)
+        else:
+            cache.update(file, filepath, outputs)
+    diagnostics.set_addon(None)
 
+    try:
+        cache.save()
+    except OSError as e:
+        print_warning("Could not save the fingerprint cache: {}", e)
 
     if (len(errors) == 0):
-        print_green("{} files successfully written!".format(output_file))
+        print_green("{} files successfully written!", output_file)
         sys.exit(0)
     else:
-        print_error("Writing {} for one or more addons has failed: {}".format(output_file, errors))
+        print_error("Writing {} for one or more addons has failed: {}", output_file, errors)
         sys.exit(1)
 
 
@@ -32,7 +32,7 @@
 
 ###############################################################################
 
-__version__ = "0.1"
+__version__ = "0.2"
 
 import sys
 
@@ -44,147 +44,21 @@ from yapbol import PBOFile
 import os
 import argparse
 import io
+import itertools
 import re
 import struct
 from utils import binary_handler
+from utils import diagnostics
+from utils import incremental
+from utils import parallel
+from utils import profiling
+from utils.diagnostics import print_error, print_warning, print_trace, print_info, print_green, print_blue
 from utils import data_rap as rap
 
 # Set Globals
 root_dir = ""
 build_dir = ""
 only_list = []
-enable_trace = False
-
-############################################################
-# Utility functions
-# Copyright (c) André Burgaud
-# http://www.burgaud.com/bring-colors-to-the-windows-console-with-python/
-if sys.platform == "win32":
-    from ctypes import windll, Structure, c_short, c_ushort, byref
-
-    SHORT = c_short
-    WORD = c_ushort
-
-    class COORD(Structure):
-      """struct in wincon.h."""
-      _fields_ = [
-        ("X", SHORT),
-        ("Y", SHORT)]
-
-    class SMALL_RECT(Structure):
-      """struct in wincon.h."""
-      _fields_ = [
-        ("Left", SHORT),
-        ("Top", SHORT),
-        ("Right", SHORT),
-        ("Bottom", SHORT)]
-
-    class CONSOLE_SCREEN_BUFFER_INFO(Structure):
-      """struct in wincon.h."""
-      _fields_ = [
-        ("dwSize", COORD),
-        ("dwCursorPosition", COORD),
-        ("wAttributes", WORD),
-        ("srWindow", SMALL_RECT),
-        ("dwMaximumWindowSize", COORD)]
-
-    # winbase.h
-    STD_INPUT_HANDLE = -10
-    STD_OUTPUT_HANDLE = -11
-    STD_ERROR_HANDLE = -12
-
-    # wincon.h
-    FOREGROUND_BLACK     = 0x0000
-    FOREGROUND_BLUE      = 0x0001
-    FOREGROUND_GREEN     = 0x0002
-    FOREGROUND_CYAN      = 0x0003
-    FOREGROUND_RED       = 0x0004
-    FOREGROUND_MAGENTA   = 0x0005
-    FOREGROUND_YELLOW    = 0x0006
-    FOREGROUND_GREY      = 0x0007
-    FOREGROUND_INTENSITY = 0x0008 # foreground color is intensified.
-
-    BACKGROUND_BLACK     = 0x0000
-    BACKGROUND_BLUE      = 0x0010
-    BACKGROUND_GREEN     = 0x0020
-    BACKGROUND_CYAN      = 0x0030
-    BACKGROUND_RED       = 0x0040
-    BACKGROUND_MAGENTA   = 0x0050
-    BACKGROUND_YELLOW    = 0x0060
-    BACKGROUND_GREY      = 0x0070
-    BACKGROUND_INTENSITY = 0x0080 # background color is intensified.
-
-    stdout_handle = windll.kernel32.GetStdHandle(STD_OUTPUT_HANDLE)
-    SetConsoleTextAttribute = windll.kernel32.SetConsoleTextAttribute
-    GetConsoleScreenBufferInfo = windll.kernel32.GetConsoleScreenBufferInfo
-
-    def get_text_attr():
-      """Returns the character attributes (colors) of the console screen
-      buffer."""
-      csbi = CONSOLE_SCREEN_BUFFER_INFO()
-      GetConsoleScreenBufferInfo(stdout_handle, byref(csbi))
-      return csbi.wAttributes
-
-    def set_text_attr(color):
-      """Sets the character attributes (colors) of the console screen
-      buffer. Color is a combination of foreground and background color,
-      foreground and background intensity."""
-      SetConsoleTextAttribute(stdout_handle, color)
-
-def color(color):
-    """Set the color. Works on Win32 and normal terminals."""
-    if sys.platform == "win32":
-        if color == "green":
-            set_text_attr(FOREGROUND_GREEN | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "yellow":
-            set_text_attr(FOREGROUND_YELLOW | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "red":
-            set_text_attr(FOREGROUND_RED | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "blue":
-            set_text_attr(FOREGROUND_BLUE | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "magenta":
-            set_text_attr(FOREGROUND_MAGENTA | get_text_attr() & 0x0070 | FOREGROUND_INTENSITY)
-        elif color == "reset":
-            set_text_attr(FOREGROUND_GREY | get_text_attr() & 0x0070)
-        elif color == "grey":
-            set_text_attr(FOREGROUND_GREY | get_text_attr() & 0x0070)
-    else :
-        if color == "green":
-            sys.stdout.write('\033[92m')
-        elif color == "red":
-            sys.stdout.write('\033[91m')
-        elif color == "blue":
-            sys.stdout.write('\033[94m')
-        elif color == "reset":
-            sys.stdout.write('\033[0m')
-
-def print_error(msg):
-    color("red")
-    print ("ERROR: {}".format(msg))
-    color("reset")
-
-def print_warning(msg):
-    color("yellow")
-    print ("WARNING: {}".format(msg))
-    color("reset")
-
-def print_trace(msg):
-    if (not enable_trace):
-        return
-    color("magenta")
-    print ("TRACE: {}".format(msg))
-    color("reset")
-
-def print_green(msg):
-    color("green")
-    print(msg)
-    color("reset")
-
-def print_blue(msg):
-    color("blue")
-    print(msg)
-    color("reset")
-############################################################
 
 ############################################################
 # rap-related functions for binary file reading
@@ -230,51 +104,52 @@ class ConfigBin:
 
 def find_build_dir(pwd):
     # check if we find the .hemttout folder here, otherwise try one directory further up
-    print_trace("Searching for .hemttout in {}".format(pwd))
+    print_trace("Searching for .hemttout in {}", pwd)
     hemttout_dir = os.path.join(pwd,'.hemttout')
     if (os.path.isdir(hemttout_dir)):
-        print_trace("Searching for build dir in {}".format(hemttout_dir))
+        print_trace("Searching for build dir in {}", hemttout_dir)
         build_dir = os.path.join(hemttout_dir,'build')
         if (os.path.isdir(build_dir)):
-            print_trace("HEMTT build dir found: {}".format(build_dir))
+            print_trace("HEMTT build dir found: {}", build_dir)
             return build_dir
         else:
             raise Exception("NoBuildDir","HEMTT build output directory could not be found!")
     else:
         return find_build_dir(os.path.join(pwd,'..'))
 
-def grab_built_pbos(dir):
-    # return all built pbos as PBOFile objects
+def grab_built_pbo_files(dir, skip=None):
+    # return the names and paths of all built pbos, except those skip(file, path) rejects
     addons_dir = os.path.join(dir,'addons')
-    print_trace("grabbing pbo files from addons dir: {}".format(addons_dir))
+    print_trace("grabbing pbo files from addons dir: {}", addons_dir)
     addons_pbos = next(os.walk(addons_dir), (None, None, []))[2]
-    print_trace("pbo files returned: {}".format(addons_pbos))
+    print_trace("pbo files returned: {}", addons_pbos)
 
     pbos = []
 
-    for file in addons_pbos:
-        print_trace("reading pbo file: {}".format(file))
-        pbo = PBOFile.read_file(os.path.join(addons_dir,file))
-        pbos.append([file,pbo])
+    for file in sorted(addons_pbos):
+        if (skip is not None and skip(file, os.path.join(addons_dir,file))):
+            print_trace("pbo file unchanged since last run, skipping: {}", file)
+            continue
+        pbos.append([file,os.path.join(addons_dir,file)])
 
     return pbos
 
 def get_config_prefix(cfg, searchprefix):
     cfg_patches = next(entry for entry in cfg.body.entries if entry.type == rap.RAP.EntryType.CLASS and (entry.name.lower() == "cfgpatches"))
     prefix = cfg_patches.body.entries[0].name.lower() if len(cfg_patches.body.entries) > 0 else None
-    print_trace("found config prefix: {}".format(prefix))
+    print_trace("found config prefix: {}", prefix)
     return prefix
 
 def read_pbo_config_bin(pbo):
     # grab pboprefix to find root path
     pboprefix = pbo.pbo_header.header_extension.strings[1].lower()
     searchprefix = pboprefix.split('\\')[1]
-    print_trace("found pboprefix as {}, searchprefix as {}".format(pboprefix,searchprefix))
+    print_trace("found pboprefix as {}, searchprefix as {}", pboprefix,searchprefix)
 
     # grab all files within the data directory and the config.bin
     config_bin = []
     for file in pbo:
-        #print_trace("checking file {}".format(file.filename))
+        #print_trace("checking file {}", file.filename)
         filename = "\\" + pboprefix + "\\" + file.filename.lower()
 
         if "config.bin" in filename:
@@ -286,7 +161,7 @@ def read_pbo_config_bin(pbo):
             path = os.path.join(root_dir, '\\'.join(pboprefix.split('\\')[-2:]), addon)
             c_bin = ConfigBin(cfg, searchprefix, prefix, path)
             config_bin.append(c_bin)
-            print_trace("found config.bin: {}".format(c_bin))
+            print_trace("found config.bin: {}", c_bin)
 
     if (len(config_bin) == 0):
         print_error("PBO does not contain a config.bin!")
@@ -294,94 +169,150 @@ def read_pbo_config_bin(pbo):
     return config_bin
 
 def get_classes_from_config(config):
+    # returns iterators over the names of the weapon and vehicle classes, the config is walked lazily
     cfg_root = config.data.body
     cfg_weapons = next((entry for entry in cfg_root.entries if entry.type == rap.RAP.EntryType.CLASS and (entry.name.lower() == "cfgweapons")), None)
     cfg_vehicles = next((entry for entry in cfg_root.entries if entry.type == rap.RAP.EntryType.CLASS and (entry.name.lower() == "cfgvehicles")), None)
 
     if not cfg_weapons is None:
-        print_trace("----\nrecursing CfgWeapons\n----")
         classes_weapons = recurse_classes_from_config(cfg_weapons.body,config.prefix)
     else:
-        classes_weapons = []
+        classes_weapons = iter(())
 
     if not cfg_vehicles is None:
-        print_trace("----\nrecursing CfgVehicles\n----")
         classes_vehicles = recurse_classes_from_config(cfg_vehicles.body,config.prefix)
     else:
-        classes_vehicles = []
+        classes_vehicles = iter(())
 
-    print_trace("found weapon classes {}".format(classes_weapons))
-    print_trace("found vehicle classes {}".format(classes_vehicles))
     return (classes_weapons, classes_vehicles)
 
 def recurse_classes_from_config(cfg,searchprefix,parent="root",level=0):
-    print_trace("recurse level {}".format(level))
-    classes = []
+    print_trace("recurse level {}", level)
     if (level > 1):
-        return classes # don't traverse past the first level here
+        return # don't traverse past the first level here
     for entry in cfg.entries:
         if entry.type == rap.RAP.EntryType.CLASS:
-            print_trace("checking {} with searchprefix {}".format(entry.name,searchprefix))
+            print_trace("checking {} with searchprefix {}", entry.name,searchprefix)
             if (entry.name.find(searchprefix) == 0):
-                print_trace("{} in searchprefix".format(entry.name))
-                classes.append(entry)
-            classes.extend(recurse_classes_from_config(entry.body,searchprefix, entry.name,level + 1))
+                print_trace("{} in searchprefix", entry.name)
+                yield entry.name
+            yield from recurse_classes_from_config(entry.body,searchprefix, entry.name,level + 1)
+
+def write_class_list(f, define, class_names):
+    # writes a list macro, one class name per line, and returns the number of names written
+    f.write("#define {} \\\n".format(define))
+    count = 0
+    for class_name in class_names:
+        if (count > 0):
+            f.write(',\\\n')
+        f.write('"{}"'.format(class_name))
+        count += 1
+    if (count > 0):
+        f.write("\n")
+
+    return count
+
+def render_config_lists(f, classes_weapons, classes_vehicles):
+    # streams the file to f, returns the number of weapon and vehicle classes written
+    f.write("// This file is automatically generated by write_config_lists.py\n")
+    f.write("// Do not edit this file manually!\n\n")
+
+    count_weapons = write_class_list(f, "ITEM_LIST", classes_weapons)
+    f.write("\n")
+    count_vehicles = write_class_list(f, "UNIT_LIST", classes_vehicles)
+
+    return (count_weapons, count_vehicles)
+
+def write_config_lists_to_file(staged, path):
+    # returns (success, written), the file is only replaced if its content changes
+    if staged is None:
+        print_warning("Directory does not exist: {}", path)
+        return (False, False)
+
+    try:
+        written = incremental.commit_staged(staged)
+    except Exception as e:
+        print_error("An error occurred while writing to file {}: {}", staged.filepath, e)
+        return (False, False)
 
-    return classes
+    return (True, written)
 
-def write_config_lists_to_file(classes_weapons, classes_vehicles, path,addon):
-    if not os.path.exists(path):
-        print_warning("Directory does not exist: {}".format(path))
-        return False
-    config_lists = os.path.join(path, "config_lists.hpp")
+def generate_addon(task):
+    # reads, parses and renders the files of a single pbo, may run in a worker process
+    global root_dir
+    root_dir = parallel.shared()
+    (file, filepath) = task
 
+    diagnostics.set_addon(file)
+    outputs = []
     try:
-        with open(config_lists, 'w', encoding='utf-8') as f:
-            f.write("// This file is automatically generated by write_config_lists.py\n")
-            f.write("// Do not edit this file manually!\n\n")
-
-            f.write("#define ITEM_LIST \\\n")
-            if len(classes_weapons) > 0:
-                for idx, cls in enumerate(classes_weapons):
-                    class_name = cls.name
-                    if (idx == len(classes_weapons) - 1):
-                        f.write('"{}"\n'.format(class_name))
-                    else:
-                        f.write('"{}",\\\n'.format(class_name))
-
-            f.write("\n#define UNIT_LIST \\\n")
-            if len(classes_vehicles) > 0:
-                for idx, cls in enumerate(classes_vehicles):
-                    class_name = cls.name
-                    if (idx == len(classes_vehicles) - 1):
-                        f.write('"{}"\n'.format(class_name))
-                    else:
-                        f.write('"{}",\\\n'.format(class_name))
+        print_trace("reading pbo file: {}", file)
+        pbo = PBOFile.read_file(filepath)
+
+        for config in read_pbo_config_bin(pbo):
+            classes_weapons, classes_vehicles = get_classes_from_config(config)
+            first_weapon = next(classes_weapons, None)
+            first_vehicle = next(classes_vehicles, None)
+            if (first_weapon is None and first_vehicle is None):
+                print_blue("No vehicle/weapon classes found in config.bin for addon: {}", config.addon)
+                continue
+            if not os.path.exists(config.path):
+                outputs.append((config.addon, config.path, None, 0, 0))
+                continue
+
+            if (first_weapon is not None):
+                classes_weapons = itertools.chain((first_weapon,), classes_weapons)
+            if (first_vehicle is not None):
+                classes_vehicles = itertools.chain((first_vehicle,), classes_vehicles)
+
+            # the file is streamed into a temporary file here and only put in place by the main process
+            writer = incremental.StagedWriter(os.path.join(config.path, "config_lists.hpp"))
+            try:
+                (count_weapons, count_vehicles) = render_config_lists(writer, classes_weapons, classes_vehicles)
+            except:
+                writer.discard()
+                raise
+            outputs.append((config.addon, config.path, writer.close(), count_weapons, count_vehicles))
     except Exception as e:
-        print_error("An error occurred while writing to file {}: {}".format(config_lists, e))
-        return False
+        # the staged files lie next to the sources, none of them may be left behind
+        for (addon, path, staged, count_weapons, count_vehicles) in outputs:
+            if (staged is not None):
+                incremental.discard_staged(staged)
+        print_error("Generating config_lists.hpp failed: {}", e)
+        outputs = None
+    diagnostics.set_addon(None)
 
-    return True
+    return (file, filepath, outputs)
 
 def main(argv):
-    print_blue("## write_config_lists.py, version {} ##\n".format(__version__))
+    print_blue("## write_config_lists.py, version {} ##\n", __version__)
 
     # parse args
     parser = argparse.ArgumentParser(description="This script checks all local classes in the output of this project's HEMTT build.")
     parser.add_argument('directory',nargs='?',help='directory to operate on',default='.')
     parser.add_argument('-v', '--verbose',help='enables tracel-level logging',action='store_true')
     parser.add_argument('-o','--only',help='only run the path checks on the following addon',nargs='+')
+    parser.add_argument('-f','--force',help='regenerates the files of all addons, even if their pbo is unchanged',action='store_true')
+    parallel.add_arguments(parser)
+    diagnostics.add_arguments(parser)
+    profiling.add_arguments(parser)
     args = parser.parse_args()
-    global enable_trace
-    enable_trace = args.verbose
+    diagnostics.configure_from_args("write_config_lists.py", __version__, args)
+    if (profiling.configure_from_args("write_config_lists.py", args)):
+        profiling.instrument(globals(), {
+            "grab_built_pbo_files": "list pbos",
+            "read_pbo_config_bin": "read pbo contents",
+            "render_config_lists": "traverse and render",
+            "write_config_lists_to_file": "write file"
+        })
 
     global root_dir
     root_dir = os.path.abspath(args.directory)
-    print_trace("setting root_dir to {}".format(root_dir))
+    print_trace("setting root_dir to {}", root_dir)
 
     global only_list
     only_list = args.only
-    print_trace("setting only_list to {}".format(only_list))
+    print_trace("setting only_list to {}", only_list)
 
     # preliminary stuffs
     global build_dir
@@ -391,12 +322,12 @@ def main(argv):
         print_error("An exception occurred while attempting to find the build directory!")
         sys.exit(1)
 
-    pbos = grab_built_pbos(build_dir)
+    cache = incremental.FingerprintCache(os.path.join(os.path.dirname(build_dir), "write_config_lists.cache.json"), __version__, root_dir)
+    pbos = grab_built_pbo_files(build_dir, None if args.force else cache.is_unchanged)
 
-    classes = []
     errors = []
-    config_bins = {}
-    for (file,pbo) in pbos:
+    tasks = []
+    for (file,filepath) in pbos:
         skip = False
         if (not only_list is None):
             skip = True
@@ -404,34 +335,58 @@ def main(argv):
                 if (it in file):
                     skip = False
         if (skip):
-            print_trace("{} not in only_list, skipping".format(file))
+            print_trace("{} not in only_list, skipping", file)
             continue
 
-        print_trace("reading data files from pbo {}".format(file))
-        config_bins[file] = read_pbo_config_bin(pbo)
+        tasks.append((file, filepath))
 
-    for config_files in config_bins.values():
-        for config in config_files:
-            classes_weapons, classes_vehicles = get_classes_from_config(config)
-            if (len(classes_weapons) == 0 and len(classes_vehicles) == 0):
-                print_blue("No vehicle/weapon classes found in config.bin for addon: {}".format(config.addon))
+    # pbos are parsed and rendered in parallel, the files are written here in pbo order.
+    # Staged files that are not committed when the run fails are removed again.
+    uncommitted = []
+    try:
+        for (file, filepath, generated) in parallel.map_ordered(generate_addon, tasks, args.jobs, root_dir):
+            diagnostics.set_addon(file)
+            if (generated is None):
+                errors.append(file)
+                cache.invalidate(file)
                 continue
-
-            result = write_config_lists_to_file(classes_weapons, classes_vehicles, config.path, config.addon)
-
-            if (result):
-                print_blue("Wrote {} weapon classes and {} vehicle classes to file: {}".format(len(classes_weapons), len(classes_vehicles), os.path.join(config.path,"config_lists.hpp")))
+            uncommitted = [staged for (addon, path, staged, count_weapons, count_vehicles) in generated if staged is not None]
+            outputs = []
+            failed = False
+            for (addon, path, staged, count_weapons, count_vehicles) in generated:
+                (result, written) = write_config_lists_to_file(staged, path)
+
+                if (result and written):
+                    print_blue("Wrote {} weapon classes and {} vehicle classes to file: {}", count_weapons, count_vehicles, os.path.join(path,"config_lists.hpp"))
+                elif (result):
+                    print_blue("File is up to date: {}", os.path.join(path,"config_lists.hpp"))
+                else:
+                    print_error("Failed to write to file: {}", os.path.join(path,"config_lists.hpp"))
+                    errors.append(addon)
+                    failed = True
+                if (result):
+                    outputs.append(os.path.join(path,"config_lists.hpp"))
+
+            if (failed):
+                cache.invalidate(file)
             else:
-                print_error("Failed to write to file: {}".format(os.path.join(config.path,"config_lists.hpp")))
-                errors.append(config.addon)
-
+                cache.update(file, filepath, outputs)
+            uncommitted = []
+    finally:
+        for staged in uncommitted:
+            incremental.discard_staged(staged)
+    diagnostics.set_addon(None)
 
+    try:
+        cache.save()
+    except OSError as e:
+        print_warning("Could not save the fingerprint cache: {}", e)
 
     if (len(errors) == 0):
         print_green("config_lists.hpp files successfully written!")
         sys.exit(0)
     else:
-        print_error("Writing config_lists for one or more addons has failed: {}".format(errors))
+        print_error("Writing config_lists for one or more addons has failed: {}", errors)
         sys.exit(1)
 
 
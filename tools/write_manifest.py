@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# File: write_manifest.py
+# Author: Mokka
+#
+# Description: Writes a fingerprint manifest of the built pbos and diffs builds against each other
+#
+# Usage: python ./tools/write_manifest.py
+#
+###############################################################################
+
+# The MIT License (MIT)
+
+# Copyright (c) 2026-2026 Mokka
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+###############################################################################
+
+__version__ = "0.1"
+
+import sys
+
+if sys.version_info[0] == 2:
+    print("Python 3 is required.")
+    sys.exit(1)
+
+import os
+import argparse
+from utils import diagnostics
+from utils import parallel
+from utils import profiling
+from utils.diagnostics import print_error, print_warning, print_trace, print_info, print_green, print_blue
+from utils import manifest
+from utils.manifest import Manifest, Manifest_Error
+from utils.pbo_layout import PBOLayout_Error
+
+# Set Globals
+root_dir = ""
+build_dir = ""
+
+def find_build_dir(pwd):
+    # check if we find the .hemttout folder here, otherwise try one directory further up
+    print_trace("Searching for .hemttout in {}", pwd)
+    hemttout_dir = os.path.join(pwd,'.hemttout')
+    if (os.path.isdir(hemttout_dir)):
+        print_trace("Searching for build dir in {}", hemttout_dir)
+        build_dir = os.path.join(hemttout_dir,'build')
+        if (os.path.isdir(build_dir)):
+            print_trace("HEMTT build dir found: {}", build_dir)
+            return build_dir
+        else:
+            raise Exception("NoBuildDir","HEMTT build output directory could not be found!")
+    else:
+        return find_build_dir(os.path.join(pwd,'..'))
+
+def grab_built_pbo_files(dir):
+    # return all pbos of the build as (name relative to the build dir, path)
+    pbos = []
+    for (path, dirs, files) in os.walk(dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.lower().endswith(".pbo"):
+                filepath = os.path.join(path, file)
+                pbos.append((os.path.relpath(filepath, dir).replace(os.sep, "/"), filepath))
+    print_trace("pbo files returned: {}", pbos)
+
+    return pbos
+
+def fingerprint_pbo(task):
+    # hashes a single pbo, may run in a worker process
+    (name, filepath) = task
+    diagnostics.set_addon(name)
+    try:
+        return (name, manifest.fingerprint_pbo(filepath))
+    except (OSError, PBOLayout_Error) as e:
+        print_error("Could not fingerprint {}: {}", filepath, e)
+        return (name, None)
+    finally:
+        diagnostics.set_addon(None)
+
+def build_manifest(pbos, previous, jobs, rehash = False):
+    # returns the manifest of the given pbos and the names of those that failed
+    output = Manifest(build_dir)
+    tasks = []
+    for (name, filepath) in pbos:
+        if (not rehash and previous is not None and previous.is_unchanged(name, filepath)):
+            print_trace("pbo unchanged since last manifest, reusing fingerprint: {}", name)
+            output.pbos[name] = previous.pbos[name]
+        else:
+            tasks.append((name, filepath))
+
+    errors = []
+    for (name, record) in parallel.map_ordered(fingerprint_pbo, tasks, jobs):
+        if (record is None):
+            errors.append(name)
+        else:
+            output.pbos[name] = record
+    output.pbos = dict(sorted(output.pbos.items()))
+    print_blue("Fingerprinted {} pbos, reused {} unchanged", len(tasks), len(pbos) - len(tasks))
+
+    return (output, errors)
+
+def print_diff(result):
+    if (len(result.added) == 0 and len(result.removed) == 0 and len(result.changed) == 0):
+        print_green("Builds are identical")
+        return
+
+    for name in result.added:
+        print_info("+ {}", name)
+    for name in result.removed:
+        print_info("- {}", name)
+    for (name, entries) in result.changed.items():
+        print_info("~ {}", name)
+        for entry in entries.added:
+            print_info("    + {}", entry)
+        for entry in entries.removed:
+            print_info("    - {}", entry)
+        for entry in entries.changed:
+            print_info("    ~ {}", entry)
+    print_blue("{} pbos added, {} removed, {} changed", len(result.added), len(result.removed), len(result.changed))
+
+
+def main(argv):
+    print_blue("## write_manifest.py, version {} ##\n", __version__)
+
+    # parse args
+    parser = argparse.ArgumentParser(
+        description="This script fingerprints every pbo, and every file within them, in the output of this project's HEMTT build and writes the result to a manifest. Manifests can be compared to list what changed between two builds.",
+        epilog="example: python ./tools/write_manifest.py --diff release_manifest.json"
+    )
+    parser.add_argument('directory',nargs='?',help='directory to operate on',default='.')
+    parser.add_argument('-v', '--verbose',help='enables tracel-level logging',action='store_true')
+    parser.add_argument('--output',help='path of the manifest, defaults to .hemttout/manifest.json')
+    parser.add_argument('--rehash',help='hashes all pbos, even those unchanged since the last manifest',action='store_true')
+    parser.add_argument('--diff',help='lists the changes of the current build compared to the given manifest',metavar='MANIFEST')
+    parser.add_argument('--compare',help='lists the changes between two manifests without reading the build',nargs=2,metavar=('OLD','NEW'))
+    parallel.add_arguments(parser)
+    diagnostics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    diagnostics.configure_from_args("write_manifest.py", __version__, args)
+    if (profiling.configure_from_args("write_manifest.py", args)):
+        profiling.instrument(globals(), {
+            "grab_built_pbo_files": "list pbos",
+            "build_manifest": "fingerprint pbos"
+        })
+
+    if (args.compare is not None):
+        try:
+            old = Manifest.load(args.compare[0])
+            new = Manifest.load(args.compare[1])
+        except Manifest_Error as e:
+            print_error(e)
+            sys.exit(1)
+        print_diff(manifest.diff(old, new))
+        sys.exit(0)
+
+    global root_dir
+    root_dir = os.path.abspath(args.directory)
+    print_trace("setting root_dir to {}", root_dir)
+
+    # preliminary stuffs
+    global build_dir
+    try:
+        build_dir = find_build_dir(root_dir)
+    except:
+        print_error("An exception occurred while attempting to find the build directory!")
+        sys.exit(1)
+
+    output_path = args.output
+    if (output_path is None):
+        output_path = os.path.join(os.path.dirname(build_dir), "manifest.json")
+
+    previous = None
+    if (os.path.exists(output_path)):
+        try:
+            previous = Manifest.load(output_path)
+        except Manifest_Error as e:
+            print_warning("Previous manifest is not reused: {}", e)
+
+    (current, errors) = build_manifest(grab_built_pbo_files(build_dir), previous, args.jobs, args.rehash)
+
+    try:
+        current.save(output_path)
+    except OSError as e:
+        print_error("An error occurred while writing to file {}: {}", output_path, e)
+        sys.exit(1)
+    print_blue("Wrote manifest of {} pbos ({} files) to file: {}", len(current.pbos), current.entry_count(), output_path)
+    print_blue("Build fingerprint: {}", current.fingerprint)
+
+    if (args.diff is not None):
+        print_info('')
+        try:
+            print_diff(manifest.diff(Manifest.load(args.diff), current))
+        except Manifest_Error as e:
+            print_error(e)
+            errors.append(args.diff)
+
+    if (len(errors) == 0):
+        sys.exit(0)
+    else:
+        print_error("Fingerprinting one or more pbos has failed: {}", errors)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)